@@ -4,5 +4,5 @@ Created on Mon Nov 24 02:43:25 2025
 
 @author: User
 """
-worker: python main.py
+worker: python -m advisor_bot
 
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+بات مشاور تحصیلی - Educational Advisor Bot
+
+اجرا:
+    python -m advisor_bot
+"""
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""
+نقطه ورود بات - Entry Point
+"""
+
+# startup باید پیش از ماژول‌های دیگر وارد شود تا زمان import ها هم اندازه‌گیری شود
+from advisor_bot import startup
+
+
+def main():
+    from advisor_bot import bot
+
+    startup.mark('imports')
+    bot.main()
+
+
+if __name__ == '__main__':
+    main()
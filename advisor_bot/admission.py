@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+پذیرش آپدیت‌ها و حذف بار اضافه - Ingest Admission and Load Shedding
+"""
+
+import collections
+import os
+import time
+
+from . import metrics
+from .sender import TokenBucket
+
+# نرخ مجاز آپدیت برای هر چت (در ثانیه) و تعداد پیام پشت سر هم؛ ۰ یعنی بدون محدودیت
+INGEST_CHAT_RATE = float(os.environ.get('INGEST_CHAT_RATE', '2'))
+INGEST_CHAT_BURST = float(os.environ.get('INGEST_CHAT_BURST', '8'))
+# آستانه‌های حالت حذف بار به صورت سهمی از DISPATCH_MAX_PENDING: با رسیدن صف به
+# SHED_HIGH وارد حالت حذف و با پایین آمدن تا SHED_LOW از آن خارج می‌شویم
+INGEST_SHED_HIGH = float(os.environ.get('INGEST_SHED_HIGH', '0.8'))
+INGEST_SHED_LOW = float(os.environ.get('INGEST_SHED_LOW', '0.5'))
+# حداقل فاصله دو پیام «لطفاً صبر کنید» به یک چت (ثانیه)
+INGEST_NOTICE_INTERVAL = float(os.environ.get('INGEST_NOTICE_INTERVAL', '10'))
+# بیشترین تعداد باکت چت‌ها در حافظه؛ باکت چتی که از همه دیرتر پیام داده حذف می‌شود
+INGEST_MAX_CHATS = int(os.environ.get('INGEST_MAX_CHATS', '10000'))
+
+RATE_LIMITED = 'rate_limited'
+DUPLICATE = 'duplicate'
+OVERLOAD = 'overload'
+
+SHED_TOTAL = metrics.counter('bot_ingest_shed_total', 'Updates dropped at ingest before reaching a handler', ('reason',))
+SHED_NOTICES = metrics.counter('bot_ingest_shed_notices_total', 'Cheap "please wait" replies sent for shed updates')
+SHEDDING = metrics.gauge('bot_ingest_shedding', 'Whether the dispatcher is in load-shedding mode')
+for _reason in (RATE_LIMITED, DUPLICATE, OVERLOAD):
+    SHED_TOTAL.labels(_reason)
+
+
+def update_payload(update):
+    """متن پیام یا data دکمه شیشه‌ای؛ دو آپدیت با payload یکسان از یک چت تکراری‌اند"""
+    if "callback_query" in update:
+        return update["callback_query"].get("data")
+    message = update.get("message")
+    return message.get("text") if message else None
+
+
+class AdmissionController:
+    """
+    پیش از صف Dispatcher تصمیم می‌گیرد آپدیت پردازش شود یا نه:
+
+    - هر چت یک TokenBucket دارد؛ کسی که سریع‌تر از نرخ مجاز پیام یا دکمه
+      می‌فرستد (مثلاً چند ده بار زدن یک دکمه) فقط همان پیام‌های اضافه‌اش حذف
+      می‌شود و صف دیگران را پر نمی‌کند.
+    - وقتی تعداد آپدیت‌های در انتظار از آستانه بالا بگذرد حالت حذف بار فعال
+      می‌شود: آپدیت تکراری چتی که همان متن یا دکمه را هنوز در صف دارد با آن
+      یکی می‌شود و چتی که پیامش هنوز در حال پردازش است پیام جدیدش حذف می‌شود.
+      چتی که چیزی در صف ندارد همچنان پذیرفته می‌شود، پس کاربر عادی تأخیری
+      بیش از حالت عادی نمی‌بیند.
+
+    همه متدها از event loop صدا زده می‌شوند و کار سنگینی انجام نمی‌دهند.
+    """
+
+    def __init__(self, max_pending, chat_rate=INGEST_CHAT_RATE, chat_burst=INGEST_CHAT_BURST,
+                 shed_high=INGEST_SHED_HIGH, shed_low=INGEST_SHED_LOW, notice_interval=INGEST_NOTICE_INTERVAL,
+                 max_chats=INGEST_MAX_CHATS):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.high_watermark = max(1, int(max_pending * shed_high))
+        self.low_watermark = min(self.high_watermark - 1, int(max_pending * shed_low))
+        self.notice_interval = notice_interval
+        self.max_chats = max_chats
+        self.shedding = False
+        # هر دو به ترتیب آخرین استفاده‌اند تا حذف قدیمی‌ترین‌ها O(1) باشد و هیچ‌وقت کل دیکشنری پیمایش نشود
+        self._buckets = collections.OrderedDict()
+        self._notices = collections.OrderedDict()
+
+    def check(self, key, update, pending, queued):
+        """
+        None اگر آپدیت پذیرفته شود، وگرنه دلیل حذف.
+        queued صف فعلی آپدیت‌های همین چت در Dispatcher است (یا None).
+        """
+        self._update_mode(pending)
+        if self.shedding and queued:
+            payload = update_payload(update)
+            if payload is not None and any(update_payload(waiting) == payload for waiting in queued):
+                return DUPLICATE
+            return OVERLOAD
+        if self.chat_rate > 0 and not self._bucket(key).try_take():
+            return RATE_LIMITED
+        return None
+
+    def shed(self, key, reason):
+        """ثبت آپدیت حذف‌شده؛ True اگر وقت فرستادن پیام «صبر کنید» به این چت است"""
+        SHED_TOTAL.labels(reason).inc()
+        now = time.monotonic()
+        if now - self._notices.get(key, float('-inf')) < self.notice_interval:
+            return False
+        self._notices[key] = now
+        self._notices.move_to_end(key)
+        # زمان‌ها صعودی‌اند؛ فقط از ابتدا تا اولین مدخل هنوز معتبر پیمایش می‌شود
+        expired = now - self.notice_interval
+        while next(iter(self._notices.values())) < expired:
+            self._notices.popitem(last=False)
+        SHED_NOTICES.inc()
+        return True
+
+    def _update_mode(self, pending):
+        if not self.shedding and pending >= self.high_watermark:
+            self.shedding = True
+            SHEDDING.set(1)
+            print(f"🚦 حالت حذف بار فعال شد ({pending} آپدیت در انتظار)")
+        elif self.shedding and pending <= self.low_watermark:
+            self.shedding = False
+            SHEDDING.set(0)
+            print(f"🚦 حالت حذف بار غیرفعال شد ({pending} آپدیت در انتظار)")
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_chats:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = TokenBucket(self.chat_rate, self.chat_burst)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
@@ -0,0 +1,1078 @@
+# -*- coding: utf-8 -*-
+"""
+بات مشاور تحصیلی - Educational Advisor Bot
+"""
+
+import time
+from datetime import datetime
+import os
+import sys
+import asyncio
+import signal
+import queue
+import threading
+
+from .fetcher import UpdateFetcher, ALLOWED_UPDATES
+from .dispatcher import Dispatcher, DISPATCH_MAX_PENDING
+from .admission import AdmissionController
+from .sender import OutboundSender, GLOBAL_RATE
+from .outbox import Outbox
+from .results_store import open_results_store
+from .state_store import StateStore, SessionCache
+from .scheduler import AlarmScheduler
+from .flows import FlowEngine, Message, CallbackQuery, MENU, STAY
+from . import metrics, startup, tracing
+from .event_log import EventLog, LOG_PATH
+from .tracing import Tracer
+from .profiler import SamplingProfiler, PROFILE_SIGNAL
+from .progress import ProgressTracker, PROGRESS_COHORT_REFRESH
+from .broadcast import Broadcaster, ADMIN_CHAT_IDS, is_blocked
+from .snapshot import Snapshotter, SnapshotStore, add_results_source
+from .content import ContentBank, ContentError
+from .user_state import UserState, Alarm, AlarmType, Grade, ALL_DAYS, DAY_TO_WEEKDAY, day_bit, parse_alarm_time
+
+# توکن بات (در main بررسی می‌شود تا import این ماژول بدون توکن هم ممکن باشد)
+TOKEN = os.environ.get('BOT_TOKEN')
+
+# آدرس Bot API؛ برای تست بار می‌توان آن را به سرور جعلی محلی (bench/fake_bot_api.py) اشاره داد
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+URL = f"{TELEGRAM_API_URL.rstrip('/')}/bot{TOKEN}/"
+# پاسخ‌هایی که در قطعی API نرفته‌اند در outbox می‌مانند و بعد به ترتیب ارسال می‌شوند
+outbox = Outbox()
+sender = OutboundSender(URL, outbox=outbox)
+results_store = open_results_store()
+event_log = EventLog()
+# ردیابی درصدی از آپدیت‌ها (TRACE_SAMPLE یا /trace) و پروفایلر (PROFILE_SIGNAL یا /profile)
+tracer = Tracer()
+profiler = SamplingProfiler()
+progress_tracker = ProgressTracker()
+# سوالات ارزیابی، برنامه‌های هفتگی و پاسخ‌ها (advisor_bot/content یا CONTENT_DIR)
+content_bank = ContentBank()
+
+print("🎓 راه‌اندازی بات مشاور تحصیلی...")
+
+# نشست‌های بدون فعالیت پس از این مدت (ثانیه) منقضی می‌شوند
+SESSION_TTL = int(os.environ.get('SESSION_TTL', '7200'))
+SESSION_EXPIRY_TICK = float(os.environ.get('SESSION_EXPIRY_TICK', '5'))
+SESSION_EXPIRY_BATCH = int(os.environ.get('SESSION_EXPIRY_BATCH', '200'))
+
+state_store = StateStore()
+student_data = {}
+
+# سیستم مدیریت وضعیت کاربران (کلاس UserState در user_state.py)
+def expire_user_state(chat_id, state):
+    # فرایند نیمه‌کاره (ارزیابی، تنظیم آلارم) لغو می‌شود ولی آلارم‌های ذخیره‌شده باقی می‌مانند
+    if not state.alarms:
+        return None
+    state.reset_flow()
+    return state
+
+user_states = SessionCache(state_store, 'states', encode=UserState.to_dict, decode=UserState.from_dict,
+                           ttl=SESSION_TTL, on_expire=expire_user_state,
+                           last_activity=lambda state: state.last_activity)
+
+def log_event(event_type, chat_id, details=""):
+    # فقط در صف قرار می‌گیرد؛ نوشتن در فایل و چاپ در نخ پس‌زمینه event_log انجام می‌شود
+    event_log.log(event_type, chat_id, details)
+
+# رابط ارزیابی: reply (کیبورد معمولی، یک پیام برای هر سوال) یا inline (ویرایش یک پیام)؛
+# inline در حالت polling درخواست بیشتری دارد و فقط برای BOT_MODE=webhook توصیه می‌شود
+ASSESSMENT_UI = os.environ.get('ASSESSMENT_UI', 'reply')
+
+def send_message(chat_id, text, buttons=None, inline=False):
+    data = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+    if buttons:
+        data["reply_markup"] = {"inline_keyboard": buttons} if inline else {"keyboard": buttons, "resize_keyboard": True}
+    # نتیجه را safe_send_message در event_log ثبت می‌کند
+    return sender.call("sendMessage", data)
+
+def get_user_state(chat_id):
+    try:
+        return user_states[chat_id]
+    except KeyError:
+        user_states[chat_id] = UserState()
+        return user_states[chat_id]
+
+def safe_send_message(chat_id, text, buttons=None, inline=False):
+    result = send_message(chat_id, text, buttons, inline)
+    if result.ok:
+        log_event("MESSAGE_SENT", chat_id, f"Text: {text[:30]}")
+    elif result.queued:
+        log_event("SEND_QUEUED", chat_id, f"Error: {result.error}")
+    else:
+        log_event("SEND_ERROR", chat_id, f"Status: {result.status} Attempts: {result.attempts} Error: {result.error}")
+        if is_blocked(result):
+            mark_blocked(chat_id)
+    return result
+
+def safe_edit_message(chat_id, message_id, text, inline_buttons=None):
+    data = {"chat_id": chat_id, "message_id": message_id, "text": text, "parse_mode": "HTML"}
+    if inline_buttons:
+        data["reply_markup"] = {"inline_keyboard": inline_buttons}
+    result = sender.call("editMessageText", data)
+    if result.ok:
+        log_event("MESSAGE_EDITED", chat_id, f"Text: {text[:30]}")
+    elif result.queued:
+        log_event("SEND_QUEUED", chat_id, f"Error: {result.error}")
+    else:
+        log_event("SEND_ERROR", chat_id, f"Status: {result.status} Attempts: {result.attempts} Error: {result.error}")
+        if is_blocked(result):
+            mark_blocked(chat_id)
+    return result
+
+def answer_callback(query, text=None):
+    # منتظر نتیجه نمی‌مانیم؛ فقط حالت «در حال بارگذاری» دکمه در تلگرام برداشته می‌شود
+    if query.answered:
+        return
+    query.answered = True
+    data = {"callback_query_id": query.id}
+    if text:
+        data["text"] = text
+    sender.submit("answerCallbackQuery", data)
+        
+def create_main_menu():
+    return [
+        [{"text": "📊 ارزیابی تحصیلی"}, {"text": "🎯 برنامه‌ریزی"}],
+        [{"text": "⏰ آلارم مطالعه"}, {"text": "📅 برنامه هفتگی"}],
+        [{"text": "📈 پیگیری پیشرفت"}, {"text": "😊 مدیریت استرس"}],
+        [{"text": "📞 مشاوره تخصصی"}, {"text": "ℹ️ راهنما"}]
+    ]
+
+def show_welcome(chat_id, name):
+    log_event("WELCOME_SHOWN", chat_id, f"User: {name}")
+    text = f"""🌟 <b>سلام {name} عزیز!</b>
+
+🎓 <b>به رهنمای تحصیلی خوش آمدید</b>
+
+📚 <b>خدمات تخصصی ما برای پایه‌های ششم تا دوازدهم:</b>
+• ارزیابی دقیق وضعیت تحصیلی
+• برنامه‌ریزی درسی شخصی‌سازی شده
+• سیستم آلارم مطالعه هوشمند
+• پیگیری پیشرفت تحصیلی
+• مدیریت استرس و اضطراب امتحان
+
+👇 <b>لطفاً یکی از خدمات را انتخاب کنید:</b>"""
+    
+    safe_send_message(chat_id, text, create_main_menu())
+
+# ======== سیستم ارزیابی تحصیلی ========
+def show_educational_assessment(chat_id):
+    log_event("ASSESSMENT_SHOWN", chat_id)
+    text = """📊 <b>ارزیابی تحصیلی</b>
+
+🎒 <b>لطفاً پایه تحصیلی خود را انتخاب کنید:</b>"""
+    
+    buttons = [
+        [{"text": "📚 ششم"}, {"text": "📚 هفتم"}, {"text": "📚 هشتم"}],
+        [{"text": "📚 نهم"}, {"text": "🎯 دهم"}, {"text": "🎯 یازدهم"}],
+        [{"text": "🎯 دوازدهم"}, {"text": "🔙 بازگشت به منو"}]
+    ]
+    safe_send_message(chat_id, text, buttons)
+       
+def create_assessment_buttons():
+    return [
+        [{"text": "🟢 عالی"}, {"text": "🟡 متوسط"}, {"text": "🔴 ضعیف"}],
+        [{"text": "🔙 بازگشت به منو"}]
+    ]
+
+# سوالات بین همه کاربران مشترک است؛ در وضعیت هر کاربر فقط پایه و نسخه محتوایی که
+# ارزیابی با آن شروع شده نگه داشته می‌شود تا بارگذاری مجدد محتوا وسط ارزیابی سوال‌ها را عوض نکند
+def assessment_questions(grade, version=None):
+    return content_bank.get(version).assessment_questions(grade)
+
+def start_grade_selection(chat_id, grade):
+    log_event("ASSESSMENT_STARTED", chat_id, f"Grade: {grade}")
+    user_state = get_user_state(chat_id)
+    content = content_bank.current
+    user_state.grade = grade
+    user_state.step = 0
+    user_state.answers = bytearray()
+    user_state.content = content.version
+    user_questions = content.assessment_questions(grade)
+
+    text = f"""📝 <b>ارزیابی تحصیلی پایه {grade}</b>
+
+این ارزیابی {len(user_questions)} سوال دارد و وضعیت تحصیلی شما را تحلیل می‌کند.
+
+<b>لطفاً به سوالات با دقت پاسخ دهید:</b>"""
+    
+    safe_send_message(chat_id, text, create_assessment_buttons())
+    send_next_question(chat_id)
+
+def send_next_question(chat_id):
+    user_state = get_user_state(chat_id)
+    questions = assessment_questions(user_state.grade, user_state.content)
+    if user_state.step < len(questions):
+        question = questions[user_state.step]
+        text = f"<b>سوال {user_state.step + 1} از {len(questions)}</b>\n\n{question}"
+        safe_send_message(chat_id, text, create_assessment_buttons())
+    else:
+        show_assessment_results(chat_id)
+
+def handle_assessment_answer(chat_id, answer):
+    log_event("ASSESSMENT_ANSWER", chat_id, f"Answer: {answer}")
+    user_state = get_user_state(chat_id)
+    if answer == "🔙 بازگشت به منو":
+        user_state.reset_flow()
+        safe_send_message(chat_id, "🔙 بازگشت به منوی اصلی", create_main_menu())
+        return MENU
+
+    if answer in ["🟢 عالی", "🟡 متوسط", "🔴 ضعیف"]:
+        score_map = {"🟢 عالی": 2, "🟡 متوسط": 1, "🔴 ضعیف": 0}
+        if user_state.answers is None:
+            user_state.answers = bytearray()
+        user_state.answers.append(score_map[answer])
+        user_state.step += 1
+
+        if user_state.step < len(assessment_questions(user_state.grade, user_state.content)):
+            send_next_question(chat_id)
+        else:
+            show_assessment_results(chat_id)
+            return MENU
+    return STAY
+
+def show_assessment_results(chat_id):
+    log_event("ASSESSMENT_COMPLETED", chat_id)
+    user_state = get_user_state(chat_id)
+    answers = user_state.answers or b''
+    safe_send_message(chat_id, assessment_result_text(user_state.grade, answers, user_state.content),
+                      create_main_menu())
+    save_assessment_result(chat_id, user_state.grade, answers)
+    user_state.reset_flow()
+
+def assessment_result_text(grade, answers, version=None):
+    total_score = sum(answers)
+    max_score = len(answers) * 2
+    status, recommendation = content_bank.get(version).assessment_level(total_score, max_score)
+
+    text = f"""📊 <b>نتایج ارزیابی تحصیلی</b>
+
+🎒 <b>پایه:</b> {grade}
+📈 <b>امتیاز شما:</b> {total_score} از {max_score}
+📋 <b>وضعیت:</b> {status}
+
+💡 <b>توصیه‌ها:</b>
+{recommendation}
+
+🎯 <b>قدم بعدی:</b>
+برای دریافت برنامه‌ریزی شخصی، از منوی اصلی گزینه «🎯 برنامه‌ریزی» را انتخاب کنید."""
+    return text
+
+def save_assessment_result(chat_id, grade, answers):
+    row = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'user_id': chat_id,
+        'grade': str(grade or ''),
+        'total_score': sum(answers),
+        'answers': str(list(answers))
+    }
+    with tracing.span('results.save'):
+        results_store.append(row)
+        progress_tracker.record(row)
+    log_event("DATA_SAVED", chat_id, "Assessment results queued")
+
+# ======== ارزیابی با دکمه‌های inline ========
+# کل ارزیابی در یک پیام انجام می‌شود که با هر پاسخ ویرایش می‌شود. پایه، پاسخ‌ها و نسخه
+# محتوا مثل رابط reply در وضعیت کاربر نگه داشته می‌شوند (وضعیت جریان MENU می‌ماند تا منو
+# کار کند) و callback data فقط 'aa:<شماره سوال>:<امتیاز>' است؛ پس هر ویرایش فقط متن سوال و
+# یک صفحه‌کلید ثابت کوچک را می‌فرستد و فشردن دوباره یک دکمه دو بار شمرده نمی‌شود.
+# هزینه: هر فشردن دکمه در حالت polling دو درخواست دارد (answerCallbackQuery و ویرایش) و
+# ارزیابی ۵ سوالی ۱۴ درخواست در برابر ۹ درخواست رابط reply است؛ فقط در حالت webhook که
+# answerCallbackQuery همراه پاسخ HTTP می‌رود (۸ درخواست) inline کم‌هزینه‌تر است.
+GRADES = list(Grade)
+INLINE_ANSWERS = (("🟢 عالی", 2), ("🟡 متوسط", 1), ("🔴 ضعیف", 0))
+INLINE_BACK = {"text": "🔙 بازگشت به منو", "callback_data": "ax"}
+# برچسب کوتاه‌تر در صفحه‌کلید سوال‌ها که با هر ویرایش دوباره فرستاده می‌شود
+INLINE_CANCEL = {"text": "🔙 لغو", "callback_data": "ax"}
+INLINE_GRADE_TEXT = """📊 <b>ارزیابی تحصیلی</b>
+
+🎒 <b>لطفاً پایه تحصیلی خود را انتخاب کنید:</b>"""
+INLINE_GRADE_KEYBOARD = [[{"text": str(grade), "callback_data": f"as:{i}"} for i, grade in enumerate(GRADES[:4])],
+                         [{"text": str(grade), "callback_data": f"as:{i}"} for i, grade in enumerate(GRADES[4:], 4)],
+                         [INLINE_BACK]]
+# صفحه‌کلید هر شماره سوال یک بار ساخته می‌شود
+inline_keyboards = {}
+
+def inline_answer_keyboard(step):
+    keyboard = inline_keyboards.get(step)
+    if keyboard is None:
+        keyboard = [[{"text": label, "callback_data": f"aa:{step}:{score}"} for label, score in INLINE_ANSWERS]]
+        # سوال اول ممکن است با پایه ارزیابی قبلی شروع شده باشد
+        keyboard.append([{"text": "🎒 تغییر پایه", "callback_data": "ag"}, INLINE_CANCEL] if step == 0 else [INLINE_CANCEL])
+        inline_keyboards[step] = keyboard
+    return keyboard
+
+def inline_question_text(user_state):
+    questions = assessment_questions(user_state.grade, user_state.content)
+    return f"<b>{user_state.grade} · سوال {user_state.step + 1} از {len(questions)}</b>\n{questions[user_state.step]}"
+
+def begin_inline_assessment(chat_id, grade):
+    log_event("ASSESSMENT_STARTED", chat_id, f"Grade: {grade} UI: inline")
+    user_state = get_user_state(chat_id)
+    user_state.grade = grade
+    user_state.step = 0
+    user_state.answers = bytearray()
+    user_state.content = content_bank.current.version
+    return inline_question_text(user_state)
+
+def start_inline_assessment(chat_id):
+    log_event("ASSESSMENT_SHOWN", chat_id, "UI: inline")
+    grade = get_user_state(chat_id).grade
+    if grade is None:
+        safe_send_message(chat_id, INLINE_GRADE_TEXT, INLINE_GRADE_KEYBOARD, inline=True)
+        return
+    # پایه از ارزیابی یا برنامه قبلی معلوم است؛ سوال اول بدون مرحله انتخاب پایه فرستاده می‌شود
+    safe_send_message(chat_id, begin_inline_assessment(chat_id, grade), inline_answer_keyboard(0), inline=True)
+
+def handle_inline_grade(query):
+    try:
+        grade = GRADES[int(query.fields[0])]
+    except (IndexError, ValueError):
+        answer_callback(query)
+        return
+    answer_callback(query)
+    safe_edit_message(query.chat_id, query.message_id, begin_inline_assessment(query.chat_id, grade),
+                      inline_answer_keyboard(0))
+
+def change_inline_grade(query):
+    answer_callback(query)
+    safe_edit_message(query.chat_id, query.message_id, INLINE_GRADE_TEXT, INLINE_GRADE_KEYBOARD)
+
+def handle_inline_answer(query):
+    user_state = get_user_state(query.chat_id)
+    fields = query.fields
+    # دکمه سوالی که قبلاً پاسخ داده شده، یا پیام ارزیابی تمام‌شده یا لغوشده
+    if (user_state.answers is None or len(fields) != 2 or fields[0] != str(user_state.step)
+            or fields[1] not in ('0', '1', '2')):
+        answer_callback(query)
+        return
+
+    log_event("ASSESSMENT_ANSWER", query.chat_id, f"Answer: {fields[1]}")
+    user_state.answers.append(int(fields[1]))
+    user_state.step += 1
+    if user_state.step < len(assessment_questions(user_state.grade, user_state.content)):
+        answer_callback(query)
+        safe_edit_message(query.chat_id, query.message_id, inline_question_text(user_state),
+                          inline_answer_keyboard(user_state.step))
+        return
+
+    answer_callback(query, "✅ ثبت شد")
+    log_event("ASSESSMENT_COMPLETED", query.chat_id, "UI: inline")
+    scores = bytes(user_state.answers)
+    safe_edit_message(query.chat_id, query.message_id,
+                      assessment_result_text(user_state.grade, scores, user_state.content))
+    save_assessment_result(query.chat_id, user_state.grade, scores)
+    user_state.reset_flow()
+
+def cancel_inline_assessment(query):
+    answer_callback(query)
+    get_user_state(query.chat_id).reset_flow()
+    safe_edit_message(query.chat_id, query.message_id, "🔙 ارزیابی لغو شد. از منوی اصلی ادامه دهید.")
+
+# ======== سیستم برنامه‌ریزی ========
+def show_study_planner(chat_id):
+    log_event("PLANNER_SHOWN", chat_id)
+    text = """🎯 <b>سیستم برنامه‌ریزی درسی هوشمند</b>
+
+📊 این سیستم بر اساس:
+• پایه تحصیلی شما
+• سطح درسی
+• زمان‌های در دسترس
+• اهداف تحصیلی
+
+برنامه‌ای شخصی‌سازی شده تولید می‌کند.
+
+👇 لطفاً پایه تحصیلی خود را انتخاب کنید:"""
+    
+    buttons = [
+        [{"text": "📚 ششم"}, {"text": "📚 هفتم"}, {"text": "📚 هشتم"}],
+        [{"text": "📚 نهم"}, {"text": "🎯 دهم"}, {"text": "🎯 یازدهم"}],
+        [{"text": "🎯 دوازدهم"}, {"text": "🔙 بازگشت به منو"}]
+    ]
+    safe_send_message(chat_id, text, buttons)
+
+def create_detailed_study_plan(chat_id, grade):
+    safe_send_message(chat_id, content_bank.current.plan_text(grade), create_main_menu())
+    log_event("DETAILED_PLAN_CREATED", chat_id, f"Grade: {grade}")
+
+# ======== سیستم آلارم مطالعه ========
+def show_alarm_system(chat_id):
+    log_event("ALARM_SYSTEM", chat_id)
+    text = """⏰ <b>سیستم آلارم مطالعه هوشمند</b>
+
+🎯 <b>ویژگی‌ها:</b>
+• ⏰ یادآور زمان مطالعه
+• ☕ هشدار زمان استراحت
+
+👇 لطفاً نوع سرویس مورد نیاز را انتخاب کنید:"""
+    
+    buttons = [
+        [{"text": "⏰ تنظیم آلارم"}, {"text": "📊 عادات مطالعه"}],
+        [{"text": "🔙 بازگشت به منو"}]
+    ]
+    safe_send_message(chat_id, text, buttons)
+
+def start_alarm_setup(chat_id):
+    user_state = get_user_state(chat_id)
+    user_state.alarm_draft = None
+    
+    text = """⏰ <b>تنظیم آلارم جدید</b>
+لطفاً نوع آلارم را انتخاب کنید:"""
+    
+    buttons = [
+        [{"text": "📚 آلارم مطالعه"}, {"text": "☕ آلارم استراحت"}],
+        [{"text": "🔙 بازگشت"}]
+    ]
+    safe_send_message(chat_id, text, buttons)
+
+def ask_alarm_time(chat_id):
+    text = """🕒 <b>زمان آلارم</b>
+لطفاً زمان آلارم را انتخاب کنید:"""
+    
+    buttons = [
+        [{"text": "۰۷:۰۰"}, {"text": "۰۸:۰۰"}, {"text": "۰۹:۰۰"}],
+        [{"text": "۱۴:۰۰"}, {"text": "۱۶:۰۰"}, {"text": "۱۸:۰۰"}],
+        [{"text": "🔙 بازگشت"}]
+    ]
+    safe_send_message(chat_id, text, buttons)
+
+def ask_alarm_days(chat_id):
+    text = """📅 <b>روزهای هفته</b>
+لطفاً روزهای فعال بودن آلارم را انتخاب کنید:"""
+    
+    buttons = [
+        [{"text": "شنبه"}, {"text": "یکشنبه"}, {"text": "دوشنبه"}],
+        [{"text": "سه‌شنبه"}, {"text": "چهارشنبه"}, {"text": "پنجشنبه"}],
+        [{"text": "جمعه"}, {"text": "🎯 همه روزها"}, {"text": "✅ تایید"}],
+        [{"text": "🔙 بازگشت"}]
+    ]
+    safe_send_message(chat_id, text, buttons)
+
+def is_valid_time(time_str):
+    # دکمه‌های خود بات ارقام فارسی دارند («۰۷:۰۰»)؛ parse_alarm_time متن را نرمال می‌کند
+    try:
+        parse_alarm_time(time_str)
+        return True
+    except ValueError:
+        return False
+
+def cancel_alarm_setup(chat_id):
+    get_user_state(chat_id).alarm_draft = None
+    show_alarm_system(chat_id)
+
+def choose_alarm_type(chat_id, user_text):
+    alarm_types = {
+        "📚 آلارم مطالعه": AlarmType.STUDY,
+        "☕ آلارم استراحت": AlarmType.BREAK
+    }
+    get_user_state(chat_id).draft_alarm().type = alarm_types[user_text]
+    ask_alarm_time(chat_id)
+
+def choose_alarm_time(chat_id, user_text):
+    if not is_valid_time(user_text):
+        safe_send_message(chat_id, "⚠️ زمان نامعتبر! لطفاً از دکمه‌ها استفاده کنید.")
+        return STAY
+    hour, minute = parse_alarm_time(user_text)
+    get_user_state(chat_id).draft_alarm().minute = hour * 60 + minute
+    ask_alarm_days(chat_id)
+
+def process_alarm_days(chat_id, day_text):
+    draft = get_user_state(chat_id).draft_alarm()
+    if day_text == "🎯 همه روزها":
+        draft.days = ALL_DAYS
+        safe_send_message(chat_id, "✅ آلارم برای همه روزهای هفته فعال می‌شود")
+    elif day_text in DAY_TO_WEEKDAY and (draft.days == ALL_DAYS or not draft.days & day_bit(day_text)):
+        # انتخاب یک روز بعد از «همه روزها» از نو شروع می‌شود
+        draft.days = day_bit(day_text) if draft.days == ALL_DAYS else draft.days | day_bit(day_text)
+        safe_send_message(chat_id, f"✅ روزهای انتخاب شده: {draft.days_text()}")
+
+def save_alarm(chat_id):
+    user_state = get_user_state(chat_id)
+    draft = user_state.draft_alarm()
+    alarm = Alarm(len(user_state.alarms) + 1, draft.type, draft.minute, draft.days or ALL_DAYS)
+    user_state.add_alarm(alarm)
+    # ایندکس جداگانه آلارم‌ها تا زمان‌بند در شروع برنامه فقط همین‌ها را بخواند
+    state_store.write('alarms', chat_id, [a.to_dict() for a in user_state.alarms])
+    alarm_scheduler.schedule(chat_id, alarm)
+    text = f"""✅ <b>آلارم با موفقیت تنظیم شد</b>
+• نوع: {alarm.type}
+• زمان: {alarm.time}
+• روزها: {alarm.days_text()}"""
+    
+    safe_send_message(chat_id, text, create_main_menu())
+    user_state.alarm_draft = None
+
+def show_user_alarms(chat_id):
+    user_state = get_user_state(chat_id)
+    if not user_state.alarms:
+        text = "⏰ شما هیچ آلارم فعالی ندارید."
+    else:
+        text = "⏰ <b>آلارم‌های فعال شما:</b>\n"
+        for alarm in user_state.alarms:
+            text += f"• {alarm.type} - {alarm.time}\n"
+    
+    safe_send_message(chat_id, text, create_main_menu())
+
+def send_alarm_reminder(chat_id, alarm):
+    if alarm.type is AlarmType.BREAK:
+        text = "☕ <b>زمان استراحت!</b>\nچند دقیقه از پشت میز بلند شوید و کمی آب بنوشید."
+    else:
+        text = "⏰ <b>زمان مطالعه!</b>\nبرنامه امروزتان را شروع کنید. موفق باشید 🌟"
+    safe_send_message(chat_id, text)
+    log_event("ALARM_FIRED", chat_id, f"Alarm: {alarm.id} {alarm.time}")
+
+alarm_scheduler = AlarmScheduler(send_alarm_reminder)
+
+# ======== سیستم مدیریت استرس ========
+def show_stress_management(chat_id):
+    log_event("STRESS_MANAGEMENT", chat_id)
+    text = """😊 <b>مدیریت استرس و اضطراب</b>
+لطفاً سطح استرس خود را انتخاب کنید:"""
+    
+    buttons = [
+        [{"text": "🟢 کم"}, {"text": "🟡 متوسط"}],
+        [{"text": "🟠 زیاد"}, {"text": "🔴 بسیار زیاد"}],
+        [{"text": "🔙 بازگشت به منو"}]
+    ]
+    safe_send_message(chat_id, text, buttons)
+
+def handle_stress_assessment(chat_id, stress_level):
+    if stress_level == "🔙 بازگشت به منو":
+        show_welcome(chat_id, "کاربر")
+        return
+    
+    response = content_bank.current.stress_response(stress_level)
+    safe_send_message(chat_id, response, create_main_menu())
+
+# ======== سایر سیستم‌ها ========
+def show_progress_tracking(chat_id):
+    log_event("PROGRESS_SHOWN", chat_id)
+    if not progress_tracker.ready.is_set():
+        safe_send_message(chat_id, "⏳ سابقه ارزیابی‌ها در حال بارگذاری است؛ چند لحظه دیگر دوباره امتحان کنید.",
+                          create_main_menu())
+        return
+    report = progress_tracker.report(chat_id)
+    if report is None:
+        text = """📈 <b>پیگیری پیشرفت تحصیلی</b>
+
+هنوز ارزیابی ثبت نکرده‌اید.
+از گزینه «📊 ارزیابی تحصیلی» شروع کنید تا پیشرفت شما اینجا نمایش داده شود."""
+        safe_send_message(chat_id, text, create_main_menu())
+        return
+
+    _, last_score, last_max, last_percent = report['last']
+    if report['trend'] > 2:
+        trend = "📈 رو به پیشرفت"
+    elif report['trend'] < -2:
+        trend = "📉 رو به افت"
+    else:
+        trend = "➖ ثابت"
+
+    recent = "\n".join(f"• {ts[:10]}: {score} از {max_score}" for ts, score, max_score, _ in reversed(report['recent']))
+    questions = "\n".join(f"• سوال {i + 1}: {avg:.1f} از 2" for i, avg in enumerate(report['question_averages']))
+
+    text = f"""📈 <b>پیگیری پیشرفت تحصیلی</b>
+
+🎒 <b>پایه:</b> {report['grade']}
+📝 <b>تعداد ارزیابی‌ها:</b> {report['count']}
+⭐ <b>آخرین امتیاز:</b> {last_score} از {last_max} ({last_percent:.0f}٪)
+📊 <b>میانگین:</b> {report['average']:.0f}٪ | <b>بهترین:</b> {report['best']:.0f}٪
+🧭 <b>روند:</b> {trend}
+
+🗓 <b>آخرین ارزیابی‌ها:</b>
+{recent}
+
+📋 <b>میانگین هر سوال:</b>
+{questions}"""
+
+    cohort = report['cohort']
+    if report['percentile'] is not None and cohort:
+        text += f"""
+
+👥 <b>مقایسه با هم‌پایه‌ها ({cohort['size']} نفر):</b>
+امتیاز شما از {report['percentile']}٪ دانش‌آموزان پایه {report['grade']} بهتر یا برابر است.
+میانه پایه: {cohort['p50']:.0f}٪"""
+
+    safe_send_message(chat_id, text, create_main_menu())
+
+def show_help(chat_id):
+    text = """ℹ️ <b>راهنمای استفاده</b>
+
+🎓 <b>خدمات موجود:</b>
+• 📊 ارزیابی تحصیلی
+• 🎯 برنامه‌ریزی درسی  
+• ⏰ آلارم مطالعه
+• 😊 مدیریت استرس
+
+📞 <b>مشاوره:</b> 09121094069"""
+    safe_send_message(chat_id, text, create_main_menu())
+
+def show_consultation(chat_id):
+    safe_send_message(chat_id, "📞 برای مشاوره با شماره 09121094069 تماس بگیرید", create_main_menu())
+
+def show_menu_hint(chat_id, text):
+    # متن‌هایی که به هیچ نیتی نرسیدند؛ پیکره bench/intents.py از همین رویدادها ساخته می‌شود
+    log_event("INPUT_UNMATCHED", chat_id, f"Text: {text}")
+    safe_send_message(chat_id, "⚠️ لطفاً از منوی زیر انتخاب کنید:", create_main_menu())
+
+def expire_sessions():
+    # هر دور فقط تعداد محدودی نشست منقضی می‌شود، مستقل از تعداد کل کاربران
+    expired = user_states.expire(SESSION_EXPIRY_BATCH)
+    if expired:
+        log_event("SESSIONS_EXPIRED", "SYSTEM", f"Expired: {expired} Total: {user_states.expired_total}")
+
+# ======== جریان‌های گفتگو ========
+GRADE_BUTTONS = ["📚 ششم", "📚 هفتم", "📚 هشتم", "📚 نهم", "🎯 دهم", "🎯 یازدهم", "🎯 دوازدهم"]
+
+def grade_of(text):
+    return Grade(text.split(" ")[1])
+
+MAIN_MENU_FLOW = {
+    MENU: {
+        'routes': {
+            "/start": (lambda m: show_welcome(m.chat_id, m.name), MENU),
+            "🔙 بازگشت به منو": (lambda m: show_welcome(m.chat_id, m.name), MENU),
+            "📊 ارزیابی تحصیلی": ((lambda m: start_inline_assessment(m.chat_id), MENU) if ASSESSMENT_UI == 'inline'
+                                else (lambda m: show_educational_assessment(m.chat_id), 'assessment:grade')),
+            "🎯 برنامه‌ریزی": (lambda m: show_study_planner(m.chat_id), 'planner:grade'),
+            "📅 برنامه هفتگی": (lambda m: show_study_planner(m.chat_id), 'planner:grade'),
+            "⏰ آلارم مطالعه": (lambda m: show_alarm_system(m.chat_id), MENU),
+            "⏰ تنظیم آلارم": (lambda m: start_alarm_setup(m.chat_id), 'alarm:type'),
+            "📊 عادات مطالعه": (lambda m: show_user_alarms(m.chat_id), MENU),
+            "😊 مدیریت استرس": (lambda m: show_stress_management(m.chat_id), 'stress:level'),
+            "📈 پیگیری پیشرفت": (lambda m: show_progress_tracking(m.chat_id), MENU),
+            "📞 مشاوره تخصصی": (lambda m: show_consultation(m.chat_id), MENU),
+            "ℹ️ راهنما": (lambda m: show_help(m.chat_id), MENU),
+            # دکمه پایه خارج از هر جریان: نمایش برنامه هفتگی همان پایه
+            **{g: (lambda m: create_detailed_study_plan(m.chat_id, grade_of(m.text)), MENU) for g in GRADE_BUTTONS},
+        },
+        'fallback': (lambda m: show_menu_hint(m.chat_id, m.text), MENU),
+    },
+}
+
+ASSESSMENT_FLOW = {
+    'assessment:grade': {
+        'routes': {g: (lambda m: start_grade_selection(m.chat_id, grade_of(m.text)), 'assessment:question')
+                   for g in GRADE_BUTTONS},
+    },
+    'assessment:question': {
+        'routes': {a: (lambda m: handle_assessment_answer(m.chat_id, m.text), STAY)
+                   for a in ["🟢 عالی", "🟡 متوسط", "🔴 ضعیف", "🔙 بازگشت به منو"]},
+        # پاسخ نامعتبر نادیده گرفته می‌شود و همان سوال فعال می‌ماند
+        'fallback': (lambda m: None, STAY),
+    },
+}
+
+PLANNER_FLOW = {
+    'planner:grade': {
+        'routes': {g: (lambda m: create_detailed_study_plan(m.chat_id, grade_of(m.text)), MENU)
+                   for g in GRADE_BUTTONS},
+    },
+}
+
+ALARM_SETUP_FLOW = {
+    'alarm:type': {
+        'routes': {
+            "📚 آلارم مطالعه": (lambda m: choose_alarm_type(m.chat_id, m.text), 'alarm:time'),
+            "☕ آلارم استراحت": (lambda m: choose_alarm_type(m.chat_id, m.text), 'alarm:time'),
+            "🔙 بازگشت": (lambda m: cancel_alarm_setup(m.chat_id), MENU),
+        },
+        'fallback': (lambda m: safe_send_message(m.chat_id, "⚠️ لطفاً از گزینه‌های موجود انتخاب کنید."), STAY),
+    },
+    'alarm:time': {
+        'routes': {
+            "🔙 بازگشت": (lambda m: cancel_alarm_setup(m.chat_id), MENU),
+        },
+        'fallback': (lambda m: choose_alarm_time(m.chat_id, m.text), 'alarm:days'),
+    },
+    'alarm:days': {
+        'routes': {
+            "✅ تایید": (lambda m: save_alarm(m.chat_id), MENU),
+            "🔙 بازگشت": (lambda m: cancel_alarm_setup(m.chat_id), MENU),
+            **{d: (lambda m: process_alarm_days(m.chat_id, m.text), STAY) for d in [*DAY_TO_WEEKDAY, "🎯 همه روزها"]},
+        },
+        'fallback': (lambda m: process_alarm_days(m.chat_id, m.text), STAY),
+    },
+}
+
+STRESS_FLOW = {
+    'stress:level': {
+        # مسیرهای صریح فقط برای این است که متن تایپ‌شده هم به برچسب دکمه برسد
+        'routes': {s: (lambda m: handle_stress_assessment(m.chat_id, m.text), MENU)
+                   for s in ["🟢 کم", "🟡 متوسط", "🟠 زیاد", "🔴 بسیار زیاد", "🔙 بازگشت به منو"]},
+        'fallback': (lambda m: handle_stress_assessment(m.chat_id, m.text), MENU),
+    },
+}
+
+flow_engine = FlowEngine()
+for flow in (MAIN_MENU_FLOW, ASSESSMENT_FLOW, PLANNER_FLOW, ALARM_SETUP_FLOW, STRESS_FLOW):
+    flow_engine.add_flow(flow)
+flow_engine.add_callbacks({
+    'as': handle_inline_grade,
+    'ag': change_inline_grade,
+    'aa': handle_inline_answer,
+    'ax': cancel_inline_assessment,
+})
+
+# ======== پیام همگانی ========
+# چت‌هایی که بات را مسدود کرده‌اند از مخاطبان پیام همگانی حذف می‌شوند
+blocked_chats = set()
+
+def mark_blocked(chat_id):
+    if chat_id in blocked_chats:
+        return
+    blocked_chats.add(chat_id)
+    state_store.write('blocked', chat_id, {'since': datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
+    log_event("CHAT_BLOCKED", chat_id)
+
+def outbox_failed(chat_id, result):
+    # پیامی که بعد از قطعی از outbox ارسال شد ولی تلگرام آن را رد کرد
+    log_event("SEND_ERROR", chat_id, f"Status: {result.status} Attempts: {result.attempts} Error: {result.error}")
+    if is_blocked(result):
+        mark_blocked(chat_id)
+
+def unblock_chat(chat_id):
+    # کاربری که دوباره پیام داده بات را از مسدودی خارج کرده است
+    if chat_id in blocked_chats:
+        blocked_chats.discard(chat_id)
+        state_store.delete('blocked', chat_id)
+
+def broadcast_audience(target):
+    # progress_tracker فقط نتایج ثبت‌شده در همین کارگر را بعد از راه‌اندازی دارد؛ مخاطبان از خود ذخیره‌ساز خوانده می‌شوند
+    results_store.flush()
+    if target in ('all', 'همه'):
+        chat_ids = state_store.chat_ids('states') | results_store.chat_ids()
+    else:
+        chat_ids = results_store.chat_ids(grade=target)
+    return chat_ids - blocked_chats - state_store.chat_ids('blocked')
+
+def report_broadcast(admin_chat_id, job):
+    text = f"""📣 <b>پیام همگانی #{job['id']} تمام شد</b>
+• مخاطبان: {job['audience']} ({job['total']} نفر)
+• ارسال موفق: {job['sent']}
+• ناموفق: {job['failed']}
+• مسدودکرده (حذف از فهرست): {job['blocked']}"""
+    safe_send_message(admin_chat_id, text)
+
+broadcaster = Broadcaster(sender, on_blocked=mark_blocked, on_done=report_broadcast)
+
+# snapshot افزایشی وضعیت نشست‌ها و آلارم‌ها، نتایج ارزیابی و پیام‌های همگانی در SNAPSHOT_DIR
+snapshotter = Snapshotter(SnapshotStore())
+snapshotter.add_sqlite('state', state_store.path, before=state_store.flush)
+add_results_source(snapshotter, results_store, before=results_store.flush)
+snapshotter.add_sqlite('broadcasts', broadcaster.path)
+snapshotter.add_sqlite('outbox', outbox.path)
+
+def handle_admin_command(chat_id, user_text):
+    command, _, rest = user_text.partition('\n')
+    parts = command.split()
+    if parts[0] == '/broadcast' and len(parts) > 1 and rest.strip():
+        # دکمه پایه (مثل «📚 نهم») هم به عنوان مخاطب پذیرفته می‌شود
+        target = parts[-1]
+        chat_ids = broadcast_audience(target)
+        if not chat_ids:
+            safe_send_message(chat_id, f"⚠️ مخاطبی برای «{target}» پیدا نشد.")
+            return
+        job_id = broadcaster.create(chat_id, target, rest.strip(), chat_ids)
+        log_event("BROADCAST_STARTED", chat_id, f"Job: {job_id} Audience: {target} ({len(chat_ids)})")
+        safe_send_message(chat_id, f"📣 پیام همگانی #{job_id} برای {len(chat_ids)} نفر در حال ارسال است.")
+    elif parts[0] == '/broadcast_status':
+        lines = [f"#{j['id']} {j['audience']} [{j['status']}]: {j['sent']}/{j['total']} ارسال، "
+                 f"{j['failed']} ناموفق، {j['blocked']} مسدود" for j in broadcaster.jobs()]
+        safe_send_message(chat_id, "📣 <b>پیام‌های همگانی اخیر</b>\n" + ("\n".join(lines) or "—"))
+    elif parts[0] == '/broadcast_cancel' and len(parts) > 1 and parts[1].isdigit():
+        cancelled = broadcaster.cancel(int(parts[1]))
+        safe_send_message(chat_id, "⛔ متوقف شد." if cancelled else "⚠️ پیام همگانی در حال اجرایی با این شماره نیست.")
+    elif parts[0] == '/profile' and (len(parts) == 1 or parts[1].isdigit()):
+        # /profile در حال اجرا را متوقف می‌کند؛ /profile ثانیه پروفایل جدیدی شروع می‌کند
+        if profiler.running:
+            safe_send_message(chat_id, profile_report_text(profiler.stop()))
+            return
+        seconds = int(parts[1]) if len(parts) > 1 else 30
+        profiler.start(seconds, on_done=lambda report: safe_send_message(chat_id, profile_report_text(report)))
+        safe_send_message(chat_id, f"🔬 پروفایلر برای {seconds} ثانیه روشن شد.")
+    elif parts[0] == '/trace':
+        if len(parts) > 1:
+            try:
+                tracer.set_sample_rate(float(parts[1]))
+            except ValueError:
+                safe_send_message(chat_id, "⚠️ نرخ ردیابی باید عددی بین 0 و 1 باشد.")
+                return
+        state = f"{tracer.sample_rate:.1%} آپدیت‌ها در {tracer.path}" if tracer.sample_rate else "خاموش"
+        safe_send_message(chat_id, f"🧭 ردیابی: {state}")
+    else:
+        safe_send_message(chat_id, "استفاده:\n/broadcast پایه یا all\nمتن پیام در خطوط بعد\n\n/broadcast_status\n/broadcast_cancel شماره"
+                                   "\n\n/profile [ثانیه]\n/trace [نرخ بین 0 و 1]")
+
+def profile_report_text(report):
+    if report is None or 'error' in report:
+        return f"⚠️ پروفایل ذخیره نشد: {(report or {}).get('error', 'پروفایلر روشن نبود')}"
+    lines = [f"• {frame} — {count * 100 / max(1, report['samples']):.0f}%" for frame, count in report['top']]
+    return (f"🔬 <b>پروفایل {report['seconds']} ثانیه</b> ({report['samples']} نمونه)\n"
+            f"فایل: {report['path']}\n\n" + ("\n".join(lines) or "—"))
+
+# ======== پردازش آپدیت‌ها ========
+def handle_update(update):
+    if "callback_query" in update:
+        handle_callback_query(update["callback_query"])
+        return
+    if "message" not in update:
+        return
+
+    message = update["message"]
+    if "text" not in message:
+        return
+
+    chat_id = message["chat"]["id"]
+    user_text = message["text"]
+    user_name = message["chat"].get("first_name", "کاربر")
+
+    log_event("MESSAGE_RECEIVED", chat_id, f"From: {user_name} Text: {user_text[:30]}")
+
+    try:
+        route_message(chat_id, user_text, user_name)
+    finally:
+        # تغییرات وضعیت این چت برای ذخیره تأخیری در صف قرار می‌گیرد
+        user_states.commit(chat_id)
+
+def handle_callback_query(callback):
+    message = callback.get("message")
+    query = CallbackQuery(callback["id"], message and message["chat"]["id"], message and message["message_id"],
+                          callback.get("data", ""), callback["from"].get("first_name", "کاربر"),
+                          answered=callback.get("_answered", False))
+    if not message:
+        answer_callback(query)
+        return
+    chat_id = query.chat_id
+    log_event("CALLBACK_RECEIVED", chat_id, f"From: {query.name} Data: {query.data}")
+
+    try:
+        unblock_chat(chat_id)
+        get_user_state(chat_id).last_activity = time.time()
+        if flow_engine.handle_callback(query) is None:
+            answer_callback(query)
+    finally:
+        user_states.commit(chat_id)
+
+def route_message(chat_id, user_text, user_name):
+    unblock_chat(chat_id)
+    if chat_id in ADMIN_CHAT_IDS and user_text.startswith(('/broadcast', '/profile', '/trace')):
+        handle_admin_command(chat_id, user_text)
+        return
+    user_state = get_user_state(chat_id)
+    user_state.last_activity = time.time()
+    flow_engine.handle(user_state, Message(chat_id, user_text, user_name, user_state.state))
+
+# ======== حلقه اصلی بات ========
+# حالت دریافت آپدیت: polling (پیش‌فرض) یا webhook
+BOT_MODE = os.environ.get('BOT_MODE', 'polling')
+# تعداد پردازه‌های کارگر؛ ماژول sharding (و multiprocessing) فقط برای بیش از یک کارگر وارد می‌شود
+BOT_WORKERS = int(os.environ.get('BOT_WORKERS', '1'))
+
+SHED_NOTICE = "⏳ لطفاً کمی صبر کنید؛ پیام‌های قبلی شما در حال پردازش است."
+
+def notify_shed(update, notify):
+    """پاسخ ارزان به آپدیتی که پیش از رسیدن به هندلر حذف شده (بدون کیبورد و بدون لاگ)"""
+    callback = update.get("callback_query")
+    if callback:
+        if not callback.get("_answered"):
+            data = {"callback_query_id": callback["id"]}
+            if notify:
+                data["text"] = SHED_NOTICE
+            sender.submit("answerCallbackQuery", data)
+        return
+    message = update.get("message")
+    if notify and message:
+        sender.submit("sendMessage", {"chat_id": message["chat"]["id"], "text": SHED_NOTICE}, durable=False)
+
+dispatcher = Dispatcher(handle_update, admission=AdmissionController(DISPATCH_MAX_PENDING), on_shed=notify_shed,
+                        tracer=tracer)
+dispatcher.every(SESSION_EXPIRY_TICK, expire_sessions)
+dispatcher.every(PROGRESS_COHORT_REFRESH, progress_tracker.refresh_cohorts)
+
+# مقادیر لحظه‌ای فقط هنگام خواندن /metrics محاسبه می‌شوند و هزینه‌ای در مسیر پیام ندارند
+metrics.gauge('bot_sessions_active', 'Active (unexpired) user sessions', func=user_states.active_count)
+metrics.gauge('bot_dispatch_pending', 'Updates waiting for or running a handler', func=lambda: dispatcher.pending)
+metrics.gauge('bot_send_queue_depth', 'Outbound requests waiting for a sender thread', func=sender.queue_depth)
+metrics.gauge('bot_outbox_depth', 'Undelivered replies waiting in the outbox', func=lambda: len(outbox))
+metrics.gauge('bot_alarms_scheduled', 'Alarms in the scheduler heap', func=lambda: len(alarm_scheduler))
+
+def exit_on_sigterm():
+    # در توقف Railway (SIGTERM) خروج عادی انجام می‌شود تا داده‌های در صف ذخیره شوند
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+def install_profiler_signal():
+    signum = getattr(signal, PROFILE_SIGNAL, None)
+    if signum is None:
+        print(f"⚠️ سیگنال {PROFILE_SIGNAL} برای پروفایلر در این سیستم وجود ندارد")
+        return
+    # ذخیره فایل پروفایل در نخ جداگانه انجام می‌شود، نه در خود signal handler
+    signal.signal(signum, lambda signum, frame: threading.Thread(target=profiler.toggle, daemon=True).start())
+
+def load_content_bank():
+    # فایل محتوای خراب باید همین‌جا راه‌اندازی را متوقف کند، نه اینکه در هر هندلر خطا بدهد
+    try:
+        content = content_bank.load()
+    except (ContentError, OSError) as e:
+        print(f"ERROR: محتوای بات از {content_bank.directory} بارگذاری نشد: {e}")
+        sys.exit(1)
+    print(f"📚 نسخه {content.version} محتوا بارگذاری شد")
+
+def start_services(owns_chat=None, metrics_port=metrics.METRICS_PORT, snapshots=True):
+    load_content_bank()
+    event_log.start()
+    if tracer.sample_rate:
+        tracer.start()
+    install_profiler_signal()
+    sender.start()
+    outbox.start(sender, owns_chat, on_failed=outbox_failed)
+    results_store.start()
+    state_store.start()
+    alarm_scheduler.start()
+    content_bank.start()
+    # پیام‌های همگانی نیمه‌تمام (و jobهای کارگری که از کار افتاده) با اجاره در دیتابیس برداشته می‌شوند
+    broadcaster.start()
+    if snapshots:
+        snapshotter.start()
+    startup.mark('services')
+    # کارهای سنگین راه‌اندازی در پس‌زمینه انجام می‌شوند تا دریافت آپدیت‌ها معطل نماند
+    threading.Thread(target=warm_up, args=(owns_chat, metrics_port),
+                     name="warm-up", daemon=True).start()
+
+def warm_up(owns_chat, metrics_port):
+    metrics.start_http_server(metrics_port)
+    load_alarms(owns_chat)
+    blocked_chats.update(state_store.chat_ids('blocked'))
+    # سابقه ارزیابی‌ها فقط یک بار خوانده می‌شود؛ بعد از آن ایندکس پیشرفت افزایشی به‌روز می‌شود
+    # (در حالت چند پردازه‌ای صدک‌ها از سابقه همه چت‌ها به اضافه ارزیابی‌های جدید همین کارگر است)
+    progress_count = progress_tracker.load(results_store.read_all())
+    progress_tracker.refresh_cohorts()
+    print(f"📈 {progress_count} ارزیابی قبلی در ایندکس پیشرفت بارگذاری شد")
+    startup.mark('warm')
+
+def decode_alarms(chat_id, data):
+    alarms = []
+    for item in data:
+        try:
+            alarms.append(Alarm.from_dict(item))
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"⚠️ آلارم نامعتبر برای {chat_id} نادیده گرفته شد: {e}")
+    return alarms
+
+def load_alarms(owns_chat=None):
+    alarms = state_store.load_namespace('alarms')
+    if owns_chat:
+        alarms = ((chat_id, chat_alarms) for chat_id, chat_alarms in alarms if owns_chat(chat_id))
+    alarm_count = alarm_scheduler.load((chat_id, decode_alarms(chat_id, chat_alarms)) for chat_id, chat_alarms in alarms)
+    print(f"⏰ {alarm_count} آلارم فعال بارگذاری شد")
+
+# ======== حالت چند پردازه‌ای ========
+def run_worker(index, worker_count, updates, acks):
+    from .sharding import HashRing, WorkerSource
+
+    exit_on_sigterm()
+    sender.set_global_rate(GLOBAL_RATE / worker_count)
+    ring = HashRing(worker_count)
+    metrics_port = metrics.METRICS_PORT + 1 + index if metrics.METRICS_PORT else 0
+    # هر کارگر فایل لاگ خودش را دارد تا چرخش فایل‌ها با هم تداخل نکند
+    root, ext = os.path.splitext(LOG_PATH)
+    event_log.file.path = f"{root}-worker{index}{ext}"
+    root, ext = os.path.splitext(tracer.path)
+    tracer.path = f"{root}-worker{index}{ext}"
+    # پشتیبان‌گیری فقط در کارگر ۰ (دیتابیس‌ها مشترک هستند)
+    start_services(lambda chat_id: ring.owner(chat_id) == index, metrics_port, snapshots=index == 0)
+
+    def drain(new_worker_count):
+        # صبر تا پایان هندلرهای در جریان، سپس ذخیره وضعیت و رها کردن چت‌ها
+        while dispatcher.pending:
+            time.sleep(0.05)
+        state_store.flush()
+        user_states.clear_memory()
+        alarm_scheduler.clear()
+        new_ring = HashRing(new_worker_count)
+        sender.set_global_rate(GLOBAL_RATE / new_worker_count)
+        load_alarms(lambda chat_id: new_ring.owner(chat_id) == index)
+        outbox.load(lambda chat_id: new_ring.owner(chat_id) == index)
+
+    def stop():
+        while dispatcher.pending:
+            time.sleep(0.05)
+        state_store.flush()
+        results_store.flush()
+        event_log.flush()
+
+    source = WorkerSource(index, updates, acks, on_drain=drain, on_stop=stop)
+    asyncio.run(dispatcher.run(source))
+
+async def serve_sharded_webhook(supervisor):
+    from .webhook import WebhookServer
+
+    # Supervisor رابط submit را دارد و جای Dispatcher محلی به WebhookServer داده می‌شود
+    await WebhookServer(supervisor).start()
+    startup.report('webhook listening')
+    await asyncio.Event().wait()
+
+def run_sharded():
+    from .sharding import Supervisor
+    from .webhook import set_webhook
+
+    # بررسی محتوا پیش از ساختن کارگرها تا Supervisor آن‌ها را مدام دوباره راه نیندازد
+    load_content_bank()
+    supervisor = Supervisor(run_worker, BOT_WORKERS)
+    supervisor.start()
+    # kill -USR1 یک کارگر اضافه و kill -USR2 یک کارگر کم می‌کند
+    signal.signal(signal.SIGUSR1, lambda signum, frame: threading.Thread(target=supervisor.scale, args=(1,)).start())
+    signal.signal(signal.SIGUSR2, lambda signum, frame: threading.Thread(target=supervisor.scale, args=(-1,)).start())
+
+    metrics.gauge('bot_workers', 'Worker processes in the hash ring', func=lambda: supervisor.ring.worker_count)
+    metrics.gauge('bot_worker_restarts', 'Worker processes restarted after a crash', func=lambda: supervisor.restarts)
+    metrics.start_http_server()
+    sender.start()
+    try:
+        if BOT_MODE == 'webhook':
+            set_webhook(sender, ALLOWED_UPDATES)
+            asyncio.run(serve_sharded_webhook(supervisor))
+        else:
+            sender.call("deleteWebhook", {})
+            fetcher = UpdateFetcher(URL, on_first_poll=lambda: startup.report('first getUpdates'))
+            fetcher.start()
+            while True:
+                try:
+                    supervisor.route(fetcher.get_batch(timeout=1))
+                except queue.Empty:
+                    continue
+    finally:
+        supervisor.stop()
+
+def main():
+    if TOKEN is None:
+        print("ERROR: لطفا متغیر محیطی BOT_TOKEN را تنظیم کنید.")
+        sys.exit(1)
+    if BOT_MODE == 'webhook':
+        from .webhook import WEBHOOK_SECRET
+
+        # بدون secret هر کسی که به پورت webhook دسترسی دارد می‌تواند آپدیت جعلی (مثلاً از چت ادمین) بفرستد
+        if not WEBHOOK_SECRET:
+            print("ERROR: در حالت webhook متغیر محیطی WEBHOOK_SECRET الزامی است.")
+            sys.exit(1)
+
+    print("🤖 بات تحصیلی فعال شد...")
+    exit_on_sigterm()
+    if BOT_WORKERS > 1:
+        run_sharded()
+        return
+
+    start_services()
+    if BOT_MODE == 'webhook':
+        from .webhook import WebhookServer, set_webhook, serve as serve_webhook
+
+        set_webhook(sender, ALLOWED_UPDATES)
+        asyncio.run(serve_webhook(dispatcher, WebhookServer(dispatcher),
+                                  on_ready=lambda: startup.report('webhook listening')))
+    else:
+        # webhook فعال مانع getUpdates می‌شود (خطای 409)
+        sender.call("deleteWebhook", {})
+        fetcher = UpdateFetcher(URL, on_first_poll=lambda: startup.report('first getUpdates'))
+        metrics.gauge('bot_fetch_queue_depth', 'Fetched update batches not yet dispatched', func=fetcher.batches.qsize)
+        fetcher.start()
+        asyncio.run(dispatcher.run(fetcher))
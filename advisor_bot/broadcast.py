@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""
+ارسال پیام همگانی - Broadcast Pipeline
+
+مشاورها (ADMIN_CHAT_IDS) با این دستور پیام همگانی می‌فرستند؛ خط اول مخاطبان
+(یک پایه یا all) و بقیه متن پیام است:
+    /broadcast نهم
+    برنامه هفتگی جدید منتشر شد ...
+"""
+
+import html
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from .circuit import CLOSED, Backoff
+from .sender import PRIORITY_BULK, TokenBucket
+
+BROADCAST_DB_PATH = os.environ.get('BROADCAST_DB_PATH', 'broadcasts.db')
+# سهم پیام همگانی از سقف ۳۰ پیام در ثانیه؛ بقیه برای پیام‌های تعاملی می‌ماند
+BROADCAST_RATE = float(os.environ.get('BROADCAST_RATE', '20'))
+# تعداد پیام‌هایی که هم‌زمان در صف ارسال هستند؛ پس از هر پنجره وضعیت ذخیره می‌شود
+BROADCAST_WINDOW = int(os.environ.get('BROADCAST_WINDOW', '30'))
+# گیرنده‌ای که با خطای موقت (شبکه، 5xx، 429) نرفته PENDING می‌ماند؛ بعد از این تعداد دور FAILED می‌شود
+BROADCAST_MAX_ATTEMPTS = int(os.environ.get('BROADCAST_MAX_ATTEMPTS', '5'))
+BROADCAST_RETRY_MAX_BACKOFF = float(os.environ.get('BROADCAST_RETRY_MAX_BACKOFF', '60'))
+# هر job فقط در پردازه‌ای اجرا می‌شود که اجاره آن را دارد؛ اجاره بعد از هر پنجره تمدید می‌شود و
+# اگر پردازه از کار بیفتد بعد از این مدت (ثانیه) کارگر دیگری ارسال را ادامه می‌دهد
+BROADCAST_LEASE = float(os.environ.get('BROADCAST_LEASE', '60'))
+ADMIN_CHAT_IDS = {int(c) for c in os.environ.get('ADMIN_CHAT_IDS', '').replace(' ', '').split(',') if c}
+
+# وضعیت هر گیرنده
+PENDING, SENT, FAILED, BLOCKED = 0, 1, 2, 3
+
+
+def is_blocked(result):
+    """کاربر بات را مسدود کرده، حسابش حذف شده یا چت دیگر وجود ندارد"""
+    if result.status == 403:
+        return True
+    return result.status == 400 and 'chat not found' in (result.error or '').lower()
+
+
+def add_column(conn, table, column, declaration):
+    if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+
+class Broadcaster:
+    """
+    هر پیام همگانی یک job در دیتابیس است و همه گیرنده‌هایش با وضعیت PENDING
+    ثبت می‌شوند. نخ ارسال گیرنده‌ها را به ترتیب chat_id در پنجره‌های کوچک
+    برمی‌دارد، با اولویت پایین (PRIORITY_BULK) در صف همان OutboundSender
+    می‌گذارد و بعد از رسیدن نتیجه‌ها وضعیت کل پنجره را در یک تراکنش ذخیره
+    می‌کند. پس از کرش، ارسال از اولین گیرنده PENDING ادامه پیدا می‌کند؛ فقط
+    پیام‌های همان پنجره‌ای که در لحظه کرش در حال ارسال بود ممکن است تکرار شوند.
+    هر job اجاره‌ای (owner، lease_until) دارد و فقط پردازه صاحب اجاره آن را
+    ارسال می‌کند؛ job پردازه از کارافتاده بعد از پایان اجاره در هر کارگری ادامه می‌یابد.
+    وقتی مدار API باز است ارسال متوقف می‌ماند و گیرنده‌ای که با خطای موقت
+    نرفته PENDING می‌ماند تا دوباره فرستاده شود (حداکثر max_attempts بار).
+    """
+
+    def __init__(self, sender, path=BROADCAST_DB_PATH, rate=BROADCAST_RATE, window=BROADCAST_WINDOW,
+                 max_attempts=BROADCAST_MAX_ATTEMPTS, lease=BROADCAST_LEASE, on_blocked=None, on_done=None):
+        self.sender = sender
+        self.path = path
+        self.rate = rate
+        self.window = window
+        self.max_attempts = max_attempts
+        self.lease = lease
+        # کارگرها با spawn ساخته می‌شوند، پس هر پردازه شناسه خودش را دارد
+        self.owner = f"{os.getpid()}-{secrets.token_hex(4)}"
+        self.on_blocked = on_blocked
+        self.on_done = on_done
+        self._cancelled = set()
+        self._threads = {}
+        self._lock = threading.Lock()
+
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, created TEXT, admin_chat_id INTEGER,
+                audience TEXT, text TEXT, status TEXT, total INTEGER,
+                sent INTEGER DEFAULT 0, failed INTEGER DEFAULT 0, blocked INTEGER DEFAULT 0,
+                owner TEXT, lease_until REAL DEFAULT 0)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS recipients (
+                job_id INTEGER, chat_id INTEGER, status INTEGER, attempts INTEGER DEFAULT 0,
+                PRIMARY KEY (job_id, chat_id)) WITHOUT ROWID""")
+            # دیتابیس‌های ساخته‌شده با نسخه قبلی ستون‌های جدید را ندارند
+            add_column(conn, 'recipients', 'attempts', 'INTEGER DEFAULT 0')
+            add_column(conn, 'jobs', 'owner', 'TEXT')
+            add_column(conn, 'jobs', 'lease_until', 'REAL DEFAULT 0')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def create(self, admin_chat_id, audience, text, chat_ids):
+        """ثبت و شروع یک پیام همگانی؛ شناسه job برگردانده می‌شود"""
+        chat_ids = sorted(set(chat_ids))
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO jobs (created, admin_chat_id, audience, text, status, total, owner, lease_until) "
+                    "VALUES (?, ?, ?, ?, 'running', ?, ?, ?)",
+                    (time.strftime('%Y-%m-%d %H:%M:%S'), admin_chat_id, audience, text, len(chat_ids),
+                     self.owner, time.time() + self.lease))
+                job_id = cursor.lastrowid
+                conn.executemany("INSERT INTO recipients (job_id, chat_id, status) VALUES (?, ?, ?)",
+                                 ((job_id, chat_id, PENDING) for chat_id in chat_ids))
+        finally:
+            conn.close()
+        self._start(job_id)
+        return job_id
+
+    def start(self):
+        """بررسی دوره‌ای jobهایی که اجاره‌شان تمام شده (پردازه قبلی از کار افتاده)"""
+        threading.Thread(target=self._watch, name="broadcast-lease", daemon=True).start()
+
+    def _watch(self):
+        while True:
+            try:
+                self.resume()
+            except Exception as e:
+                print(f"⚠️ خطا در بررسی پیام‌های همگانی نیمه‌تمام: {e}")
+            time.sleep(self.lease / 2)
+
+    def resume(self):
+        """ادامه پیام‌های همگانی نیمه‌تمامی که پردازه دیگری اجاره‌شان را ندارد؛ تعداد jobها"""
+        conn = self._connect()
+        try:
+            job_ids = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE status = 'running' AND lease_until < ?",
+                                                      (time.time(),))]
+            # UPDATE شرطی اتمی است؛ اگر دو کارگر هم‌زمان یک job را ببینند فقط یکی آن را برمی‌دارد
+            claimed = [job_id for job_id in job_ids if self._claim(conn, job_id)]
+        finally:
+            conn.close()
+        for job_id in claimed:
+            print(f"📣 پیام همگانی نیمه‌تمام #{job_id} ادامه پیدا کرد")
+            self._start(job_id)
+        return len(claimed)
+
+    def _claim(self, conn, job_id):
+        with conn:
+            return conn.execute("UPDATE jobs SET owner = ?, lease_until = ? "
+                                "WHERE id = ? AND status = 'running' AND lease_until < ?",
+                                (self.owner, time.time() + self.lease, job_id, time.time())).rowcount == 1
+
+    def cancel(self, job_id):
+        conn = self._connect()
+        try:
+            with conn:
+                changed = conn.execute("UPDATE jobs SET status = 'cancelled' WHERE id = ? AND status = 'running'",
+                                       (job_id,)).rowcount
+        finally:
+            conn.close()
+        if changed:
+            self._cancelled.add(job_id)
+        return bool(changed)
+
+    def _is_running(self, conn, job_id):
+        """تمدید اجاره؛ False اگر job لغو شده (شاید در کارگر دیگر) یا اجاره به پردازه دیگری رسیده باشد"""
+        if job_id in self._cancelled:
+            return False
+        with conn:
+            renewed = conn.execute("UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = 'running'",
+                                   (time.time() + self.lease, job_id, self.owner)).rowcount
+        if not renewed:
+            self._cancelled.add(job_id)
+        return bool(renewed)
+
+    def jobs(self, limit=5):
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "SELECT id, created, audience, status, total, sent, failed, blocked "
+                "FROM jobs ORDER BY id DESC LIMIT ?", (limit,))
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor]
+        finally:
+            conn.close()
+
+    def _start(self, job_id):
+        with self._lock:
+            thread = self._threads.get(job_id)
+            if thread is not None and thread.is_alive():
+                return
+            thread = threading.Thread(target=self._run, args=(job_id,), name=f"broadcast-{job_id}", daemon=True)
+            self._threads[job_id] = thread
+        thread.start()
+
+    def _run(self, job_id):
+        conn = self._connect()
+        bucket = TokenBucket(self.rate, self.rate)
+        finished = False
+        try:
+            text, admin_chat_id = conn.execute("SELECT text, admin_chat_id FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            # متن ادمین HTML نیست؛ یک < یا & تنها باعث می‌شد تلگرام همه پیام‌های job را رد کند
+            text = html.escape(text, quote=False)
+            backoff = Backoff(1, BROADCAST_RETRY_MAX_BACKOFF)
+            while self._is_running(conn, job_id) and self._wait_for_api(conn, job_id):
+                rows = conn.execute(
+                    "SELECT chat_id, attempts FROM recipients WHERE job_id = ? AND status = ? ORDER BY chat_id LIMIT ?",
+                    (job_id, PENDING, self.window)).fetchall()
+                chat_ids = [row[0] for row in rows]
+                if not chat_ids:
+                    with conn:
+                        finished = conn.execute("UPDATE jobs SET status = 'done' WHERE id = ? AND owner = ? "
+                                                "AND status = 'running'", (job_id, self.owner)).rowcount
+                    break
+
+                futures = []
+                for chat_id in chat_ids:
+                    wait = bucket.reserve()
+                    if wait:
+                        time.sleep(wait)
+                    futures.append(self.sender.submit(
+                        "sendMessage", {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}, PRIORITY_BULK))
+                retrying = self._checkpoint(conn, job_id, rows, [f.result() for f in futures])
+                if retrying:
+                    time.sleep(backoff.next())
+                else:
+                    backoff.reset()
+        except Exception as e:
+            print(f"⚠️ خطا در ارسال پیام همگانی {job_id}: {e}")
+            return
+        finally:
+            conn.close()
+
+        if self.on_done and finished:
+            job = next((j for j in self.jobs(limit=50) if j['id'] == job_id), None)
+            if job:
+                self.on_done(admin_chat_id, job)
+
+    def _wait_for_api(self, conn, job_id):
+        """تا بسته شدن مدار صبر می‌کند تا پنجره‌ها در قطعی API پشت سر هم شکست نخورند"""
+        while True:
+            wait = self.sender.breaker.retry_in()
+            if not wait:
+                return True
+            time.sleep(min(wait, 1))
+            if not self._is_running(conn, job_id):
+                return False
+
+    def _checkpoint(self, conn, job_id, rows, results):
+        """تعداد گیرنده‌هایی که برای تلاش دوباره PENDING ماندند"""
+        updates = []
+        counts = {PENDING: 0, SENT: 0, FAILED: 0, BLOCKED: 0}
+        blocked = []
+        # خطای موقت در زمان قطعی API (مدار باز یا نیمه‌باز) از سهم تلاش‌های گیرنده کم نمی‌کند
+        outage = self.sender.breaker.state != CLOSED
+        for (chat_id, attempts), result in zip(rows, results):
+            if result.attempts and not outage:
+                attempts += 1
+            if result.ok:
+                status = SENT
+            elif is_blocked(result):
+                status = BLOCKED
+                blocked.append(chat_id)
+            elif result.transient and attempts < self.max_attempts:
+                status = PENDING
+            else:
+                status = FAILED
+            counts[status] += 1
+            updates.append((status, attempts, job_id, chat_id))
+
+        with conn:
+            # اگر اجاره در این فاصله به پردازه دیگری رسیده، آن پردازه همین پنجره را دوباره ثبت می‌کند
+            owned = conn.execute("UPDATE jobs SET sent = sent + ?, failed = failed + ?, blocked = blocked + ?, "
+                                 "lease_until = ? WHERE id = ? AND owner = ?",
+                                 (counts[SENT], counts[FAILED], counts[BLOCKED], time.time() + self.lease,
+                                  job_id, self.owner)).rowcount
+            if not owned:
+                self._cancelled.add(job_id)
+                return 0
+            conn.executemany("UPDATE recipients SET status = ?, attempts = ? WHERE job_id = ? AND chat_id = ?",
+                             updates)
+
+        if self.on_blocked:
+            for chat_id in blocked:
+                self.on_blocked(chat_id)
+        return counts[PENDING]
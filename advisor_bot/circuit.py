@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+قطع‌کننده مدار و backoff - Circuit Breaker and Backoff
+"""
+
+import os
+import random
+import threading
+import time
+
+from . import metrics
+
+# تعداد خطای پشت سر هم (شبکه یا 5xx) که مدار را باز می‌کند
+BREAKER_THRESHOLD = int(os.environ.get('BREAKER_THRESHOLD', '5'))
+# مدت باز ماندن مدار پس از اولین قطعی؛ با هر شکست دوباره دو برابر می‌شود تا BREAKER_MAX_COOLDOWN
+BREAKER_COOLDOWN = float(os.environ.get('BREAKER_COOLDOWN', '1'))
+BREAKER_MAX_COOLDOWN = float(os.environ.get('BREAKER_MAX_COOLDOWN', '60'))
+# فاصله بررسی دوباره وقتی درخواست آزمایشی نیمه‌باز هنوز در جریان است
+PROBE_POLL_INTERVAL = 0.2
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+BREAKER_STATE = metrics.gauge('bot_telegram_circuit_state', 'Telegram API circuit breaker (0 closed, 1 open, 2 half-open)')
+BREAKER_OPENS = metrics.counter('bot_telegram_circuit_opens_total', 'Times the Telegram API circuit breaker opened')
+
+
+class Backoff:
+    """تأخیر نمایی با jitter (بین نصف و کل مقدار)؛ بعد از موفقیت reset می‌شود"""
+
+    def __init__(self, base, cap):
+        self.base = base
+        self.cap = cap
+        self.attempt = 0
+
+    def next(self):
+        delay = min(self.cap, self.base * 2 ** self.attempt)
+        self.attempt += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class CircuitBreaker:
+    """
+    بسته: همه درخواست‌ها می‌روند. بعد از threshold خطای پشت سر هم باز می‌شود و
+    تا پایان cooldown هیچ درخواستی فرستاده نمی‌شود (فراخواننده بلافاصله جواب
+    می‌گیرد و نخ‌ها پشت یک API از کار افتاده نمی‌مانند). بعد از cooldown نیمه‌باز
+    است: فقط یک درخواست آزمایشی می‌رود؛ موفقیت مدار را می‌بندد و شکست آن را با
+    cooldown دو برابر دوباره باز می‌کند.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self._backoff = Backoff(cooldown, max_cooldown)
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self.opened_until:
+                self._set_state(HALF_OPEN)
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def is_open(self):
+        """True اگر درخواست‌ها فعلاً حتماً رد می‌شوند (بدون مصرف نوبت آزمایشی)"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() < self.opened_until
+
+    def retry_in(self):
+        """ثانیه تا زمانی که درخواست بعدی اجازه دارد (۰ یعنی همین حالا)"""
+        with self._lock:
+            if self.state == OPEN:
+                return max(0.0, self.opened_until - time.monotonic())
+            if self.state == HALF_OPEN and self._probing:
+                return PROBE_POLL_INTERVAL
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._backoff.reset()
+                self._set_state(CLOSED)
+                print("✅ ارتباط با API تلگرام برقرار شد؛ مدار بسته شد")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                cooldown = self._backoff.next()
+                self.opened_until = time.monotonic() + cooldown
+                self._probing = False
+                if self.state == CLOSED:
+                    BREAKER_OPENS.inc()
+                    print(f"⚠️ API تلگرام در دسترس نیست؛ مدار برای {cooldown:.1f} ثانیه باز شد")
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        BREAKER_STATE.set(STATE_VALUES[state])
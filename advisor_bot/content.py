@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+بانک محتوا با بارگذاری مجدد خودکار - Content Bank with Hot Reload
+
+سوالات ارزیابی، برنامه‌های هفتگی و پاسخ‌ها از فایل‌های CONTENT_DIR خوانده می‌شوند
+(برای هر بخش یکی از questions.yaml / questions.yml / questions.json و مانند آن).
+"""
+
+import collections
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from types import MappingProxyType
+
+from . import metrics
+from .user_state import Grade
+
+CONTENT_DIR = os.environ.get('CONTENT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content'))
+# فاصله بررسی تغییر فایل‌ها (ثانیه)؛ ۰ بارگذاری مجدد را غیرفعال می‌کند
+CONTENT_RELOAD_INTERVAL = float(os.environ.get('CONTENT_RELOAD_INTERVAL', '5'))
+# تعداد نسخه‌های قبلی که برای ارزیابی‌های نیمه‌تمام نگه داشته می‌شوند
+CONTENT_HISTORY = int(os.environ.get('CONTENT_HISTORY', '16'))
+# کپی فایل‌های هر نسخه تا ارزیابی نیمه‌تمام بعد از راه‌اندازی مجدد هم همان سوال‌ها را ببیند؛ خالی یعنی غیرفعال
+CONTENT_ARCHIVE_DIR = os.environ.get('CONTENT_ARCHIVE_DIR', 'content_versions')
+
+SECTIONS = ('questions', 'plans', 'responses')
+EXTENSIONS = ('.yaml', '.yml', '.json')
+# امتیازها در callback data دکمه‌های inline هستند (حداکثر ۶۴ بایت)
+MAX_QUESTIONS = 20
+
+CONTENT_RELOADS = metrics.counter('bot_content_reloads_total', 'Content bank reloads', ('result',))
+for _result in ('ok', 'error'):
+    CONTENT_RELOADS.labels(_result)
+
+
+class ContentError(ValueError):
+    pass
+
+
+class Content:
+    """
+    یک نسخه تغییرناپذیر از محتوا. همه جستجوها از قبل برای تک‌تک پایه‌ها حل
+    شده‌اند (پایه بدون سوال یا برنامه اختصاصی به پیش‌فرض اشاره می‌کند) و متن
+    برنامه‌ها از قبل ساخته شده است؛ پس هر پیام فقط یک خواندن dict است.
+    version نسخه کوتاه از sha1 محتوای فایل‌هاست و بعد از راه‌اندازی مجدد هم ثابت می‌ماند.
+    """
+
+    __slots__ = ('version', 'questions', 'plans', 'stress', 'stress_default', 'levels')
+
+    def __init__(self, version, questions, plans, stress, stress_default, levels):
+        self.version = version
+        self.questions = MappingProxyType(questions)
+        self.plans = MappingProxyType(plans)
+        self.stress = MappingProxyType(stress)
+        self.stress_default = stress_default
+        self.levels = levels
+
+    def assessment_questions(self, grade):
+        return self.questions[grade or Grade.SIXTH]
+
+    def plan_text(self, grade):
+        return self.plans[grade]
+
+    def stress_response(self, level):
+        return self.stress.get(level, self.stress_default)
+
+    def assessment_level(self, total_score, max_score):
+        """(وضعیت، توصیه) اولین سطحی که امتیاز به حداقل آن رسیده است"""
+        ratio = total_score / max_score if max_score else 1
+        for minimum, status, recommendation in self.levels:
+            if ratio >= minimum:
+                return status, recommendation
+        return self.levels[-1][1:]
+
+
+def _read_section(directory, section):
+    for ext in EXTENSIONS:
+        path = os.path.join(directory, section + ext)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return path, f.read()
+    raise ContentError(f"{section}: none of {', '.join(section + ext for ext in EXTENSIONS)} in {directory}")
+
+
+def _parse(path, raw):
+    if path.endswith('.json'):
+        return json.loads(raw)
+    # PyYAML فقط وقتی لازم است که فایل YAML باشد
+    import yaml
+
+    return yaml.load(raw, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+def _grade(name, where):
+    grade = Grade.get(name)
+    if grade is None:
+        raise ContentError(f"{where}: unknown grade {name!r}")
+    return grade
+
+
+def _text(value, where):
+    if not isinstance(value, str) or not value.strip():
+        raise ContentError(f"{where}: expected non-empty text")
+    return value.strip()
+
+
+def _compile_questions(data):
+    default = _grade(data.get('default'), 'questions.default')
+    sets = {}
+    for name, questions in (data.get('grades') or {}).items():
+        where = f"questions.grades.{name}"
+        if not isinstance(questions, list) or not 0 < len(questions) <= MAX_QUESTIONS:
+            raise ContentError(f"{where}: expected 1-{MAX_QUESTIONS} questions")
+        sets[_grade(name, where)] = tuple(_text(q, where) for q in questions)
+    if default not in sets:
+        raise ContentError(f"questions.default: {default} has no questions")
+    return {grade: sets.get(grade, sets[default]) for grade in Grade}
+
+
+def _compile_plans(data):
+    def render(plan, grade, where):
+        try:
+            parts = [_text(plan[key], f"{where}.{key}").format(grade=grade)
+                     for key in ('title', 'schedule', 'recommendations')]
+        except (KeyError, TypeError, ValueError, IndexError) as e:
+            raise ContentError(f"{where}: missing or invalid field {e}") from None
+        return "\n\n".join(parts)
+
+    default = data.get('default')
+    grades = {_grade(name, f"plans.grades.{name}"): plan for name, plan in (data.get('grades') or {}).items()}
+    return {grade: render(grades.get(grade, default), grade,
+                          f"plans.grades.{grade}" if grade in grades else "plans.default")
+            for grade in Grade}
+
+
+def _compile_responses(data):
+    stress = {_text(label, 'responses.stress'): _text(text, f"responses.stress.{label}")
+              for label, text in (data.get('stress') or {}).items()}
+    levels = []
+    for i, level in enumerate(data.get('assessment_levels') or ()):
+        where = f"responses.assessment_levels[{i}]"
+        try:
+            levels.append((float(level['min']), _text(level['status'], where), _text(level['recommendation'], where)))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ContentError(f"{where}: missing or invalid field {e}") from None
+    if not levels:
+        raise ContentError("responses.assessment_levels: at least one level is required")
+    levels.sort(reverse=True)
+    return stress, _text(data.get('stress_default'), 'responses.stress_default'), tuple(levels)
+
+
+def load_content(directory=CONTENT_DIR):
+    """همه بخش‌ها را می‌خواند و بررسی می‌کند؛ هر خطا ContentError است و هیچ نسخه نیمه‌کاره‌ای ساخته نمی‌شود"""
+    return _load(directory)[0]
+
+
+def _load(directory):
+    """(Content، لیست (نام فایل، بایت‌ها)) برای بایگانی همان فایل‌هایی که خوانده شده‌اند"""
+    digest = hashlib.sha1()
+    data = {}
+    files = []
+    for section in SECTIONS:
+        path, raw = _read_section(directory, section)
+        digest.update(raw)
+        files.append((os.path.basename(path), raw))
+        try:
+            data[section] = _parse(path, raw) or {}
+        except Exception as e:
+            raise ContentError(f"{path}: {e}") from None
+        if not isinstance(data[section], dict):
+            raise ContentError(f"{path}: expected a mapping at the top level")
+    stress, stress_default, levels = _compile_responses(data['responses'])
+    content = Content(digest.hexdigest()[:8], _compile_questions(data['questions']), _compile_plans(data['plans']),
+                      stress, stress_default, levels)
+    return content, files
+
+
+class ContentBank:
+    """
+    نسخه فعلی محتوا و چند نسخه قبلی. یک نخ پس‌زمینه زمان تغییر فایل‌ها را
+    بررسی می‌کند؛ نسخه جدید کامل ساخته و بررسی می‌شود و سپس فقط یک ارجاع
+    جایگزین می‌شود، پس هندلرها هیچ‌وقت منتظر نمی‌مانند و محتوای نیمه‌کاره
+    نمی‌بینند. اگر فایل جدید خطا داشته باشد نسخه قبلی می‌ماند.
+
+    ارزیابی‌ای که شروع شده version را نگه می‌دارد (همراه وضعیت کاربر ذخیره می‌شود)
+    و با get(version) تا پایان همان سوال‌ها را می‌بیند. فایل‌های هر نسخه در
+    archive_dir کپی می‌شوند تا بعد از راه‌اندازی مجدد هم نسخه قدیمی در دسترس
+    باشد؛ اگر آن نسخه نه در حافظه و نه در بایگانی باشد نسخه فعلی برمی‌گردد.
+    """
+
+    def __init__(self, directory=CONTENT_DIR, reload_interval=CONTENT_RELOAD_INTERVAL, history=CONTENT_HISTORY,
+                 archive_dir=CONTENT_ARCHIVE_DIR):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.archive_dir = archive_dir
+        self._history = collections.OrderedDict()
+        self._capacity = max(1, history)
+        self._current = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """بارگذاری اول؛ خطای ContentError یا OSError باید جلوی راه‌اندازی بات را بگیرد"""
+        with self._lock:
+            self._signature = self._files_signature()
+            self._install(*_load(self.directory))
+            return self._current
+
+    @property
+    def current(self):
+        return self._current
+
+    def get(self, version=None):
+        if version is not None:
+            content = self._history.get(version) or self._load_archived(version)
+            if content is not None:
+                return content
+        return self.current
+
+    def _load_archived(self, version):
+        if not self.archive_dir:
+            return None
+        path = os.path.join(self.archive_dir, version)
+        if not os.path.isdir(path):
+            return None
+        with self._lock:
+            content = self._history.get(version)
+            if content is not None:
+                return content
+            try:
+                content = load_content(path)
+            except (ContentError, OSError) as e:
+                print(f"⚠️ نسخه {version} محتوا از بایگانی خوانده نشد: {e}")
+                return None
+            if content.version != version:
+                return None
+            # تا بارگذاری بعدی که اندازه تاریخچه را کوتاه می‌کند در حافظه می‌ماند
+            self._history[version] = content
+            return content
+
+    def reload(self, force=False):
+        """True اگر نسخه جدیدی جایگزین شد"""
+        with self._lock:
+            signature = self._files_signature()
+            if signature == self._signature and not force:
+                return False
+            self._signature = signature
+            try:
+                content, files = _load(self.directory)
+            except (ContentError, OSError) as e:
+                CONTENT_RELOADS.labels('error').inc()
+                print(f"⚠️ محتوای جدید بارگذاری نشد و نسخه قبلی باقی ماند: {e}")
+                return False
+            if self._current is not None and content.version == self._current.version:
+                return False
+            self._install(content, files)
+        CONTENT_RELOADS.labels('ok').inc()
+        print(f"📚 نسخه {content.version} محتوا بارگذاری شد")
+        return True
+
+    def start(self):
+        if not self.reload_interval:
+            return
+        threading.Thread(target=self._run, name="content-reload", daemon=True).start()
+
+    def _install(self, content, files):
+        self._history[content.version] = content
+        self._history.move_to_end(content.version)
+        while len(self._history) > self._capacity:
+            self._history.popitem(last=False)
+        self._current = content
+        if self.archive_dir:
+            try:
+                self._archive(content.version, files)
+            except OSError as e:
+                print(f"⚠️ خطا در بایگانی نسخه {content.version} محتوا: {e}")
+
+    def _archive(self, version, files):
+        path = os.path.join(self.archive_dir, version)
+        if not os.path.isdir(path):
+            # در حالت چند پردازه‌ای چند کارگر ممکن است هم‌زمان همین نسخه را بنویسند؛ rename اتمی است
+            tmp = f"{path}.tmp-{os.getpid()}"
+            os.makedirs(tmp, exist_ok=True)
+            for name, raw in files:
+                with open(os.path.join(tmp, name), 'wb') as f:
+                    f.write(raw)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.utime(path)
+
+        # فقط capacity نسخه آخر نگه داشته می‌شود (قدیمی‌ترین بر اساس زمان نصب)
+        versions = [os.path.join(self.archive_dir, name) for name in os.listdir(self.archive_dir)
+                    if '.tmp-' not in name]
+        versions.sort(key=os.path.getmtime, reverse=True)
+        for old in versions[self._capacity:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def _files_signature(self):
+        signature = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(EXTENSIONS):
+                stat = os.stat(os.path.join(self.directory, name))
+                signature.append((name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _run(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"⚠️ خطا در بررسی فایل‌های محتوا: {e}")
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+توزیع‌کننده آپدیت‌ها با asyncio - Update Dispatcher
+"""
+
+import asyncio
+import collections
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+
+# حداکثر تعداد هندلرهایی که هم‌زمان اجرا می‌شوند
+DISPATCH_CONCURRENCY = int(os.environ.get('DISPATCH_CONCURRENCY', '16'))
+# حداکثر آپدیت‌های در انتظار؛ بیش از این، دریافت آپدیت جدید متوقف می‌شود
+DISPATCH_MAX_PENDING = int(os.environ.get('DISPATCH_MAX_PENDING', '1000'))
+
+UPDATES_TOTAL = metrics.counter('bot_updates_total', 'Updates accepted by the dispatcher')
+UPDATE_AGE = metrics.histogram('bot_update_age_seconds', 'Update age on arrival (polling lag)',
+                               buckets=(0.5, 1, 2, 5, 10, 30, 60, 300))
+HANDLER_ERRORS = metrics.counter('bot_handler_errors_total', 'Updates whose handler raised')
+
+
+def chat_key(update):
+    """شناسه چتی که آپدیت به آن تعلق دارد؛ ترتیب پیام‌ها بر اساس همین کلید حفظ می‌شود."""
+    for field in ("message", "edited_message", "channel_post"):
+        if field in update:
+            return update[field]["chat"]["id"]
+    if "callback_query" in update:
+        message = update["callback_query"].get("message")
+        if message:
+            return message["chat"]["id"]
+        return update["callback_query"]["from"]["id"]
+    return ("update", update.get("update_id"))
+
+
+def update_date(update):
+    """زمان ارسال پیام از سمت کاربر (ثانیه یونیکس) یا None"""
+    for field in ("message", "edited_message", "channel_post"):
+        if field in update:
+            return update[field].get("date")
+    message = update.get("callback_query", {}).get("message")
+    return message.get("date") if message else None
+
+
+class Dispatcher:
+    """
+    آپدیت‌های چت‌های مختلف را هم‌زمان پردازش می‌کند ولی پیام‌های یک چت
+    دقیقاً به همان ترتیب رسیدن اجرا می‌شوند. هندلرها توابع معمولی (بلاک‌کننده)
+    هستند و در یک thread pool با اندازه محدود اجرا می‌شوند.
+    """
+
+    def __init__(self, handler, concurrency=DISPATCH_CONCURRENCY, max_pending=DISPATCH_MAX_PENDING,
+                 admission=None, on_shed=None, tracer=None):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        # AdmissionController اختیاری؛ on_shed(update, notify) برای آپدیت‌های حذف‌شده
+        # در thread pool پیش‌فرض اجرا می‌شود (مثلاً پاسخ «لطفاً صبر کنید»)
+        self.admission = admission
+        self.on_shed = on_shed
+        # tracing.Tracer اختیاری؛ Trace آپدیت‌های انتخاب‌شده در update['_trace'] قرار می‌گیرد
+        self.tracer = tracer
+        self.pending = 0
+        self._chats = {}
+        self._tasks = set()
+        self._periodic = []
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="handler")
+        self._semaphore = None
+        self._has_room = None
+
+    def every(self, interval, func):
+        """اجرای دوره‌ای یک تابع (مثل پاک‌سازی نشست‌ها) بدون بلاک کردن هندلرها"""
+        self._periodic.append((interval, func))
+
+    async def submit(self, update):
+        key = chat_key(update)
+        # پذیرش پیش از کنترل جریان: پیام اضافه یک چت پرکار نباید دریافت بقیه را متوقف کند
+        if self.admission is not None:
+            reason = self.admission.check(key, update, self.pending, self._chats.get(key))
+            if reason:
+                self._shed(key, update, reason)
+                return
+
+        # کنترل جریان: تا وقتی صف پر است منتظر می‌ماند
+        while self.pending >= self.max_pending:
+            self._has_room.clear()
+            await self._has_room.wait()
+
+        self.pending += 1
+        UPDATES_TOTAL.inc()
+        sent_at = update_date(update)
+        if sent_at:
+            UPDATE_AGE.observe(max(0.0, time.time() - sent_at))
+        if self.tracer is not None:
+            trace = self.tracer.begin(update.get("update_id"), key)
+            if trace is not None:
+                update["_trace"] = trace
+        chat_queue = self._chats.get(key)
+        if chat_queue is None:
+            chat_queue = self._chats[key] = collections.deque([update])
+            self._spawn(self._drain_chat(key, chat_queue))
+        else:
+            chat_queue.append(update)
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._has_room = asyncio.Event()
+        for interval, func in self._periodic:
+            self._spawn(self._run_periodic(interval, func))
+
+    async def run(self, fetcher):
+        """حالت polling: دسته‌های آپدیت را از UpdateFetcher می‌گیرد"""
+        loop = asyncio.get_running_loop()
+        await self.start()
+
+        while True:
+            try:
+                # timeout کوتاه تا نخ کمکی هنگام خروج برنامه آزاد شود
+                batch = await loop.run_in_executor(None, fetcher.get_batch, 1)
+            except queue.Empty:
+                continue
+            for update in batch:
+                await self.submit(update)
+
+    def _shed(self, key, update, reason):
+        notify = self.admission.shed(key, reason)
+        # دکمه شیشه‌ای بدون پاسخ تا چند ثانیه در حالت «در حال بارگذاری» می‌ماند
+        if self.on_shed is not None and (notify or "callback_query" in update):
+            asyncio.get_running_loop().run_in_executor(None, self._run_on_shed, update, notify)
+
+    def _run_on_shed(self, update, notify):
+        try:
+            self.on_shed(update, notify)
+        except Exception as e:
+            print(f"⚠️ خطا در پاسخ به آپدیت حذف‌شده {update.get('update_id')}: {e}")
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain_chat(self, key, chat_queue):
+        loop = asyncio.get_running_loop()
+        try:
+            while chat_queue:
+                update = chat_queue[0]
+                async with self._semaphore:
+                    await loop.run_in_executor(self._executor, self._run_handler, update)
+                chat_queue.popleft()
+                self.pending -= 1
+                self._has_room.set()
+        finally:
+            # بین خالی شدن صف و حذف کلید هیچ await وجود ندارد، پس پیامی گم نمی‌شود
+            del self._chats[key]
+
+    def _run_handler(self, update):
+        trace = update.get("_trace")
+        if trace is not None:
+            trace.activate()
+        error = None
+        try:
+            self.handler(update)
+        except Exception as e:
+            error = type(e).__name__
+            HANDLER_ERRORS.inc()
+            print(f"⚠️ خطا در پردازش آپدیت {update.get('update_id')}: {e}")
+        finally:
+            if trace is not None:
+                trace.finish(error)
+
+    async def _run_periodic(self, interval, func):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, func)
+            except Exception as e:
+                print(f"⚠️ خطا در اجرای دوره‌ای {func.__name__}: {e}")
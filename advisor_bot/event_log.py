@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+لاگ رویدادها با صف و نوشتن دسته‌ای - Buffered Structured Event Log
+
+هر رویداد به صورت یک خط JSON در bot_logs.jsonl نوشته می‌شود، مثلاً:
+    {"ts": "2024-05-01 08:00:00", "event": "MESSAGE_SENT", "chat_id": 42, "details": "..."}
+"""
+
+import atexit
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from . import metrics
+
+LOG_PATH = os.environ.get('LOG_PATH', 'bot_logs.jsonl')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', '1'))
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', '1000'))
+# چرخش فایل بر اساس حجم (بایت) و زمان (ثانیه)؛ مقدار 0 هر کدام را غیرفعال می‌کند
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_ROTATE_INTERVAL = float(os.environ.get('LOG_ROTATE_INTERVAL', '86400'))
+LOG_BACKUPS = int(os.environ.get('LOG_BACKUPS', '7'))
+LOG_COMPRESS = os.environ.get('LOG_COMPRESS', '1') == '1'
+# رفتار در صف پر: drop_new (رویداد جدید دور ریخته می‌شود)، drop_old (قدیمی‌ترین) یا block
+LOG_OVERFLOW = os.environ.get('LOG_OVERFLOW', 'drop_new')
+# چاپ رویدادها در خروجی استاندارد (لاگ Railway) توسط همان نخ نویسنده
+LOG_CONSOLE = os.environ.get('LOG_CONSOLE', '1') == '1'
+
+OVERFLOW_POLICIES = ('drop_new', 'drop_old', 'block')
+
+LOG_DROPPED = metrics.counter('bot_log_dropped_total', 'Log records dropped because the queue was full')
+LOG_WRITE_LATENCY = metrics.histogram('bot_log_write_seconds', 'Time to write one batch of log records')
+
+
+class RotatingFile:
+    """فایل لاگ با چرخش بر اساس حجم و زمان و نگه‌داری تعداد محدودی نسخه قدیمی"""
+
+    def __init__(self, path, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_INTERVAL,
+                 backups=LOG_BACKUPS, compress=LOG_COMPRESS, header=''):
+        self.path = path
+        # در ابتدای هر فایل جدید نوشته می‌شود (مثلاً «[» برای فایل ردیابی)
+        self.header = header
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backups = backups
+        self.compress = compress
+        self._file = None
+        self._size = 0
+        self._opened_at = 0
+
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+        try:
+            # زمان شروع فایل موجود از آخرین تغییر آن تخمین زده می‌شود
+            self._opened_at = os.path.getctime(self.path) if self._size else time.time()
+        except OSError:
+            self._opened_at = time.time()
+        if self.header and not self._size:
+            self._file.write(self.header)
+            self._size = len(self.header.encode('utf-8'))
+
+    def write(self, text):
+        if self._file is None:
+            self._open()
+        elif self._should_rotate():
+            self.rotate()
+        self._file.write(text)
+        self._file.flush()
+        self._size += len(text.encode('utf-8'))
+
+    def _should_rotate(self):
+        if not self._size:
+            return False
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.interval) and time.time() - self._opened_at >= self.interval
+
+    def rotate(self):
+        self.close()
+        rotated = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        os.replace(self.path, rotated)
+        if self.compress:
+            # فشرده‌سازی در نخ جداگانه تا نوشتن رویدادهای جدید معطل نشود
+            threading.Thread(target=self._compress, args=(rotated,), name="log-compress", daemon=True).start()
+        else:
+            self._prune()
+        self._open()
+
+    def _compress(self, rotated):
+        try:
+            with open(rotated, 'rb') as src, gzip.open(rotated + '.gz', 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        except OSError as e:
+            print(f"⚠️ خطا در فشرده‌سازی {rotated}: {e}")
+        self._prune()
+
+    def _prune(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + '.'
+        old = sorted(f for f in os.listdir(directory) if f.startswith(prefix))
+        for name in old[:-self.backups] if self.backups else old:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class EventLog:
+    """
+    log فقط یک tuple را در صف حافظه می‌گذارد؛ قالب‌بندی، چاپ و نوشتن در فایل
+    به صورت دسته‌ای در نخ پس‌زمینه انجام می‌شود.
+    """
+
+    def __init__(self, path=LOG_PATH, queue_size=LOG_QUEUE_SIZE, overflow=LOG_OVERFLOW,
+                 flush_interval=LOG_FLUSH_INTERVAL, batch_size=LOG_BATCH_SIZE, console=LOG_CONSOLE):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"LOG_OVERFLOW must be one of {OVERFLOW_POLICIES}, not {overflow!r}")
+        self.file = RotatingFile(path)
+        self.overflow = overflow
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.console = console
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def log(self, event_type, chat_id, details=""):
+        record = (time.time(), event_type, chat_id, details)
+        if self.overflow == 'block':
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            if self.overflow == 'drop_old':
+                try:
+                    self._queue.get_nowait()
+                    self._queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+            self.dropped += 1
+            LOG_DROPPED.inc()
+
+    def flush(self, timeout=10):
+        """تا نوشته شدن همه رویدادهای در صف منتظر می‌ماند"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def _run(self):
+        while True:
+            records = []
+            waiters = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                records.append(item)
+                remaining = deadline - time.monotonic()
+                if len(records) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if records:
+                try:
+                    with LOG_WRITE_LATENCY.time():
+                        self._write(records)
+                except Exception as e:
+                    print(f"⚠️ خطا در نوشتن {len(records)} رویداد لاگ: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, records):
+        lines = []
+        console = []
+        for ts, event_type, chat_id, details in records:
+            stamp = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+            lines.append(json.dumps({"ts": stamp, "event": event_type, "chat_id": chat_id,
+                                     "details": details}, ensure_ascii=False))
+            if self.console:
+                console.append(f"📝 [{stamp}] [{event_type}] User:{chat_id} {details}")
+        self.file.write('\n'.join(lines) + '\n')
+        if console:
+            print('\n'.join(console), flush=True)
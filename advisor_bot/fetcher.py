@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+دریافت آپدیت‌ها با long polling - Update Fetcher
+"""
+
+import json
+import os
+import queue
+import threading
+
+import requests
+
+from .circuit import Backoff
+
+# تنظیمات long polling
+POLL_TIMEOUT = int(os.environ.get('POLL_TIMEOUT', '30'))
+POLL_LIMIT = int(os.environ.get('POLL_LIMIT', '100'))
+ALLOWED_UPDATES = [u.strip() for u in os.environ.get('ALLOWED_UPDATES', 'message,callback_query').split(',') if u.strip()]
+UPDATE_QUEUE_SIZE = int(os.environ.get('UPDATE_QUEUE_SIZE', '4'))
+# فاصله تلاش مجدد بعد از خطا از ۱ ثانیه شروع و تا این مقدار دو برابر می‌شود
+POLL_MAX_BACKOFF = float(os.environ.get('POLL_MAX_BACKOFF', '30'))
+
+
+class UpdateFetcher:
+    """
+    در یک نخ جداگانه getUpdates را با timeout سمت سرور صدا می‌زند و
+    دسته‌های آپدیت را در صف محدود قرار می‌دهد تا دریافت دسته بعدی
+    هم‌زمان با پردازش دسته فعلی انجام شود.
+    """
+
+    def __init__(self, url, timeout=POLL_TIMEOUT, limit=POLL_LIMIT,
+                 allowed_updates=None, queue_size=UPDATE_QUEUE_SIZE, on_first_poll=None):
+        self.url = url
+        self.timeout = timeout
+        self.limit = limit
+        self.allowed_updates = ALLOWED_UPDATES if allowed_updates is None else allowed_updates
+        self.batches = queue.Queue(maxsize=queue_size)
+        self.offset = 0
+        self.session = requests.Session()
+        # برای گزارش زمان راه‌اندازی؛ درست پیش از اولین درخواست getUpdates صدا زده می‌شود
+        self.on_first_poll = on_first_poll
+        self.backoff = Backoff(1, POLL_MAX_BACKOFF)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="update-fetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get_batch(self, timeout=None):
+        # در صورت خالی بودن صف تا پایان timeout، queue.Empty پرتاب می‌شود
+        return self.batches.get(timeout=timeout)
+
+    def poll_once(self):
+        params = {
+            'offset': self.offset,
+            'timeout': self.timeout,
+            'limit': self.limit,
+            'allowed_updates': json.dumps(self.allowed_updates),
+        }
+        # timeout سمت کلاینت کمی بیشتر از timeout سمت سرور است
+        response = self.session.get(self.url + "getUpdates", params=params, timeout=self.timeout + 10)
+        data = response.json()
+        if not data.get('ok'):
+            raise RuntimeError(data.get('description', 'getUpdates failed'))
+        return data['result']
+
+    def _put(self, updates):
+        # اگر صف پر باشد منتظر می‌ماند؛ این همان کنترل جریان سمت دریافت است
+        while not self._stop.is_set():
+            try:
+                self.batches.put(updates, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        if self.on_first_poll:
+            self.on_first_poll()
+        while not self._stop.is_set():
+            try:
+                updates = self.poll_once()
+            except Exception as e:
+                delay = self.backoff.next()
+                # در قطعی طولانی فقط اولین خطاها چاپ می‌شوند تا لاگ پر نشود
+                if self.backoff.attempt <= 3 or self.backoff.attempt % 10 == 0:
+                    print(f"⚠️ خطا در دریافت آپدیت‌ها (تلاش {self.backoff.attempt}، {delay:.1f} ثانیه دیگر): {e}")
+                self._stop.wait(delay)
+                continue
+            self.backoff.reset()
+
+            if updates:
+                self.offset = updates[-1]['update_id'] + 1
+                self._put(updates)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+موتور جریان گفتگو - Conversation Flow Engine
+"""
+
+from . import metrics
+from .intents import IntentIndex
+
+# وضعیت پیش‌فرض: منوی اصلی
+MENU = 'menu'
+# اگر هندلر STAY برگرداند، کاربر در همان وضعیت می‌ماند
+STAY = 'stay'
+
+HANDLER_LATENCY = metrics.histogram('bot_handler_seconds', 'Flow handler latency by route', ('route',))
+INTENT_MATCHES = metrics.counter('bot_intent_matches_total', 'Messages resolved to a route, by match kind', ('kind',))
+
+
+def route_name(handler):
+    """برچسب هندلر در metrics؛ برای lambda نام اولین تابعی که صدا می‌زند"""
+    name = getattr(handler, '__name__', type(handler).__name__)
+    if name == '<lambda>':
+        names = handler.__code__.co_names
+        name = names[0] if names else 'noop'
+    return name
+
+
+class Message:
+    __slots__ = ('chat_id', 'text', 'name', 'state')
+
+    def __init__(self, chat_id, text, name, state):
+        self.chat_id = chat_id
+        self.text = text
+        self.name = name
+        self.state = state
+
+
+class CallbackQuery:
+    """فشردن دکمه inline؛ data به شکل 'پیشوند:فیلد:...' است (حداکثر ۶۴ بایت در تلگرام)"""
+
+    __slots__ = ('id', 'chat_id', 'message_id', 'data', 'name', 'answered')
+
+    def __init__(self, id, chat_id, message_id, data, name, answered=False):
+        self.id = id
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.data = data
+        self.name = name
+        # در حالت webhook پاسخ answerCallbackQuery همراه پاسخ HTTP رفته است
+        self.answered = answered
+
+    @property
+    def fields(self):
+        return self.data.split(':')[1:]
+
+
+class FlowEngine:
+    """
+    هر جریان (ارزیابی، تنظیم آلارم، استرس و ...) به صورت داده تعریف می‌شود:
+
+        {
+            'alarm:type': {
+                'routes': {"📚 آلارم مطالعه": (choose_alarm_type, 'alarm:time'), ...},
+                'fallback': (invalid_option, STAY),
+            },
+            ...
+        }
+
+    همه مسیرها در یک جدول هش با کلید (وضعیت، متن ورودی) قرار می‌گیرند، پس پیدا
+    کردن هندلر O(1) است. متنی که دقیقاً برچسب دکمه نیست (تایپ‌شده بدون ایموجی،
+    با حروف عربی، بخشی از برچسب یا با یک غلط تایپی) در IntentIndex همان وضعیت
+    جستجو می‌شود و هندلر برچسب اصلی دکمه را در message.text می‌گیرد.
+    اگر ورودی در وضعیت فعلی تعریف نشده باشد و آن وضعیت fallback نداشته باشد،
+    مسیرهای منوی اصلی امتحان می‌شوند.
+    هندلر می‌تواند با برگرداندن نام یک وضعیت (یا STAY) وضعیت بعدی را تغییر دهد؛
+    مقادیر غیر رشته‌ای برگشتی نادیده گرفته می‌شوند.
+
+    دکمه‌های inline وضعیت خود را در callback data همراه دارند و به جای وضعیت
+    کاربر با پیشوند data مسیریابی می‌شوند (add_callbacks).
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._indexes = {}
+        self._fallbacks = {}
+        self._callbacks = {}
+        self._latency = {}
+        self._matches = {kind: INTENT_MATCHES.labels(kind)
+                         for kind in ('exact', 'key', 'prefix', 'fuzzy', 'fallback', 'none')}
+
+    def add_flow(self, flow):
+        for state, spec in flow.items():
+            for text, route in spec.get('routes', {}).items():
+                self._routes[(state, text)] = route
+                self._indexes.setdefault(state, IntentIndex()).add(text, route)
+                self._add_metric(route[0])
+            if 'fallback' in spec:
+                self._fallbacks[state] = spec['fallback']
+                self._add_metric(spec['fallback'][0])
+
+    def labels(self):
+        """همه (وضعیت، برچسب دکمه)های ثبت‌شده"""
+        return list(self._routes)
+
+    def add_callbacks(self, callbacks):
+        for prefix, handler in callbacks.items():
+            self._callbacks[prefix] = handler
+            self._add_metric(handler)
+
+    def _add_metric(self, handler):
+        # فرزند برچسب‌دار هیستوگرام یک بار ساخته می‌شود تا مسیر داغ فقط یک جستجوی dict باشد
+        self._latency[handler] = HANDLER_LATENCY.labels(route_name(handler))
+
+    def _match(self, state, text):
+        route = self._routes.get((state, text))
+        if route is not None:
+            return route, text, 'exact'
+        index = self._indexes.get(state)
+        if index is not None:
+            match, kind = index.resolve(text)
+            if match:
+                return match[1], match[0], kind
+        route = self._fallbacks.get(state)
+        return route, text, 'fallback' if route else 'none'
+
+    def resolve(self, state, text):
+        """(مسیر، برچسب دکمه یا همان متن، نوع تطبیق)"""
+        route, label, kind = self._match(state, text)
+        if route is None and state != MENU:
+            route, label, kind = self._match(MENU, text)
+        return route, label, kind
+
+    def handle(self, user_state, message):
+        route, message.text, kind = self.resolve(user_state.state, message.text)
+        self._matches[kind].inc()
+        if route is None:
+            return None
+
+        handler, next_state = route
+        with self._latency[handler].time():
+            result = handler(message)
+        if isinstance(result, str):
+            next_state = result
+        if next_state != STAY:
+            user_state.state = next_state
+        return handler
+
+    def handle_callback(self, query):
+        handler = self._callbacks.get(query.data.split(':', 1)[0])
+        if handler is None:
+            return None
+        with self._latency[handler].time():
+            handler(query)
+        return handler
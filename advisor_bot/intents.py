@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+نرمال‌سازی ورودی و ایندکس نیت‌ها - Input Normalization and Intent Index
+"""
+
+import sys
+import unicodedata
+
+# ارقام فارسی و عربی، حروف عربی هم‌شکل و کشیده (ـ)
+_CHARACTERS = {
+    **{ord(d): str(i % 10) for i, d in enumerate("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩")},
+    ord("ي"): "ی", ord("ى"): "ی", ord("ك"): "ک", ord("ـ"): None,
+}
+# نیم‌فاصله (ZWNJ) در متن نگه داشته می‌شود ولی ZWJ، انتخابگرهای نسخه ایموجی
+# (FE0E/FE0F) و رنگ پوست در هیچ مقایسه‌ای معنی ندارند
+_INVISIBLE = [0x200D, 0x200E, 0x200F, 0x2060, 0xFEFF, *range(0xFE00, 0xFE10), *range(0x1F3FB, 0x1F400)]
+
+# بازه‌هایی که نمادها و ایموجی‌ها در آن هستند؛ ساخت جدول فقط روی همین‌ها چند میلی‌ثانیه طول می‌کشد
+_SYMBOL_RANGES = [(0x0000, 0x2C00), (0x3000, 0x3040), (0xFE00, 0xFF00), (0x1F000, 0x1FB00), (0xE0000, 0xE0080)]
+_DROPPED_CATEGORIES = ('Z', 'P', 'S', 'C', 'M')
+
+
+def _build_tables():
+    text = dict(_CHARACTERS)
+    text.update(dict.fromkeys(_INVISIBLE))
+    key = dict(text)
+    for start, end in _SYMBOL_RANGES:
+        for code in range(start, end):
+            char = chr(code)
+            if code not in key and unicodedata.category(char)[0] in _DROPPED_CATEGORIES:
+                key[code] = None
+            elif 'A' <= char <= 'Z':
+                key[code] = char.lower()
+    return text, key
+
+
+# TEXT_TABLE برای متنی که مقدارش مهم است (مثل زمان «۰۷:۰۰»)؛ KEY_TABLE کلید مقایسه
+# نیت‌ها را می‌سازد: فاصله، نیم‌فاصله، علائم و ایموجی‌ها حذف می‌شوند
+TEXT_TABLE, KEY_TABLE = _build_tables()
+
+
+def normalize(text):
+    return text.translate(TEXT_TABLE).strip()
+
+
+def intent_key(text):
+    return text.translate(KEY_TABLE)
+
+
+class IntentIndex:
+    """
+    برچسب دکمه‌ها را به مقدار (مثلاً مسیر FlowEngine) نگاشت می‌کند. جستجو به ترتیب:
+    کلید نرمال‌شده در جدول هش؛ پیشوند یکتا (درخت پیشوندی که همه گره‌هایش در
+    یک dict صاف شده‌اند، مثل «ارزیابی» برای «📊 ارزیابی تحصیلی»)؛ و در آخر
+    غلط تایپی با فاصله ویرایشی ۱ به روش symspell: همه حالت‌های حذف یک حرف از
+    هر کلید از قبل در dict است، پس جستجو فقط len(متن)+1 بار dict را می‌خواند.
+    اگر نتیجه به بیش از یک برچسب برسد حدسی زده نمی‌شود.
+    """
+
+    def __init__(self, min_prefix=3, min_fuzzy=4):
+        self.min_prefix = min_prefix
+        self.min_fuzzy = min_fuzzy
+        self._keys = {}
+        self._prefixes = {}
+        self._deletes = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, label, value):
+        key = sys.intern(intent_key(label))
+        if not key:
+            return
+        self._keys[key] = (label, value)
+        for i in range(self.min_prefix, len(key)):
+            self._prefixes.setdefault(key[:i], set()).add(key)
+        if len(key) >= self.min_fuzzy:
+            for variant in self._variants(key):
+                self._deletes.setdefault(variant, set()).add(key)
+
+    @staticmethod
+    def _variants(key):
+        yield key
+        for i in range(len(key)):
+            yield key[:i] + key[i + 1:]
+
+    def _unique(self, keys):
+        if len(keys) != 1:
+            return None
+        return self._keys[next(iter(keys))]
+
+    def resolve(self, text):
+        """((برچسب، مقدار)، نوع تطبیق: key، prefix یا fuzzy) یا (None, None)"""
+        key = intent_key(text)
+        if not key:
+            return None, None
+        match = self._keys.get(key)
+        if match:
+            return match, 'key'
+        match = self._unique(self._prefixes.get(key, ()))
+        if match:
+            return match, 'prefix'
+        if len(key) >= self.min_fuzzy:
+            candidates = set()
+            for variant in self._variants(key):
+                candidates.update(self._deletes.get(variant, ()))
+            match = self._unique(candidates)
+            if match:
+                return match, 'fuzzy'
+        return None, None
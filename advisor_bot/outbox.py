@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+صندوق پیام‌های ارسال‌نشده - Durable Outbox
+"""
+
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+from .circuit import Backoff
+
+OUTBOX_PATH = os.environ.get('OUTBOX_PATH', 'outbox.db')
+# پیامی که بیش از این (ثانیه) در صف مانده دیگر فرستاده نمی‌شود
+OUTBOX_MAX_AGE = float(os.environ.get('OUTBOX_MAX_AGE', '3600'))
+# تعداد چت‌هایی که هم‌زمان تخلیه می‌شوند؛ پیام‌های هر چت همیشه به ترتیب و یکی‌یکی می‌روند
+OUTBOX_DRAIN_WORKERS = int(os.environ.get('OUTBOX_DRAIN_WORKERS', '4'))
+# مکث بین دورهای تخلیه‌ای که با خطای موقت متوقف شده‌اند (از ۰٫۵ ثانیه دو برابر می‌شود)
+OUTBOX_MAX_BACKOFF = float(os.environ.get('OUTBOX_MAX_BACKOFF', '10'))
+
+# پاسخ‌هایی که ارسال دیرهنگامشان هنوز ارزش دارد؛ answerCallbackQuery چند ثانیه بعد بی‌معنی است
+OUTBOX_METHODS = frozenset(('sendMessage', 'editMessageText'))
+
+OUTBOX_MESSAGES = metrics.counter('bot_outbox_messages_total', 'Messages that went through the outbox', ('result',))
+for _result in ('queued', 'delivered', 'failed', 'expired'):
+    OUTBOX_MESSAGES.labels(_result)
+
+
+class Outbox:
+    """
+    پاسخ‌هایی که به خاطر قطعی شبکه یا خطای 5xx تلگرام نرفته‌اند در یک جدول
+    SQLite می‌مانند (و با راه‌اندازی مجدد از دست نمی‌روند). تا وقتی چتی پیامی در
+    outbox دارد پیام‌های جدیدش هم پشت همان‌ها قرار می‌گیرند تا ترتیب حفظ شود.
+    نخ تخلیه بعد از بسته شدن مدار OutboundSender پیام‌های هر چت را به ترتیب
+    می‌فرستد؛ اولین خطای موقت تخلیه آن چت را تا دور بعد متوقف می‌کند.
+    """
+
+    def __init__(self, path=OUTBOX_PATH, max_age=OUTBOX_MAX_AGE, workers=OUTBOX_DRAIN_WORKERS):
+        self.path = path
+        self.max_age = max_age
+        self.workers = workers
+        self.sender = None
+        self.on_failed = None
+        self._pending = collections.Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._backoff = Backoff(0.5, OUTBOX_MAX_BACKOFF)
+        self._thread = None
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER NOT NULL,
+            method TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_chat ON outbox(chat_id, id)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def load(self, owns_chat=None):
+        """شمارش پیام‌های مانده از اجرای قبلی (در حالت چند پردازه‌ای فقط چت‌های همین کارگر)"""
+        rows = self._connection().execute("SELECT chat_id, COUNT(*) FROM outbox GROUP BY chat_id").fetchall()
+        with self._lock:
+            self._pending = collections.Counter({chat_id: count for chat_id, count in rows
+                                                 if not owns_chat or owns_chat(chat_id)})
+            total = sum(self._pending.values())
+        if total:
+            self._wakeup.set()
+        return total
+
+    def start(self, sender, owns_chat=None, on_failed=None):
+        """on_failed(chat_id, result) برای پیامی که با خطای قطعی (مثل 403) رد شد"""
+        self.sender = sender
+        self.on_failed = on_failed
+        restored = self.load(owns_chat)
+        if restored:
+            print(f"📮 {restored} پیام ارسال‌نشده از اجرای قبلی در outbox است")
+        self._thread = threading.Thread(target=self._run, name="outbox-drain", daemon=True)
+        self._thread.start()
+
+    def has_pending(self, chat_id):
+        with self._lock:
+            return chat_id in self._pending
+
+    def put(self, chat_id, method, payload):
+        # شمارنده پیش از درج بالا می‌رود تا چت در فاصله درج و شمارش مستقیم ارسال نشود
+        with self._lock:
+            self._pending[chat_id] += 1
+        conn = self._connection()
+        with conn:
+            conn.execute("INSERT INTO outbox (chat_id, method, payload, created) VALUES (?, ?, ?, ?)",
+                         (chat_id, method, json.dumps(payload, ensure_ascii=False), time.time()))
+        OUTBOX_MESSAGES.labels('queued').inc()
+        self._wakeup.set()
+
+    def _delete(self, row_id, chat_id, result):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+        with self._lock:
+            self._pending[chat_id] -= 1
+            if self._pending[chat_id] <= 0:
+                del self._pending[chat_id]
+        OUTBOX_MESSAGES.labels(result).inc()
+
+    def _drain_chat(self, chat_id):
+        """True اگر تخلیه این چت با خطای موقت متوقف شد"""
+        conn = self._connection()
+        while True:
+            row = conn.execute("SELECT id, method, payload, created FROM outbox WHERE chat_id = ? ORDER BY id LIMIT 1",
+                               (chat_id,)).fetchone()
+            if row is None:
+                return False
+            row_id, method, payload, created = row
+            if time.time() - created > self.max_age:
+                self._delete(row_id, chat_id, 'expired')
+                continue
+            result = self.sender.deliver(method, json.loads(payload))
+            if result.ok:
+                self._delete(row_id, chat_id, 'delivered')
+            elif result.transient:
+                return True
+            else:
+                self._delete(row_id, chat_id, 'failed')
+                if self.on_failed:
+                    self.on_failed(chat_id, result)
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbox") as pool:
+            while True:
+                self._wakeup.wait(1)
+                self._wakeup.clear()
+                with self._lock:
+                    chats = list(self._pending)
+                if not chats:
+                    continue
+                wait = self.sender.breaker.retry_in()
+                if wait:
+                    time.sleep(min(wait, 1))
+                    self._wakeup.set()
+                    continue
+                try:
+                    stalled = any(list(pool.map(self._drain_chat, chats)))
+                except Exception as e:
+                    print(f"⚠️ خطا در تخلیه outbox: {e}")
+                    stalled = True
+                if stalled:
+                    # API هنوز آماده نیست؛ بدون مکث هر دور یک کوئری برای هر چت منتظر است
+                    time.sleep(self._backoff.next())
+                else:
+                    self._backoff.reset()
+                with self._lock:
+                    if self._pending:
+                        self._wakeup.set()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+پروفایلر نمونه‌برداری - Sampling Profiler
+
+با سیگنال PROFILE_SIGNAL (پیش‌فرض: kill -URG <pid>) یا دستور ادمین /profile روشن
+و خاموش می‌شود. وقتی خاموش است هیچ نخ یا هزینه‌ای ندارد. هر نمونه پشته همه نخ‌ها
+(زمان دیواری، پس انتظار برای شبکه و قفل هم دیده می‌شود) است و خروجی در قالب
+folded stacks (یک خط «نخ;تابع;تابع تعداد» برای هر پشته) در PROFILE_DIR ذخیره
+می‌شود؛ با flamegraph.pl یا speedscope.app نمودار شعله‌ای آن ساخته می‌شود.
+"""
+
+import collections
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# فاصله نمونه‌برداری (ثانیه)
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', '0.01'))
+# پروفایلی که با سیگنال روشن شده و خاموش نشده بعد از این مدت خودکار ذخیره می‌شود
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', '300'))
+PROFILE_SIGNAL = os.environ.get('PROFILE_SIGNAL', 'SIGURG')
+PROFILE_MAX_DEPTH = 128
+
+# خلاصه گزارش فقط نخ‌هایی را می‌شمارد که مستقیم روی تأخیر پاسخ اثر دارند؛ فایل همه نخ‌ها را دارد
+SUMMARY_THREADS = ('handler', 'sender', 'outbox')
+# تابع برگی که در این ماژول‌ها باشد یعنی نخ بیکار منتظر کار است
+IDLE_MODULES = ('threading', 'queue', 'selectors', 'concurrent.futures.thread')
+
+
+def thread_group(name):
+    # handler_3 و sender-5 در نمودار با هم جمع می‌شوند
+    return re.sub(r'[-_]\d+$', '', name)
+
+
+class SamplingProfiler:
+    def __init__(self, directory=PROFILE_DIR, interval=PROFILE_INTERVAL, max_seconds=PROFILE_MAX_SECONDS):
+        self.directory = directory
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.last_report = None
+        self._stacks = None
+        self._samples = 0
+        self._started = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._on_done = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, seconds=None, on_done=None):
+        """
+        False اگر از قبل روشن باشد. اگر پروفایل با پایان seconds تمام شود on_done(report)
+        در نخ پروفایلر صدا زده می‌شود؛ با stop() گزارش به خود فراخواننده برمی‌گردد.
+        """
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._stacks = collections.Counter()
+            self._samples = 0
+            self._started = time.time()
+            self._on_done = on_done
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(min(seconds or self.max_seconds, self.max_seconds),),
+                                            name="profiler", daemon=True)
+            self._thread.start()
+        print(f"🔬 پروفایلر روشن شد (هر {self.interval * 1000:g} میلی‌ثانیه)")
+        return True
+
+    def stop(self):
+        """خاموش کردن و صبر تا ذخیره فایل؛ گزارش یا None اگر روشن نبود"""
+        thread = self._thread
+        if thread is None:
+            return None
+        self._stop.set()
+        if thread is not threading.current_thread():
+            thread.join()
+        return self.last_report
+
+    def toggle(self):
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def _run(self, seconds):
+        me = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                name = names.get(tid)
+                if name is None:
+                    names.update((t.ident, thread_group(t.name)) for t in threading.enumerate())
+                    name = names.get(tid, 'thread')
+                self._stacks[self._collapse(name, frame)] += 1
+            self._samples += 1
+        timed_out = not self._stop.is_set()
+        try:
+            report = self._save()
+        except OSError as e:
+            report = {'error': str(e), 'samples': self._samples}
+            print(f"⚠️ خطا در ذخیره پروفایل: {e}")
+        with self._lock:
+            self.last_report = report
+            on_done = self._on_done
+            self._thread = None
+        if on_done and timed_out:
+            on_done(report)
+
+    @staticmethod
+    def _collapse(thread_name, frame):
+        stack = []
+        while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+            code = frame.f_code
+            stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+            frame = frame.f_back
+        stack.append(thread_name)
+        stack.reverse()
+        return ';'.join(stack)
+
+    def _save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"profile-{os.getpid()}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        # پرهزینه‌ترین توابع بر اساس تعداد نمونه‌هایی که در بالای پشته یک نخ مشغول بوده‌اند
+        leaves = collections.Counter()
+        for stack, count in self._stacks.items():
+            thread, _, rest = stack.partition(';')
+            leaf = rest.rsplit(';', 1)[-1]
+            if thread in SUMMARY_THREADS and leaf.rpartition(':')[0] not in IDLE_MODULES:
+                leaves[leaf] += count
+        report = {'path': path, 'samples': self._samples, 'seconds': round(time.time() - self._started, 1),
+                  'top': leaves.most_common(5)}
+        print(f"🔬 پروفایل {report['seconds']} ثانیه ({report['samples']} نمونه) در {path} ذخیره شد")
+        return report
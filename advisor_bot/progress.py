@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+پیگیری پیشرفت تحصیلی - Student Progress Analytics
+"""
+
+import collections
+import json
+import os
+import threading
+
+PROGRESS_RECENT = int(os.environ.get('PROGRESS_RECENT', '5'))
+# فاصله بازمحاسبه صدک‌های هم‌پایه‌ها (ثانیه)
+PROGRESS_COHORT_REFRESH = float(os.environ.get('PROGRESS_COHORT_REFRESH', '300'))
+
+# حداکثر امتیاز هر سوال (🟢 عالی = ۲)
+MAX_ANSWER_SCORE = 2
+
+
+def parse_answers(answers):
+    """ستون answers به صورت '[2, 1, 0]' ذخیره می‌شود"""
+    if isinstance(answers, list):
+        return answers
+    try:
+        parsed = json.loads(answers or '[]')
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+class StudentProgress:
+    """
+    خلاصه تجمعی یک دانش‌آموز که با هر ارزیابی جدید در O(1) به‌روز می‌شود.
+    روند با رگرسیون خطی افزایشی (مجموع‌های x و y) روی درصد امتیازها محاسبه می‌شود.
+    """
+
+    __slots__ = ('grade', 'count', 'percent_sum', 'best', 'last', 'recent',
+                 'question_sums', 'question_counts', '_sx', '_sy', '_sxy', '_sxx')
+
+    def __init__(self, recent=PROGRESS_RECENT):
+        self.grade = ''
+        self.count = 0
+        self.percent_sum = 0.0
+        self.best = 0.0
+        self.last = None
+        self.recent = collections.deque(maxlen=recent)
+        self.question_sums = []
+        self.question_counts = []
+        self._sx = self._sy = self._sxy = self._sxx = 0.0
+
+    def add(self, timestamp, grade, total_score, answers):
+        max_score = len(answers) * MAX_ANSWER_SCORE
+        percent = 100.0 * total_score / max_score if max_score else 0.0
+
+        x = self.count
+        self.count += 1
+        self._sx += x
+        self._sy += percent
+        self._sxy += x * percent
+        self._sxx += x * x
+
+        self.grade = grade or self.grade
+        self.percent_sum += percent
+        self.best = max(self.best, percent)
+        self.last = (timestamp, total_score, max_score, percent)
+        self.recent.append(self.last)
+
+        for i, score in enumerate(answers):
+            if i == len(self.question_sums):
+                self.question_sums.append(0)
+                self.question_counts.append(0)
+            self.question_sums[i] += score
+            self.question_counts[i] += 1
+
+    @property
+    def average(self):
+        return self.percent_sum / self.count if self.count else 0.0
+
+    @property
+    def trend(self):
+        """شیب درصد امتیاز به ازای هر ارزیابی (مثبت یعنی پیشرفت)"""
+        n = self.count
+        denominator = n * self._sxx - self._sx * self._sx
+        if n < 2 or not denominator:
+            return 0.0
+        return (n * self._sxy - self._sx * self._sy) / denominator
+
+    def question_averages(self):
+        return [s / c for s, c in zip(self.question_sums, self.question_counts)]
+
+
+class ProgressTracker:
+    """
+    ایندکس حافظه‌ای پیشرفت همه دانش‌آموزان. داده‌های قبلی فقط یک بار در شروع
+    برنامه از ResultsStore خوانده می‌شوند و بعد از آن هر ارزیابی جدید با record
+    اضافه می‌شود. صدک هر دانش‌آموز در بین هم‌پایه‌هایش به صورت دوره‌ای و
+    برداری با pandas محاسبه و در یک dict نگه‌داری می‌شود، پس پاسخ درخواست
+    پیشرفت فقط چند جستجوی dict است.
+    """
+
+    def __init__(self, recent=PROGRESS_RECENT):
+        self.recent = recent
+        # تا پایان load (که در پس‌زمینه اجرا می‌شود) ارزیابی‌های جدید در backlog می‌مانند
+        self.ready = threading.Event()
+        self._backlog = []
+        self._students = {}
+        self._percentiles = {}
+        self._cohorts = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._students)
+
+    def load(self, rows):
+        count = 0
+        for row in rows:
+            with self._lock:
+                self._add(row)
+            count += 1
+        with self._lock:
+            for row in self._backlog:
+                self._add(row)
+            self._backlog = []
+            self.ready.set()
+        return count
+
+    def record(self, row):
+        with self._lock:
+            if self.ready.is_set():
+                self._add(row)
+            else:
+                self._backlog.append(row)
+
+    def _add(self, row):
+        chat_id = int(row['user_id'])
+        student = self._students.get(chat_id)
+        if student is None:
+            student = self._students[chat_id] = StudentProgress(self.recent)
+        answers = parse_answers(row.get('answers'))
+        student.add(row.get('timestamp', ''), row.get('grade', ''), int(row.get('total_score') or 0), answers)
+
+    def refresh_cohorts(self):
+        """صدک آخرین امتیاز هر دانش‌آموز در پایه خودش (rank برداری در هر گروه)"""
+        with self._lock:
+            snapshot = [(chat_id, s.grade, s.last[3]) for chat_id, s in self._students.items() if s.last]
+        if not snapshot:
+            return 0
+
+        import pandas as pd
+
+        df = pd.DataFrame(snapshot, columns=['chat_id', 'grade', 'percent'])
+        by_grade = df.groupby('grade')['percent']
+        df['percentile'] = by_grade.rank(pct=True, method='max') * 100
+        quantiles = by_grade.quantile([0.25, 0.5, 0.75]).unstack()
+        sizes = by_grade.size()
+
+        percentiles = dict(zip(df['chat_id'].tolist(), df['percentile'].round().astype(int).tolist()))
+        cohorts = {grade: {'size': int(sizes[grade]), 'p25': row[0.25], 'p50': row[0.5], 'p75': row[0.75]}
+                   for grade, row in quantiles.iterrows()}
+        self._percentiles = percentiles
+        self._cohorts = cohorts
+        return len(percentiles)
+
+    def report(self, chat_id):
+        """خلاصه پیشرفت یک دانش‌آموز یا None اگر هنوز ارزیابی نداشته باشد"""
+        with self._lock:
+            student = self._students.get(chat_id)
+            if student is None or not student.count:
+                return None
+            return {
+                'grade': student.grade,
+                'count': student.count,
+                'average': student.average,
+                'best': student.best,
+                'last': student.last,
+                'trend': student.trend,
+                'recent': list(student.recent),
+                'question_averages': student.question_averages(),
+                'percentile': self._percentiles.get(chat_id),
+                'cohort': self._cohorts.get(student.grade),
+            }
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+ذخیره‌سازی نتایج ارزیابی - Assessment Results Store
+
+استفاده از خط فرمان:
+    python -m advisor_bot.results_store export_xlsx [educational_data.xlsx]
+"""
+
+import abc
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from . import metrics
+
+RESULTS_BACKEND = os.environ.get('RESULTS_BACKEND', 'sqlite')
+RESULTS_PATH = os.environ.get('RESULTS_PATH', '')
+RESULTS_FLUSH_INTERVAL = float(os.environ.get('RESULTS_FLUSH_INTERVAL', '2'))
+RESULTS_BATCH_SIZE = int(os.environ.get('RESULTS_BATCH_SIZE', '500'))
+
+FLUSH_LATENCY = metrics.histogram('bot_results_flush_seconds', 'Time to write one batch of assessment results')
+ROWS_WRITTEN = metrics.counter('bot_results_rows_total', 'Assessment result rows written')
+FLUSH_ERRORS = metrics.counter('bot_results_flush_errors_total', 'Failed result batch writes')
+
+XLSX_FILE = 'educational_data.xlsx'
+
+COLUMNS = ['timestamp', 'user_id', 'grade', 'total_score', 'answers']
+
+
+class ResultsStore(abc.ABC):
+    """
+    نتایج در یک صف حافظه قرار می‌گیرند و یک نخ پس‌زمینه آن‌ها را به صورت
+    دسته‌ای می‌نویسد؛ بنابراین append هرگز هندلرها را بلاک نمی‌کند.
+    """
+
+    def __init__(self, path, flush_interval=RESULTS_FLUSH_INTERVAL, batch_size=RESULTS_BATCH_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def append(self, row):
+        self._queue.put(row)
+
+    def flush(self, timeout=10):
+        """تا نوشته شدن همه ردیف‌های در صف منتظر می‌ماند"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _run(self):
+        self.open_writer()
+        while True:
+            rows = []
+            waiters = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                rows.append(item)
+                remaining = deadline - time.monotonic()
+                if len(rows) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if rows:
+                try:
+                    with FLUSH_LATENCY.time():
+                        self.write_batch(rows)
+                    ROWS_WRITTEN.inc(len(rows))
+                except Exception as e:
+                    FLUSH_ERRORS.inc()
+                    print(f"⚠️ خطا در ذخیره {len(rows)} نتیجه ارزیابی: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+    def open_writer(self):
+        pass
+
+    @abc.abstractmethod
+    def write_batch(self, rows):
+        """نوشتن یک دسته ردیف در یک تراکنش"""
+
+    @abc.abstractmethod
+    def read_all(self):
+        """همه ردیف‌ها به ترتیب ثبت"""
+
+    def is_empty(self):
+        return not self.read_all()
+
+    def chat_ids(self, grade=None):
+        """دانش‌آموزانی که آخرین ارزیابی‌شان در این پایه بوده (یا همه)، از نتایج همه کارگرها"""
+        last_grade = {}
+        for row in self.read_all():
+            last_grade[int(row['user_id'])] = row['grade']
+        return {chat_id for chat_id, g in last_grade.items() if grade is None or g == grade}
+
+    def export_xlsx(self, file_name=XLSX_FILE):
+        import pandas as pd
+
+        self.flush()
+        df = pd.DataFrame(self.read_all(), columns=COLUMNS)
+        df.to_excel(file_name, index=False)
+        return len(df)
+
+    def import_xlsx(self, file_name=XLSX_FILE):
+        """انتقال یک‌باره داده‌های فایل اکسل قدیمی به این ذخیره‌ساز"""
+        import pandas as pd
+
+        df = pd.read_excel(file_name)
+        rows = df.reindex(columns=COLUMNS).fillna('').to_dict('records')
+        for row in rows:
+            row['total_score'] = int(row['total_score'] or 0)
+        self.write_batch(rows)
+        return len(rows)
+
+
+class SQLiteResultsStore(ResultsStore):
+    def __init__(self, path='educational_data.db', **kwargs):
+        super().__init__(path, **kwargs)
+        self._writer = None
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT, user_id INTEGER, grade TEXT,
+                total_score INTEGER, answers TEXT)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_user ON results(user_id)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def open_writer(self):
+        self._writer = self._connect()
+
+    def write_batch(self, rows):
+        conn = self._writer or self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO results (timestamp, user_id, grade, total_score, answers) VALUES (?, ?, ?, ?, ?)",
+                [tuple(row.get(c, '') for c in COLUMNS) for row in rows])
+        if conn is not self._writer:
+            conn.close()
+
+    def is_empty(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM results LIMIT 1").fetchone() is None
+        finally:
+            conn.close()
+
+    def chat_ids(self, grade=None):
+        conn = self._connect()
+        try:
+            cursor = conn.execute("SELECT user_id, grade FROM results WHERE id IN "
+                                  "(SELECT MAX(id) FROM results GROUP BY user_id)")
+            return {int(user_id) for user_id, g in cursor if grade is None or g == grade}
+        finally:
+            conn.close()
+
+    def read_all(self):
+        conn = self._connect()
+        try:
+            cursor = conn.execute("SELECT timestamp, user_id, grade, total_score, answers FROM results ORDER BY id")
+            return [dict(zip(COLUMNS, r)) for r in cursor]
+        finally:
+            conn.close()
+
+
+class JsonlResultsStore(ResultsStore):
+    def __init__(self, path='educational_data.jsonl', **kwargs):
+        super().__init__(path, **kwargs)
+
+    def write_batch(self, rows):
+        lines = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def is_empty(self):
+        return not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+
+    def read_all(self):
+        if not os.path.exists(self.path):
+            return []
+        rows = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    rows.append(json.loads(line))
+        return rows
+
+
+STORES = {
+    'sqlite': SQLiteResultsStore,
+    'jsonl': JsonlResultsStore,
+}
+
+
+def open_results_store(backend=RESULTS_BACKEND, path=RESULTS_PATH):
+    if backend not in STORES:
+        raise ValueError(f"Unknown RESULTS_BACKEND: {backend}")
+    kwargs = {'path': path} if path else {}
+    store = STORES[backend](**kwargs)
+
+    # اولین اجرا: داده‌های قبلی فایل اکسل منتقل می‌شوند تا export آن‌ها را از دست ندهد
+    if os.path.exists(XLSX_FILE) and store.is_empty():
+        try:
+            count = store.import_xlsx(XLSX_FILE)
+            print(f"✅ {count} نتیجه از {XLSX_FILE} منتقل شد")
+        except Exception as e:
+            print(f"⚠️ خطا در انتقال {XLSX_FILE}: {e}")
+    return store
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'export_xlsx':
+        print("Usage: python -m advisor_bot.results_store export_xlsx [output.xlsx]")
+        sys.exit(1)
+
+    output = sys.argv[2] if len(sys.argv) > 2 else XLSX_FILE
+    count = open_results_store().export_xlsx(output)
+    print(f"✅ {count} ردیف در {output} ذخیره شد")
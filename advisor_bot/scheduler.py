@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+زمان‌بند آلارم‌های مطالعه - Alarm Scheduler
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+ALARM_TZ = ZoneInfo(os.environ.get('ALARM_TZ', 'Asia/Tehran'))
+ALARM_WORKERS = int(os.environ.get('ALARM_WORKERS', '4'))
+
+
+def next_fire_time(alarm, after):
+    """اولین زمان به صدا درآمدن آلارم (user_state.Alarm) بعد از after (datetime با منطقه زمانی)"""
+    hour, minute = divmod(alarm.minute, 60)
+    day = after.date()
+    for offset in range(8):
+        candidate = datetime(day.year, day.month, day.day, hour, minute, tzinfo=after.tzinfo) + timedelta(days=offset)
+        if candidate > after and alarm.runs_on(candidate.weekday()):
+            return candidate
+    return None
+
+
+class AlarmScheduler:
+    """
+    همه آلارم‌های فعال در یک min-heap بر اساس زمان بعدی نگه‌داری می‌شوند.
+    نخ زمان‌بند فقط تا موعد نزدیک‌ترین آلارم می‌خوابد و هیچ‌وقت کاربران را پیمایش نمی‌کند.
+    حذف و ویرایش آلارم‌ها تنبل است: مدخل قدیمی در heap با شماره نسخه نامعتبر می‌شود.
+    """
+
+    def __init__(self, fire, tz=ALARM_TZ, workers=ALARM_WORKERS):
+        self.fire = fire
+        self.tz = tz
+        self._heap = []
+        self._alarms = {}
+        self._versions = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alarm")
+        self._thread = None
+
+    def __len__(self):
+        return len(self._alarms)
+
+    def _entry(self, chat_id, alarm, now):
+        if not alarm.active:
+            return None
+        when = next_fire_time(alarm, now)
+        if when is None:
+            return None
+        version = next(self._versions)
+        self._alarms[(chat_id, alarm.id)] = (alarm, version)
+        return (when.timestamp(), version, chat_id, alarm.id)
+
+    def load(self, alarms_by_chat):
+        """ساخت دوباره ایندکس در شروع برنامه؛ heapify کل لیست در O(n)"""
+        now = datetime.now(self.tz)
+        entries = []
+        with self._cond:
+            for chat_id, alarms in alarms_by_chat:
+                for alarm in alarms:
+                    entry = self._entry(chat_id, alarm, now)
+                    if entry:
+                        entries.append(entry)
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        return len(entries)
+
+    def schedule(self, chat_id, alarm):
+        with self._cond:
+            entry = self._entry(chat_id, alarm, datetime.now(self.tz))
+            if entry is None:
+                self._alarms.pop((chat_id, alarm.id), None)
+                return
+            heapq.heappush(self._heap, entry)
+            if self._heap[0] is entry:
+                self._cond.notify()
+
+    def cancel(self, chat_id, alarm_id):
+        with self._cond:
+            self._alarms.pop((chat_id, alarm_id), None)
+
+    def clear(self):
+        with self._cond:
+            self._heap = []
+            self._alarms = {}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="alarm-scheduler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due = self._pop_due()
+            for chat_id, alarm in due:
+                self._executor.submit(self._fire, chat_id, alarm)
+
+    def _pop_due(self):
+        while True:
+            if not self._heap:
+                self._cond.wait()
+                continue
+            wait = self._heap[0][0] - time.time()
+            if wait > 0:
+                self._cond.wait(wait)
+                continue
+
+            due = []
+            now = datetime.now(self.tz)
+            while self._heap and self._heap[0][0] <= time.time():
+                fire_at, version, chat_id, alarm_id = heapq.heappop(self._heap)
+                current = self._alarms.get((chat_id, alarm_id))
+                if current is None or current[1] != version:
+                    continue
+                alarm = current[0]
+                due.append((chat_id, alarm))
+                entry = self._entry(chat_id, alarm, max(now, datetime.fromtimestamp(fire_at, self.tz)))
+                if entry:
+                    heapq.heappush(self._heap, entry)
+            if due:
+                return due
+
+    def _fire(self, chat_id, alarm):
+        try:
+            self.fire(chat_id, alarm)
+        except Exception as e:
+            print(f"⚠️ خطا در ارسال آلارم {alarm.id} برای {chat_id}: {e}")
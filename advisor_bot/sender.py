@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+صف ارسال پیام با محدودیت نرخ - Outbound Sender
+"""
+
+import collections
+import itertools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics, tracing
+from .circuit import CircuitBreaker
+from .outbox import OUTBOX_METHODS
+
+# تنظیمات ارسال
+SEND_WORKERS = int(os.environ.get('SEND_WORKERS', '8'))
+SEND_TIMEOUT = float(os.environ.get('SEND_TIMEOUT', '10'))
+SEND_MAX_RETRIES = int(os.environ.get('SEND_MAX_RETRIES', '4'))
+# محدودیت‌های تلگرام: حدود ۳۰ پیام در ثانیه در کل و ۱ پیام در ثانیه برای هر چت
+GLOBAL_RATE = float(os.environ.get('SEND_GLOBAL_RATE', '30'))
+CHAT_RATE = float(os.environ.get('SEND_CHAT_RATE', '1'))
+CHAT_BURST = float(os.environ.get('SEND_CHAT_BURST', '3'))
+# بیشترین تعداد باکت چت‌ها در حافظه؛ باکت چتی که از همه دیرتر پیام گرفته حذف می‌شود
+SEND_MAX_CHATS = int(os.environ.get('SEND_MAX_CHATS', '10000'))
+
+API_LATENCY = metrics.histogram('bot_telegram_request_seconds', 'Telegram Bot API request latency', ('method',))
+API_ERRORS = metrics.counter('bot_telegram_errors_total', 'Failed Telegram Bot API requests', ('method', 'status'))
+
+# اولویت کمتر زودتر ارسال می‌شود
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def encode_payload(payload):
+    # پارامتر json= در requests هر حرف فارسی را به \uXXXX (۶ بایت به جای ۲) تبدیل می‌کند
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """یک توکن رزرو می‌کند و مدت زمانی که باید تا رسیدن نوبت صبر کرد را برمی‌گرداند"""
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def try_take(self):
+        """بدون صبر: اگر توکن باشد برمی‌دارد و True برمی‌گرداند"""
+        with self.lock:
+            self._refill()
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class DeliveryResult:
+    def __init__(self, ok, chat_id=None, status=None, message_id=None, attempts=0, error=None, retry_after=None,
+                 queued=False):
+        self.ok = ok
+        self.chat_id = chat_id
+        self.status = status
+        self.message_id = message_id
+        self.attempts = attempts
+        self.error = error
+        self.retry_after = retry_after
+        # پیام نرفته ولی در outbox است و بعد از برگشتن API ارسال می‌شود
+        self.queued = queued
+
+    def __bool__(self):
+        return self.ok
+
+    @property
+    def transient(self):
+        """خطای شبکه، 5xx یا 429: ارسال دوباره بعداً ممکن است موفق شود"""
+        return not self.ok and (self.status is None or self.status in RETRYABLE_STATUS)
+
+    def __repr__(self):
+        if self.ok:
+            return f"DeliveryResult(ok, chat={self.chat_id}, message_id={self.message_id}, attempts={self.attempts})"
+        if self.queued:
+            return f"DeliveryResult(queued, chat={self.chat_id}, error={self.error!r}, attempts={self.attempts})"
+        return f"DeliveryResult(failed, chat={self.chat_id}, status={self.status}, error={self.error!r}, attempts={self.attempts})"
+
+
+class OutboundSender:
+    """
+    درخواست‌های خروجی را روی یک connection pool با اتصال keep-alive ارسال می‌کند.
+    محدودیت هر چت در نخ فراخواننده اعمال می‌شود (تا فقط همان چت منتظر بماند)
+    و محدودیت کلی در نخ‌های ارسال.
+
+    وقتی API در دسترس نیست مدار باز می‌شود و درخواست‌ها بدون تلاش مجدد برمی‌گردند؛
+    پاسخ‌های sendMessage/editMessageText تعاملی در این حالت (یا بعد از تمام شدن
+    تلاش‌ها با خطای موقت) در outbox می‌مانند و result.queued برابر True است.
+    """
+
+    def __init__(self, url, workers=SEND_WORKERS, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, chat_burst=CHAT_BURST, max_retries=SEND_MAX_RETRIES,
+                 outbox=None, breaker=None):
+        self.url = url
+        self.outbox = outbox
+        self.breaker = breaker or CircuitBreaker()
+        self.workers = workers
+        self.max_retries = max_retries
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        # به ترتیب آخرین استفاده؛ حذف قدیمی‌ترین O(1) است و زیر _chat_lock چیزی پیمایش نمی‌شود
+        self._chat_buckets = collections.OrderedDict()
+        self._chat_lock = threading.Lock()
+        self._jobs = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"sender-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, method, payload, priority=PRIORITY_INTERACTIVE, durable=None):
+        chat_id = payload.get("chat_id")
+        if durable is None:
+            durable = method in OUTBOX_METHODS and priority == PRIORITY_INTERACTIVE
+        durable = durable and self.outbox is not None and chat_id is not None
+        # پیام‌های قبلی این چت هنوز در outbox هستند (یا مدار باز است): پشت سر آن‌ها می‌رود تا ترتیب حفظ شود
+        if durable and (self.outbox.has_pending(chat_id) or self.breaker.is_open()):
+            return self._park(method, payload, DeliveryResult(False, chat_id, error="queued behind outbox"))
+
+        if chat_id is not None:
+            wait = self._chat_bucket(chat_id).reserve()
+            if wait:
+                time.sleep(wait)
+
+        future = Future()
+        # Trace آپدیت فعلی (اگر ردیابی می‌شود) همراه درخواست به نخ ارسال می‌رود
+        self._jobs.put((priority, next(self._seq), method, payload, durable, tracing.current(), future))
+        return future
+
+    def call(self, method, payload, priority=PRIORITY_INTERACTIVE, durable=None):
+        with tracing.span(f"send {method}"):
+            return self.submit(method, payload, priority, durable).result()
+
+    def deliver(self, method, payload):
+        """ارسال هم‌زمان در نخ فراخواننده، بدون صف و بدون outbox (برای تخلیه outbox)"""
+        return self._deliver(method, payload)
+
+    def _park(self, method, payload, result):
+        self.outbox.put(payload["chat_id"], method, payload)
+        result.queued = True
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def set_global_rate(self, rate):
+        """در حالت چند پردازه‌ای سهمیه کلی بین کارگرها تقسیم می‌شود"""
+        self._global_bucket = TokenBucket(rate, rate)
+
+    def queue_depth(self):
+        return self._jobs.qsize()
+
+    def _chat_bucket(self, chat_id):
+        with self._chat_lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                if len(self._chat_buckets) >= SEND_MAX_CHATS:
+                    self._chat_buckets.popitem(last=False)
+                bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+            return bucket
+
+    def _worker(self):
+        while True:
+            priority, seq, method, payload, durable, trace, future = self._jobs.get()
+            try:
+                with tracing.span(f"http {method}", trace):
+                    result = self._deliver(method, payload)
+                if durable and result.transient:
+                    self._park(method, payload, result)
+            except Exception as e:
+                result = DeliveryResult(False, payload.get("chat_id"), error=str(e))
+            future.set_result(result)
+
+    def _deliver(self, method, payload):
+        chat_id = payload.get("chat_id")
+        status = error = retry_after = None
+
+        for attempt in range(1, self.max_retries + 2):
+            if not self.breaker.allow():
+                # مدار باز است؛ تلاش دوباره فقط نخ ارسال را معطل می‌کند
+                return DeliveryResult(False, chat_id, status, attempts=attempt - 1,
+                                      error=error or "circuit open", retry_after=retry_after)
+            wait = self._global_bucket.reserve()
+            if wait:
+                time.sleep(wait)
+
+            retry_after = None
+            started = time.perf_counter()
+            try:
+                response = self.session.post(self.url + method, data=encode_payload(payload),
+                                             headers=JSON_HEADERS, timeout=SEND_TIMEOUT)
+                status = response.status_code
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                error = str(e)
+                API_ERRORS.labels(method, 'network').inc()
+                self.breaker.record_failure()
+            else:
+                API_LATENCY.labels(method).observe(time.perf_counter() - started)
+                # 429 و خطاهای 4xx یعنی API در دسترس است؛ فقط 5xx مدار را باز می‌کند
+                if status >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if data.get("ok"):
+                    result = data.get("result")
+                    message_id = result.get("message_id") if isinstance(result, dict) else None
+                    return DeliveryResult(True, chat_id, status, message_id, attempt)
+
+                error = data.get("description", "unknown error")
+                API_ERRORS.labels(method, str(status)).inc()
+                retry_after = data.get("parameters", {}).get("retry_after")
+                if status not in RETRYABLE_STATUS:
+                    return DeliveryResult(False, chat_id, status, attempts=attempt, error=error)
+
+            if attempt > self.max_retries:
+                break
+
+            # اگر تلگرام retry_after داده باشد همان را رعایت می‌کنیم، وگرنه backoff نمایی
+            delay = retry_after if retry_after else min(0.5 * 2 ** (attempt - 1), 8)
+            time.sleep(delay + random.uniform(0, delay * 0.25 + 0.1))
+
+        return DeliveryResult(False, chat_id, status, attempts=self.max_retries + 1,
+                              error=error, retry_after=retry_after)
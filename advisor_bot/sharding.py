@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+تقسیم چت‌ها بین چند پردازه - Multi-process Worker Sharding
+
+یک پردازه دریافت (ingest) آپدیت‌ها را می‌گیرد و بر اساس consistent hashing
+روی chat_id به یکی از N پردازه کارگر می‌فرستد. هر چت همیشه مال یک کارگر است،
+پس وضعیت آن بدون هیچ قفل مشترکی در حافظه همان کارگر می‌ماند.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from .dispatcher import chat_key
+
+BOT_WORKERS = int(os.environ.get('BOT_WORKERS', '1'))
+SHARD_VNODES = int(os.environ.get('SHARD_VNODES', '64'))
+SHARD_QUEUE_SIZE = int(os.environ.get('SHARD_QUEUE_SIZE', '1000'))
+SHARD_DRAIN_TIMEOUT = float(os.environ.get('SHARD_DRAIN_TIMEOUT', '30'))
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(str(value).encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """حلقه consistent hashing با گره‌های مجازی؛ با تغییر N فقط حدود 1/N چت‌ها جابه‌جا می‌شوند"""
+
+    def __init__(self, worker_count, vnodes=SHARD_VNODES):
+        self.worker_count = worker_count
+        points = sorted((_hash(f"worker-{w}-{v}"), w) for w in range(worker_count) for v in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, key):
+        i = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._owners[i]
+
+
+class WorkerSource:
+    """
+    منبع آپدیت برای Dispatcher داخل پردازه کارگر (به جای UpdateFetcher).
+    پیام‌های کنترلی ('drain' و 'stop') همین‌جا در نخ کمکی اجرا می‌شوند تا
+    حلقه رویداد به پردازش هندلرهای در جریان ادامه دهد.
+    """
+
+    def __init__(self, index, updates, acks, on_drain, on_stop):
+        self.index = index
+        self.updates = updates
+        self.acks = acks
+        self.on_drain = on_drain
+        self.on_stop = on_stop
+
+    def get_batch(self, timeout=None):
+        while True:
+            item = self.updates.get(timeout=timeout)
+            if isinstance(item, list):
+                return item
+            command = item[0]
+            if command == 'drain':
+                self.on_drain(item[1])
+                self.acks.put((self.index, 'drained'))
+            elif command == 'stop':
+                self.on_stop()
+                self.acks.put((self.index, 'stopped'))
+                # صف multiprocessing با نخ کمکی می‌نویسد؛ قبل از خروج باید تخلیه شود
+                self.acks.close()
+                self.acks.join_thread()
+                os._exit(0)
+
+
+class Supervisor:
+    """
+    پردازه‌های کارگر را اجرا می‌کند، در صورت کرش دوباره راه می‌اندازد و
+    آپدیت‌ها را بین آن‌ها پخش می‌کند. resize تعداد کارگرها را در حین اجرا
+    تغییر می‌دهد: ابتدا همه کارگرها کارهای در جریان را تمام کرده و وضعیت را
+    در دیتابیس مشترک ذخیره می‌کنند، سپس حلقه جدید فعال می‌شود و هر چت در
+    اولین پیام بعدی از دیتابیس در کارگر جدیدش بارگذاری می‌شود.
+    """
+
+    def __init__(self, target, worker_count=BOT_WORKERS):
+        self.target = target
+        self.context = multiprocessing.get_context('spawn')
+        self.ring = HashRing(worker_count)
+        self.acks = self.context.Queue()
+        self.queues = []
+        self.processes = []
+        self.restarts = 0
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def start(self):
+        for index in range(self.ring.worker_count):
+            self._add_worker(index)
+        threading.Thread(target=self._monitor, name="shard-supervisor", daemon=True).start()
+
+    def _add_worker(self, index):
+        if index >= len(self.queues):
+            self.queues.append(self.context.Queue(maxsize=SHARD_QUEUE_SIZE))
+            self.processes.append(None)
+        self._spawn(index)
+
+    def _spawn(self, index):
+        process = self.context.Process(
+            target=self.target,
+            args=(index, self.ring.worker_count, self.queues[index], self.acks),
+            name=f"bot-worker-{index}", daemon=True)
+        process.start()
+        self.processes[index] = process
+        print(f"👷 کارگر {index} با pid {process.pid} اجرا شد")
+
+    def _monitor(self):
+        while not self._stopping:
+            time.sleep(1)
+            with self._lock:
+                for index, process in enumerate(self.processes):
+                    if process is not None and not process.is_alive() and not self._stopping:
+                        print(f"⚠️ کارگر {index} متوقف شد (کد {process.exitcode})؛ راه‌اندازی دوباره")
+                        self.restarts += 1
+                        self._spawn(index)
+
+    def route(self, updates):
+        """یک دسته آپدیت را بر اساس chat_id بین کارگرها پخش می‌کند"""
+        with self._lock:
+            shards = {}
+            for update in updates:
+                shards.setdefault(self.ring.owner(chat_key(update)), []).append(update)
+            for index, batch in shards.items():
+                self.queues[index].put(batch)
+
+    async def submit(self, update):
+        """رابط سازگار با Dispatcher برای WebhookServer"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.route, [update])
+
+    def _wait_acks(self, count, kind):
+        deadline = time.monotonic() + SHARD_DRAIN_TIMEOUT
+        received = 0
+        while received < count:
+            try:
+                index, ack = self.acks.get(timeout=max(0.1, deadline - time.monotonic()))
+            except queue.Empty:
+                print(f"⚠️ فقط {received} از {count} کارگر {kind} را تایید کردند")
+                return
+            if ack == kind:
+                received += 1
+
+    def scale(self, delta):
+        """افزودن یا کم کردن کارگر نسبت به تعداد فعلی (برای سیگنال‌های SIGUSR1/SIGUSR2)"""
+        with self._lock:
+            self._resize(self.ring.worker_count + delta)
+
+    def resize(self, worker_count):
+        with self._lock:
+            self._resize(worker_count)
+
+    def _resize(self, worker_count):
+        old_count = self.ring.worker_count
+        if worker_count < 1 or worker_count == old_count:
+            return
+        print(f"🔀 تغییر تعداد کارگرها از {old_count} به {worker_count}")
+
+        # ۱. همه کارگرها کارهای جاری را تمام و وضعیت را ذخیره می‌کنند
+        for index in range(old_count):
+            self.queues[index].put(('drain', worker_count))
+        self._wait_acks(old_count, 'drained')
+
+        # ۲. کارگرهای اضافه متوقف و کارگرهای جدید اجرا می‌شوند
+        for index in range(worker_count, old_count):
+            self.queues[index].put(('stop',))
+        if worker_count < old_count:
+            self._wait_acks(old_count - worker_count, 'stopped')
+            for index in range(worker_count, old_count):
+                self.processes[index].join(5)
+            del self.processes[worker_count:]
+            del self.queues[worker_count:]
+
+        self.ring = HashRing(worker_count)
+        for index in range(old_count, worker_count):
+            self._add_worker(index)
+
+    def stop(self):
+        self._stopping = True
+        with self._lock:
+            for q in self.queues:
+                q.put(('stop',))
+            for process in self.processes:
+                process.join(10)
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+پشتیبان‌گیری افزایشی - Incremental Snapshot Backups
+
+استفاده از خط فرمان (بات باید هنگام restore متوقف باشد):
+    python -m advisor_bot.snapshot list
+    python -m advisor_bot.snapshot create
+    python -m advisor_bot.snapshot restore [SNAPSHOT_ID] [--target DIR] [--force]
+    python -m advisor_bot.snapshot prune [--keep N]
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+from . import metrics
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'backup')
+# فاصله دو snapshot (ثانیه)؛ ۰ پشتیبان‌گیری خودکار را غیرفعال می‌کند
+SNAPSHOT_INTERVAL = float(os.environ.get('SNAPSHOT_INTERVAL', '3600'))
+# تعداد snapshot هایی که نگه داشته می‌شوند؛ chunk هایی که دیگر به کار نمی‌روند پاک می‌شوند
+SNAPSHOT_KEEP = int(os.environ.get('SNAPSHOT_KEEP', '48'))
+# اندازه chunk مضربی از اندازه صفحه SQLite (۴ کیلوبایت) است تا صفحه‌های تغییرنکرده
+# همیشه همان chunk های قبلی را بسازند؛ chunk کوچک‌تر یعنی نوشتن کمتر و فایل بیشتر
+SNAPSHOT_CHUNK_SIZE = int(os.environ.get('SNAPSHOT_CHUNK_SIZE', str(16 * 1024)))
+SNAPSHOT_COMPRESS_LEVEL = int(os.environ.get('SNAPSHOT_COMPRESS_LEVEL', '6'))
+
+SNAPSHOT_LATENCY = metrics.histogram('bot_snapshot_seconds', 'Time to take one snapshot',
+                                     buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300))
+SNAPSHOT_CHUNKS = metrics.counter('bot_snapshot_chunks_total', 'Snapshot chunks by whether they had to be written',
+                                  ('result',))
+SNAPSHOT_BYTES = metrics.counter('bot_snapshot_bytes_written_total', 'Compressed bytes written to the snapshot store')
+SNAPSHOT_ERRORS = metrics.counter('bot_snapshot_errors_total', 'Failed snapshots')
+for _result in ('new', 'reused'):
+    SNAPSHOT_CHUNKS.labels(_result)
+
+# chunk های تازه‌تر از این (ثانیه) هنگام prune پاک نمی‌شوند؛ ممکن است snapshot در
+# حال ساخت به آن‌ها ارجاع بدهد و manifest آن هنوز نوشته نشده باشد
+SWEEP_GRACE = 3600
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SnapshotStore:
+    """
+    مخزن محتوامحور: هر فایل به chunk های هم‌اندازه تقسیم می‌شود و هر chunk با
+    نام sha256 محتوایش و فشرده با zlib فقط یک بار در chunks/ ذخیره می‌شود.
+    هر snapshot یک manifest در snapshots/ است که فهرست chunk های هر فایل را
+    دارد؛ پس snapshot بعدی فقط chunk هایی را می‌نویسد که از آخرین بار تغییر کرده‌اند.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, chunk_size=SNAPSHOT_CHUNK_SIZE, level=SNAPSHOT_COMPRESS_LEVEL):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.level = level
+        self.chunks_dir = os.path.join(root, 'chunks')
+        self.manifests_dir = os.path.join(root, 'snapshots')
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def put_file(self, path, stats):
+        """فایل را chunk به chunk ذخیره می‌کند و مدخل manifest آن را برمی‌گرداند"""
+        chunks = []
+        whole = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                size += len(data)
+                whole.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                chunk_path = self._chunk_path(digest)
+                if os.path.exists(chunk_path):
+                    # زمان تغییر به‌روز می‌شود تا prune هم‌زمان آن را پاک نکند
+                    os.utime(chunk_path)
+                    stats['chunks_reused'] += 1
+                else:
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                    compressed = zlib.compress(data, self.level)
+                    _write_atomic(chunk_path, compressed)
+                    stats['chunks_new'] += 1
+                    stats['bytes_written'] += len(compressed)
+                chunks.append(digest)
+        return {'size': size, 'sha256': whole.hexdigest(), 'chunks': chunks}
+
+    def read_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"corrupt chunk {digest}")
+        return data
+
+    def write_manifest(self, files, stats):
+        created = datetime.now(timezone.utc)
+        snapshot_id = created.strftime('%Y%m%dT%H%M%SZ')
+        existing = set(self.list())
+        suffix = 1
+        while snapshot_id in existing:
+            snapshot_id = f"{created.strftime('%Y%m%dT%H%M%SZ')}-{suffix}"
+            suffix += 1
+        manifest = {'id': snapshot_id, 'created': created.isoformat(timespec='seconds'),
+                    'files': files, 'stats': stats}
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        _write_atomic(os.path.join(self.manifests_dir, snapshot_id + '.json'),
+                      json.dumps(manifest, ensure_ascii=False, indent=1).encode('utf-8'))
+        return manifest
+
+    def list(self):
+        """شناسه snapshot ها از قدیمی به جدید"""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.manifests_dir) if name.endswith('.json'))
+
+    def load(self, snapshot_id=None):
+        """manifest یک snapshot (پیش‌فرض: آخرین)"""
+        if snapshot_id is None:
+            ids = self.list()
+            if not ids:
+                raise FileNotFoundError(f"no snapshots in {self.root}")
+            snapshot_id = ids[-1]
+        with open(os.path.join(self.manifests_dir, snapshot_id + '.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def restore_file(self, entry, dest):
+        """فایل را از chunk ها بازسازی و با sha256 کل فایل بررسی می‌کند"""
+        whole = hashlib.sha256()
+        tmp = f"{dest}.restore"
+        with open(tmp, 'wb') as f:
+            for digest in entry['chunks']:
+                data = self.read_chunk(digest)
+                whole.update(data)
+                f.write(data)
+        if whole.hexdigest() != entry['sha256']:
+            os.remove(tmp)
+            raise ValueError(f"restored {dest} does not match the snapshot checksum")
+        os.replace(tmp, dest)
+
+    def prune(self, keep=SNAPSHOT_KEEP):
+        """snapshot های قدیمی‌تر از keep تای آخر و chunk های بدون ارجاع را حذف می‌کند"""
+        ids = self.list()
+        removed = ids[:-keep] if keep > 0 else []
+        for snapshot_id in removed:
+            os.remove(os.path.join(self.manifests_dir, snapshot_id + '.json'))
+
+        referenced = set()
+        for snapshot_id in ids[len(removed):]:
+            for entry in self.load(snapshot_id)['files'].values():
+                referenced.update(entry['chunks'])
+        swept = 0
+        cutoff = time.time() - SWEEP_GRACE
+        for prefix in os.listdir(self.chunks_dir) if os.path.isdir(self.chunks_dir) else ():
+            directory = os.path.join(self.chunks_dir, prefix)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name not in referenced and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    swept += 1
+        return len(removed), swept
+
+
+class Snapshotter:
+    """
+    در یک نخ پس‌زمینه هر interval ثانیه از منابع ثبت‌شده snapshot می‌گیرد.
+    دیتابیس‌های SQLite با backup API خود SQLite کپی می‌شوند: کپی در یک تراکنش
+    خواندنی انجام می‌شود و در حالت WAL نوشتن هندلرها را بلاک نمی‌کند، پس هر
+    فایل دقیقاً وضعیت یک لحظه است. پیش از کپی، تغییرات نوشتن تأخیری هر منبع
+    (before) ذخیره می‌شوند.
+    """
+
+    def __init__(self, store, interval=SNAPSHOT_INTERVAL, keep=SNAPSHOT_KEEP):
+        self.store = store
+        self.interval = interval
+        self.keep = keep
+        self._sources = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add_sqlite(self, name, path, before=None):
+        self._sources.append((name, path, 'sqlite', before))
+
+    def add_file(self, name, path, before=None):
+        """فایل معمولی (مثل نتایج jsonl که فقط به انتهایش اضافه می‌شود)"""
+        self._sources.append((name, path, 'file', before))
+
+    def start(self):
+        if not self.interval:
+            return
+        self._thread = threading.Thread(target=self._run, name="snapshot", daemon=True)
+        self._thread.start()
+
+    def snapshot(self):
+        """یک snapshot می‌گیرد و manifest آن را برمی‌گرداند"""
+        with self._lock, SNAPSHOT_LATENCY.time():
+            started = time.perf_counter()
+            stats = {'chunks_new': 0, 'chunks_reused': 0, 'bytes_written': 0}
+            files = {}
+            for name, path, kind, before in self._sources:
+                if before:
+                    before()
+                if not os.path.exists(path):
+                    continue
+                if kind == 'sqlite':
+                    os.makedirs(self.store.root, exist_ok=True)
+                    copy = os.path.join(self.store.root, f"{name}.copy")
+                    try:
+                        self._copy_sqlite(path, copy)
+                        entry = self.store.put_file(copy, stats)
+                    finally:
+                        if os.path.exists(copy):
+                            os.remove(copy)
+                else:
+                    entry = self.store.put_file(path, stats)
+                files[name] = {'path': path, 'kind': kind, **entry}
+            stats['seconds'] = round(time.perf_counter() - started, 3)
+            manifest = self.store.write_manifest(files, stats)
+            self.store.prune(self.keep)
+        SNAPSHOT_CHUNKS.labels('new').inc(stats['chunks_new'])
+        SNAPSHOT_CHUNKS.labels('reused').inc(stats['chunks_reused'])
+        SNAPSHOT_BYTES.inc(stats['bytes_written'])
+        return manifest
+
+    @staticmethod
+    def _copy_sqlite(path, dest):
+        src = sqlite3.connect(path, timeout=30)
+        dst = sqlite3.connect(dest)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                manifest = self.snapshot()
+                stats = manifest['stats']
+                print(f"✅ پشتیبان‌گیری انجام شد - {manifest['id']} "
+                      f"({stats['chunks_new']} chunk جدید، {stats['bytes_written'] // 1024} KB، {stats['seconds']}s)")
+            except Exception as e:
+                SNAPSHOT_ERRORS.inc()
+                print(f"⚠️ خطا در پشتیبان‌گیری: {e}")
+
+
+def restore(store, snapshot_id=None, target=None, names=None, force=False):
+    """
+    فایل‌های یک snapshot را در مسیر اصلی‌شان (یا پوشه target) بازسازی می‌کند و
+    مسیرهای نوشته‌شده را برمی‌گرداند. فایل‌های -wal و -shm کهنه کنار دیتابیس
+    حذف می‌شوند؛ وگرنه SQLite آن‌ها را روی فایل بازیابی‌شده اعمال می‌کرد.
+    """
+    manifest = store.load(snapshot_id)
+    restored = []
+    for name, entry in manifest['files'].items():
+        if names and name not in names:
+            continue
+        dest = os.path.join(target, os.path.basename(entry['path'])) if target else entry['path']
+        if os.path.exists(dest) and not force:
+            raise FileExistsError(f"{dest} exists; stop the bot and pass --force to overwrite")
+        if os.path.dirname(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+        store.restore_file(entry, dest)
+        if entry['kind'] == 'sqlite':
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(dest + suffix):
+                    os.remove(dest + suffix)
+        restored.append(dest)
+    return manifest, restored
+
+
+def default_snapshotter():
+    """منابع پیش‌فرض بات (همان مسیرهای تنظیم‌شده با متغیرهای محیطی) برای خط فرمان"""
+    from .broadcast import BROADCAST_DB_PATH
+    from .outbox import OUTBOX_PATH
+    from .results_store import open_results_store
+    from .state_store import STATE_DB_PATH
+
+    snapshotter = Snapshotter(SnapshotStore())
+    snapshotter.add_sqlite('state', STATE_DB_PATH)
+    add_results_source(snapshotter, open_results_store())
+    snapshotter.add_sqlite('broadcasts', BROADCAST_DB_PATH)
+    snapshotter.add_sqlite('outbox', OUTBOX_PATH)
+    return snapshotter
+
+
+def add_results_source(snapshotter, results_store, before=None):
+    from .results_store import SQLiteResultsStore
+
+    if isinstance(results_store, SQLiteResultsStore):
+        snapshotter.add_sqlite('results', results_store.path, before)
+    else:
+        snapshotter.add_file('results', results_store.path, before)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m advisor_bot.snapshot', description="Incremental snapshot backups")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="list snapshots")
+    commands.add_parser('create', help="take a snapshot now")
+    restore_parser = commands.add_parser('restore', help="restore a snapshot (default: the latest)")
+    restore_parser.add_argument('snapshot_id', nargs='?')
+    restore_parser.add_argument('--target', help="write files into this directory instead of their original paths")
+    restore_parser.add_argument('--only', action='append', help="restore only this source (state, results, broadcasts)")
+    restore_parser.add_argument('--force', action='store_true', help="overwrite existing files")
+    prune_parser = commands.add_parser('prune', help="delete old snapshots and unreferenced chunks")
+    prune_parser.add_argument('--keep', type=int, default=SNAPSHOT_KEEP)
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore()
+    if args.command == 'list':
+        for snapshot_id in store.list():
+            manifest = store.load(snapshot_id)
+            size = sum(entry['size'] for entry in manifest['files'].values())
+            print(f"{snapshot_id}  {size // 1024:>8} KB  {manifest['stats']['bytes_written'] // 1024:>8} KB new  "
+                  f"{', '.join(manifest['files'])}")
+    elif args.command == 'create':
+        manifest = default_snapshotter().snapshot()
+        print(f"✅ snapshot {manifest['id']}: {manifest['stats']}")
+    elif args.command == 'restore':
+        try:
+            manifest, restored = restore(store, args.snapshot_id, args.target, args.only, args.force)
+        except (FileExistsError, FileNotFoundError, ValueError) as e:
+            print(f"⚠️ {e}")
+            return 1
+        for path in restored:
+            print(f"✅ {path}")
+        print(f"snapshot {manifest['id']} ({manifest['created']}) بازیابی شد")
+    elif args.command == 'prune':
+        removed, swept = store.prune(args.keep)
+        print(f"🧹 {removed} snapshot و {swept} chunk حذف شد")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
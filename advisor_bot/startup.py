@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+زمان‌سنجی راه‌اندازی - Startup Timing Report
+
+نقطه ورود پیش از هر import سنگینی این ماژول را وارد می‌کند؛ سپس هر مرحله با
+mark ثبت می‌شود و report زمان رسیدن به اولین getUpdates (یا گوش دادن webhook)
+را گزارش می‌دهد (همه زمان‌ها از لحظه ایجاد پردازه):
+    ⏱ راه‌اندازی: interpreter 0.031s | imports 0.162s | services 0.171s | first getUpdates 0.205s
+"""
+
+import os
+import time
+
+STARTED = time.perf_counter()
+
+_phases = []
+_reported = False
+
+
+def _interpreter_seconds():
+    """زمان بین ایجاد پردازه و اجرای این ماژول (فقط لینوکس، از /proc)"""
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    age = uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    return max(0.0, age - (time.perf_counter() - STARTED))
+
+
+INTERPRETER_SECONDS = _interpreter_seconds()
+
+
+def mark(phase):
+    _phases.append((phase, time.perf_counter() - STARTED))
+
+
+def phases():
+    if INTERPRETER_SECONDS is None:
+        return list(_phases)
+    return [('interpreter', INTERPRETER_SECONDS)] + [(name, INTERPRETER_SECONDS + s) for name, s in _phases]
+
+
+def report(phase):
+    """ثبت مرحله آخر و چاپ گزارش؛ فقط بار اول اثر دارد"""
+    global _reported
+    if _reported:
+        return
+    _reported = True
+    mark(phase)
+    from . import metrics
+
+    gauge = metrics.gauge('bot_startup_seconds', 'Seconds from process start to each startup phase', ('phase',))
+    for name, seconds in phases():
+        gauge.labels(name).set(round(seconds, 4))
+    print("⏱ راه‌اندازی: " + " | ".join(f"{name} {seconds:.3f}s" for name, seconds in phases()), flush=True)
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+ذخیره‌سازی وضعیت کاربران - Persistent Session State Store
+"""
+
+import atexit
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+
+from . import metrics, tracing
+
+STATE_DB_PATH = os.environ.get('STATE_DB_PATH', 'bot_state.db')
+STATE_CACHE_SIZE = int(os.environ.get('STATE_CACHE_SIZE', '10000'))
+STATE_FLUSH_INTERVAL = float(os.environ.get('STATE_FLUSH_INTERVAL', '1'))
+
+FLUSH_LATENCY = metrics.histogram('bot_state_flush_seconds', 'Time to write pending session changes')
+
+# نشانگر چتی که در دیتابیس هم وجود ندارد (تا برای هر پیام دوباره جستجو نشود)
+MISSING = object()
+
+
+class StateStore:
+    """
+    دیتابیس SQLite در حالت WAL با نوشتن تأخیری (write-behind): تغییرات ابتدا
+    در حافظه جمع می‌شوند و یک نخ پس‌زمینه آن‌ها را دسته‌ای ذخیره می‌کند.
+    """
+
+    def __init__(self, path=STATE_DB_PATH, flush_interval=STATE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            namespace TEXT NOT NULL, chat_id INTEGER NOT NULL, data TEXT NOT NULL,
+            PRIMARY KEY (namespace, chat_id))""")
+        conn.commit()
+
+    def _connection(self):
+        # هر نخ اتصال خودش را دارد؛ در حالت WAL خواندن‌ها نوشتن را بلاک نمی‌کنند
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="state-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def load(self, namespace, chat_id):
+        key = (namespace, chat_id)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            if key in self._flushing:
+                return self._flushing[key]
+        with tracing.span('state.load'):
+            row = self._connection().execute(
+                "SELECT data FROM sessions WHERE namespace = ? AND chat_id = ?", key).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def load_namespace(self, namespace):
+        """همه مدخل‌های یک فضای نام را به صورت (chat_id, data) برمی‌گرداند"""
+        cursor = self._connection().execute(
+            "SELECT chat_id, data FROM sessions WHERE namespace = ?", (namespace,))
+        for chat_id, data in cursor:
+            yield chat_id, json.loads(data)
+
+    def chat_ids(self, namespace):
+        """شناسه همه چت‌های یک فضای نام (شامل تغییرات هنوز ذخیره‌نشده)"""
+        ids = {row[0] for row in self._connection().execute(
+            "SELECT chat_id FROM sessions WHERE namespace = ?", (namespace,))}
+        with self._lock:
+            for changes in (self._flushing, self._pending):
+                for (ns, chat_id), data in changes.items():
+                    if ns == namespace:
+                        if data is None:
+                            ids.discard(chat_id)
+                        else:
+                            ids.add(chat_id)
+        return ids
+
+    def write(self, namespace, chat_id, data):
+        with self._lock:
+            self._pending[(namespace, chat_id)] = data
+
+    def delete(self, namespace, chat_id):
+        self.write(namespace, chat_id, None)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+        if not pending:
+            return
+
+        upserts = []
+        deletes = []
+        for (namespace, chat_id), data in pending.items():
+            if data is None:
+                deletes.append((namespace, chat_id))
+            else:
+                upserts.append((namespace, chat_id, json.dumps(data, ensure_ascii=False)))
+
+        conn = self._connection()
+        try:
+            with conn, FLUSH_LATENCY.time():
+                conn.executemany("INSERT OR REPLACE INTO sessions (namespace, chat_id, data) VALUES (?, ?, ?)", upserts)
+                conn.executemany("DELETE FROM sessions WHERE namespace = ? AND chat_id = ?", deletes)
+        except sqlite3.Error as e:
+            print(f"⚠️ خطا در ذخیره وضعیت کاربران: {e}")
+            # تغییرات از دست نمی‌روند؛ در دور بعد دوباره تلاش می‌شود
+            with self._lock:
+                for key, data in pending.items():
+                    self._pending.setdefault(key, data)
+        finally:
+            with self._lock:
+                self._flushing = {}
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+class SessionCache(MutableMapping):
+    """
+    دیکشنری شبیه به dict با کش LRU جلوی StateStore.
+    هر چت فقط وقتی دوباره پیام بدهد از دیتابیس بارگذاری می‌شود.
+    مدخل‌هایی که در طول یک آپدیت خوانده یا نوشته شده‌اند «کثیف» هستند و تا
+    فراخوانی commit از کش بیرون رانده نمی‌شوند.
+
+    با تعیین ttl، نشست‌ها پس از عدم فعالیت منقضی می‌شوند. چون ttl برای همه
+    یکسان است، یک OrderedDict که در هر فعالیت به انتها منتقل می‌شود همیشه به
+    ترتیب زمان انقضا مرتب است؛ پس پیدا کردن منقضی‌ها فقط از ابتدای آن انجام
+    می‌شود و هزینه هر دور به تعداد کل کاربران بستگی ندارد.
+    on_expire(chat_id, value) مقداری را که باید باقی بماند برمی‌گرداند، یا None
+    برای حذف کامل نشست.
+    """
+
+    def __init__(self, store, namespace, encode=None, decode=None, capacity=STATE_CACHE_SIZE,
+                 ttl=None, on_expire=None, last_activity=None):
+        self.store = store
+        self.namespace = namespace
+        self.encode = encode or (lambda value: value)
+        self.decode = decode or (lambda data: data)
+        self.capacity = capacity
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self.last_activity = last_activity
+        self.expired_total = 0
+        self._items = collections.OrderedDict()
+        self._expiry = collections.OrderedDict()
+        self._dirty = set()
+        # نشست‌هایی که منقضی شده‌اند ولی on_expire آن‌ها را نگه داشته؛ تا استفاده بعدی دوباره منقضی نمی‌شوند
+        self._settled = set()
+        self._lock = threading.RLock()
+
+    def _lookup(self, chat_id):
+        with self._lock:
+            value = self._items.get(chat_id, None)
+            if value is not None:
+                self._items.move_to_end(chat_id)
+
+        if value is None:
+            data = self.store.load(self.namespace, chat_id)
+            value = MISSING if data is None else self.decode(data)
+            with self._lock:
+                # ممکن است نخ دیگری در این فاصله مقدار را گذاشته باشد
+                value = self._items.setdefault(chat_id, value)
+                self._items.move_to_end(chat_id)
+                self._evict()
+
+        if value is not MISSING and self.ttl and self._is_expired(chat_id, value):
+            # انقضای تنبل: نشست کهنه همین حالا و قبل از استفاده پاک می‌شود
+            value = self._expire(chat_id, value, keep_in_memory=True)
+        return value
+
+    def _is_expired(self, chat_id, value):
+        with self._lock:
+            if chat_id in self._dirty or chat_id in self._settled:
+                return False
+            deadline = self._expiry.get(chat_id)
+        if deadline is None and self.last_activity:
+            # مدخلی که تازه از دیتابیس خوانده شده و هنوز در ایندکس انقضا نیست
+            deadline = self.last_activity(value) + self.ttl
+        return deadline is not None and deadline <= time.time()
+
+    def _touch(self, chat_id):
+        if self.ttl:
+            self._settled.discard(chat_id)
+            self._expiry[chat_id] = time.time() + self.ttl
+            self._expiry.move_to_end(chat_id)
+
+    def _evict(self):
+        while len(self._items) > self.capacity:
+            for chat_id in self._items:
+                if chat_id not in self._dirty:
+                    del self._items[chat_id]
+                    break
+            else:
+                return
+
+    def _expire(self, chat_id, value, keep_in_memory=False):
+        kept = self.on_expire(chat_id, value) if self.on_expire else None
+        with self._lock:
+            self._expiry.pop(chat_id, None)
+            self._dirty.discard(chat_id)
+            self.expired_total += 1
+            if kept is None:
+                self._items[chat_id] = MISSING
+            else:
+                # last_activity مقدار نگه‌داشته‌شده هنوز قدیمی است و بدون این بار دیگر منقضی و شمرده می‌شد
+                self._settled.add(chat_id)
+                if keep_in_memory:
+                    self._items[chat_id] = kept
+                else:
+                    self._items.pop(chat_id, None)
+        if kept is None:
+            self.store.delete(self.namespace, chat_id)
+            return MISSING
+        self.store.write(self.namespace, chat_id, self.encode(kept))
+        return kept
+
+    def expire(self, max_batch=100):
+        """حداکثر max_batch نشست منقضی‌شده را از ابتدای ایندکس انقضا حذف می‌کند"""
+        now = time.time()
+        expired = []
+        with self._lock:
+            while self._expiry and len(expired) < max_batch:
+                chat_id, deadline = next(iter(self._expiry.items()))
+                if deadline > now:
+                    break
+                del self._expiry[chat_id]
+                if chat_id not in self._dirty:
+                    expired.append((chat_id, self._items.get(chat_id)))
+
+        for chat_id, value in expired:
+            if value is None:
+                data = self.store.load(self.namespace, chat_id)
+                value = MISSING if data is None else self.decode(data)
+            if value is not MISSING:
+                self._expire(chat_id, value)
+        return len(expired)
+
+    def __contains__(self, chat_id):
+        return self._lookup(chat_id) is not MISSING
+
+    def __getitem__(self, chat_id):
+        value = self._lookup(chat_id)
+        if value is MISSING:
+            raise KeyError(chat_id)
+        with self._lock:
+            self._dirty.add(chat_id)
+            self._touch(chat_id)
+        return value
+
+    def __setitem__(self, chat_id, value):
+        with self._lock:
+            self._items[chat_id] = value
+            self._items.move_to_end(chat_id)
+            self._dirty.add(chat_id)
+            self._touch(chat_id)
+            self._evict()
+
+    def __delitem__(self, chat_id):
+        if self._lookup(chat_id) is MISSING:
+            raise KeyError(chat_id)
+        with self._lock:
+            self._items[chat_id] = MISSING
+            self._expiry.pop(chat_id, None)
+            self._settled.discard(chat_id)
+            self._dirty.discard(chat_id)
+        self.store.delete(self.namespace, chat_id)
+
+    def __iter__(self):
+        # فقط مدخل‌های موجود در حافظه پیمایش می‌شوند
+        with self._lock:
+            keys = [k for k, v in self._items.items() if v is not MISSING]
+        return iter(keys)
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for v in self._items.values() if v is not MISSING)
+
+    def clear_memory(self):
+        """مدخل‌های تمیز را از حافظه (و ایندکس انقضا) حذف می‌کند؛ داده‌ها در دیتابیس می‌مانند"""
+        with self._lock:
+            for chat_id in [k for k in self._items if k not in self._dirty]:
+                del self._items[chat_id]
+                self._expiry.pop(chat_id, None)
+
+    def active_count(self):
+        """تعداد نشست‌های فعال (منقضی‌نشده)؛ O(1)"""
+        return len(self._expiry)
+
+    def commit(self, chat_id):
+        """تغییرات یک چت را (پس از پایان پردازش آپدیت) در صف ذخیره قرار می‌دهد"""
+        with self._lock:
+            if chat_id not in self._dirty:
+                return
+            self._dirty.discard(chat_id)
+            value = self._items.get(chat_id, MISSING)
+        if value is not MISSING:
+            with tracing.span('state.commit'):
+                self.store.write(self.namespace, chat_id, self.encode(value))
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+ردیابی مسیر هر آپدیت - Per-update Tracing
+
+برای درصدی از آپدیت‌ها (TRACE_SAMPLE) بازه‌های زمانی از ورود به Dispatcher تا
+اجرای هندلر، خواندن/نوشتن وضعیت و ارسال به تلگرام در TRACE_PATH نوشته می‌شود.
+قالب فایل Chrome Trace Event (آرایه JSON) است و مستقیم در ui.perfetto.dev یا
+chrome://tracing باز می‌شود؛ همه بازه‌های یک آپدیت args.update یکسان دارند.
+"""
+
+import collections
+import json
+import os
+import random
+import threading
+import time
+
+from . import metrics
+from .event_log import RotatingFile
+
+TRACE_PATH = os.environ.get('TRACE_PATH', 'traces.json')
+# کسری از آپدیت‌ها که ردیابی می‌شوند؛ ۰ یعنی خاموش (با /trace قابل تغییر است)
+TRACE_SAMPLE = float(os.environ.get('TRACE_SAMPLE', '0'))
+TRACE_MAX_BYTES = int(os.environ.get('TRACE_MAX_BYTES', str(50 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.environ.get('TRACE_BACKUPS', '3'))
+# بازه‌هایی که بیش از این در حافظه منتظر نوشتن بمانند دور ریخته می‌شوند
+TRACE_BUFFER = int(os.environ.get('TRACE_BUFFER', '100000'))
+TRACE_FLUSH_INTERVAL = float(os.environ.get('TRACE_FLUSH_INTERVAL', '1'))
+
+TRACES_TOTAL = metrics.counter('bot_traces_total', 'Updates selected for tracing')
+TRACE_DROPPED = metrics.counter('bot_trace_spans_dropped_total', 'Trace spans dropped because the buffer was full')
+
+_local = threading.local()
+
+
+class _NoSpan:
+    """وقتی آپدیت فعلی ردیابی نمی‌شود؛ هزینه span فقط یک جستجوی thread-local است"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.record(self.name, self.started, time.perf_counter(),
+                          error=exc_type.__name__ if exc_type else None)
+        return False
+
+
+class Trace:
+    """
+    بازه‌های یک آپدیت. Dispatcher آن را می‌سازد و در نخ هندلر فعال می‌کند؛
+    کدی که در همان نخ اجرا می‌شود با span() بازه اضافه می‌کند و OutboundSender
+    ارجاع آن را همراه درخواست به نخ ارسال می‌برد.
+    """
+
+    __slots__ = ('tracer', 'id', 'chat_id', 'started', 'handler_started', '_previous')
+
+    def __init__(self, tracer, trace_id, chat_id):
+        self.tracer = tracer
+        self.id = trace_id
+        self.chat_id = chat_id
+        self.started = time.perf_counter()
+        self.handler_started = None
+        self._previous = None
+
+    def record(self, name, start, end, error=None, tid=None):
+        self.tracer.record(self, name, start, end, error, tid or threading.get_ident())
+
+    def span(self, name):
+        return Span(self, name)
+
+    def activate(self):
+        """در نخ هندلر، پیش از اجرای هندلر"""
+        self.handler_started = time.perf_counter()
+        self._previous = getattr(_local, 'trace', None)
+        _local.trace = self
+
+    def finish(self, error=None):
+        end = time.perf_counter()
+        _local.trace = self._previous
+        self.record('handler', self.handler_started, end, error)
+        # کل عمر آپدیت و انتظار در صف Dispatcher بازه‌های async هستند (در نخ خاصی اجرا نمی‌شوند)
+        self.tracer.record(self, 'update', self.started, end, error, None)
+        self.tracer.record(self, 'dispatch.wait', self.started, self.handler_started, None, None)
+
+
+def current():
+    return getattr(_local, 'trace', None)
+
+
+def span(name, trace=None):
+    """with span('state.load'): ... ؛ بدون آپدیت ردیابی‌شده کاری انجام نمی‌دهد"""
+    if trace is None:
+        trace = getattr(_local, 'trace', None)
+        if trace is None:
+            return NO_SPAN
+    return Span(trace, name)
+
+
+class Tracer:
+    """
+    انتخاب آپدیت‌ها و نوشتن بازه‌ها. record فقط یک tuple به صف حافظه اضافه
+    می‌کند؛ تبدیل به JSON و نوشتن در فایل در نخ پس‌زمینه انجام می‌شود.
+    """
+
+    def __init__(self, path=TRACE_PATH, sample_rate=TRACE_SAMPLE, buffer=TRACE_BUFFER,
+                 flush_interval=TRACE_FLUSH_INTERVAL):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.buffer = buffer
+        self.flush_interval = flush_interval
+        self.file = None
+        self._events = collections.deque()
+        self._random = random.Random()
+        self._thread = None
+
+    def begin(self, trace_id, chat_id):
+        """Trace جدید یا None اگر این آپدیت انتخاب نشده باشد"""
+        if not self.sample_rate or self._random.random() >= self.sample_rate:
+            return None
+        TRACES_TOTAL.inc()
+        return Trace(self, trace_id, chat_id)
+
+    def set_sample_rate(self, rate):
+        self.sample_rate = min(1.0, max(0.0, rate))
+        if self.sample_rate and self._thread is None:
+            self.start()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        # در حالت چند پردازه‌ای مسیر فایل پیش از start برای هر کارگر تنظیم می‌شود
+        self.file = RotatingFile(self.path, max_bytes=TRACE_MAX_BYTES, interval=0, backups=TRACE_BACKUPS,
+                                 header='[\n')
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, trace, name, start, end, error, tid):
+        if len(self._events) >= self.buffer:
+            TRACE_DROPPED.inc()
+            return
+        self._events.append((trace.id, trace.chat_id, name, start, end, error, tid))
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            if not self._events:
+                continue
+            try:
+                self._write()
+            except Exception as e:
+                print(f"⚠️ خطا در نوشتن فایل ردیابی: {e}")
+
+    def _write(self):
+        pid = os.getpid()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        lines = []
+        tids = set()
+        while self._events:
+            trace_id, chat_id, name, start, end, error, tid = self._events.popleft()
+            args = {"update": trace_id, "chat": chat_id}
+            if error:
+                args["error"] = error
+            ts = round(start * 1e6, 1)
+            if tid is None:
+                base = {"name": name, "cat": "update", "id": str(trace_id), "pid": pid, "args": args}
+                lines.append(json.dumps({**base, "ph": "b", "ts": ts}))
+                lines.append(json.dumps({**base, "ph": "e", "ts": round(end * 1e6, 1)}))
+            else:
+                tids.add(tid)
+                lines.append(json.dumps({"name": name, "cat": "bot", "ph": "X", "ts": ts,
+                                         "dur": round((end - start) * 1e6, 1), "pid": pid, "tid": tid,
+                                         "args": args}))
+        # نام نخ‌ها در هر دسته تکرار می‌شود تا بعد از چرخش فایل هم در دسترس باشد
+        for tid in tids:
+            lines.append(json.dumps({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                                     "args": {"name": names.get(tid, str(tid))}}))
+        # آرایه بسته نمی‌شود؛ قالب Chrome Trace کاما و ] پایانی را اختیاری می‌داند
+        self.file.write(',\n'.join(lines) + ',\n')
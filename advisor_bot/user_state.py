@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+وضعیت فشرده کاربران - Compact Per-user State
+"""
+
+import sys
+import time
+from enum import Enum
+
+from .flows import MENU
+from .intents import normalize
+
+
+class _Interned(str, Enum):
+    """
+    مقدارهای تکراری (پایه، نوع آلارم) فقط یک شیء مشترک دارند؛ رشته‌ای که از
+    JSON دیتابیس خوانده می‌شود برای هر کاربر یک نسخه تازه می‌ساخت.
+    چون زیرکلاس str هستند در f-string و JSON مثل همان متن رفتار می‌کنند.
+    """
+
+    __str__ = str.__str__
+    __format__ = str.__format__
+
+    @classmethod
+    def get(cls, value, default=None):
+        return cls._value2member_map_.get(value, default)
+
+
+class Grade(_Interned):
+    SIXTH = "ششم"
+    SEVENTH = "هفتم"
+    EIGHTH = "هشتم"
+    NINTH = "نهم"
+    TENTH = "دهم"
+    ELEVENTH = "یازدهم"
+    TWELFTH = "دوازدهم"
+
+
+class AlarmType(_Interned):
+    STUDY = "study"
+    BREAK = "break"
+
+
+# روزهای هفته شمسی (به ترتیب نمایش) به شماره روز در پایتون (دوشنبه = ۰)؛
+# بیت n ماسک روزهای آلارم یعنی روز n پایتون
+DAY_TO_WEEKDAY = {
+    "شنبه": 5, "یکشنبه": 6, "دوشنبه": 0, "سه‌شنبه": 1,
+    "چهارشنبه": 2, "پنجشنبه": 3, "جمعه": 4,
+}
+ALL_DAYS = 0b1111111
+
+
+def parse_alarm_time(text):
+    """'08:00' یا '۰۸:۰۰' را به (ساعت، دقیقه) تبدیل می‌کند"""
+    hour, minute = normalize(text).split(":")
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"invalid alarm time: {text}")
+    return hour, minute
+
+
+def day_bit(name):
+    return 1 << DAY_TO_WEEKDAY[name]
+
+
+def day_mask(names):
+    """لیست قدیمی نام روزها (یا ['all']) به ماسک ۷ بیتی"""
+    if not names or "all" in names:
+        return ALL_DAYS
+    mask = 0
+    for name in names:
+        if name in DAY_TO_WEEKDAY:
+            mask |= day_bit(name)
+    return mask or ALL_DAYS
+
+
+def day_names(mask):
+    return [name for name, weekday in DAY_TO_WEEKDAY.items() if mask >> weekday & 1]
+
+
+class Alarm:
+    """آلارم: زمان به صورت دقیقه از ابتدای روز و روزها به صورت ماسک ۷ بیتی"""
+
+    __slots__ = ('id', 'type', 'minute', 'days', 'active')
+
+    def __init__(self, id, type=AlarmType.STUDY, minute=8 * 60, days=ALL_DAYS, active=True):
+        self.id = id
+        self.type = type
+        self.minute = minute
+        self.days = days
+        self.active = active
+
+    @property
+    def time(self):
+        return "%02d:%02d" % divmod(self.minute, 60)
+
+    def runs_on(self, weekday):
+        return bool(self.days >> weekday & 1)
+
+    def days_text(self):
+        if self.days == ALL_DAYS:
+            return "همه روزها"
+        return "، ".join(day_names(self.days))
+
+    def to_dict(self):
+        return {'id': self.id, 'type': self.type.value, 'minute': self.minute,
+                'days': self.days, 'active': self.active}
+
+    @classmethod
+    def from_dict(cls, data):
+        # قالب قدیمی: 'time' به صورت '08:00' و 'days' به صورت لیست نام روزها
+        if 'minute' in data:
+            minute = data['minute']
+        else:
+            hour, minute = parse_alarm_time(data.get('time', '08:00'))
+            minute += hour * 60
+        days = data.get('days', ALL_DAYS)
+        if not isinstance(days, int):
+            days = day_mask(days)
+        return cls(data.get('id', 0), AlarmType.get(data.get('type'), AlarmType.STUDY),
+                   minute, days, data.get('active', True))
+
+
+class UserState:
+    """
+    همه وضعیت یک چت (جریان فعلی، ارزیابی در حال انجام، آلارم‌ها).
+    زیرظرف‌ها تنبل هستند: بازدیدکننده‌ای که فقط یک پیام فرستاده به جز خود شیء
+    هیچ لیست یا دیکشنری ندارد.
+    """
+
+    __slots__ = ('state', 'grade', 'step', 'answers', 'content', 'alarms', 'alarm_draft', 'last_activity')
+
+    def __init__(self):
+        self.state = MENU
+        self.grade = None
+        self.step = 0
+        # bytearray امتیازها و نسخه محتوای سوال‌ها (content.ContentBank) فقط در طول ارزیابی
+        self.answers = None
+        self.content = None
+        self.alarms = ()
+        self.alarm_draft = None
+        self.last_activity = time.time()
+
+    def reset_flow(self):
+        self.state = MENU
+        self.step = 0
+        self.answers = None
+        self.content = None
+        self.alarm_draft = None
+
+    def draft_alarm(self):
+        if self.alarm_draft is None:
+            self.alarm_draft = Alarm(0, days=0)
+        return self.alarm_draft
+
+    def add_alarm(self, alarm):
+        self.alarms += (alarm,)
+
+    def to_dict(self):
+        # فقط فیلدهای غیر پیش‌فرض ذخیره می‌شوند
+        data = {'last_activity': self.last_activity}
+        if self.state != MENU:
+            data['state'] = self.state
+        if self.grade is not None:
+            data['grade'] = self.grade.value
+        if self.step:
+            data['step'] = self.step
+        if self.answers is not None:
+            data['answers'] = list(self.answers)
+        if self.content is not None:
+            data['content'] = self.content
+        if self.alarms:
+            data['alarms'] = [alarm.to_dict() for alarm in self.alarms]
+        if self.alarm_draft is not None:
+            data['alarm_draft'] = self.alarm_draft.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.state = sys.intern(data.get('state', MENU))
+        state.grade = Grade.get(data.get('grade'))
+        state.step = data.get('step', 0)
+        if data.get('answers') is not None:
+            state.answers = bytearray(data['answers'])
+        if data.get('content'):
+            state.content = sys.intern(data['content'])
+        if data.get('alarms'):
+            state.alarms = tuple(Alarm.from_dict(alarm) for alarm in data['alarms'])
+        # نشست‌های قدیمی پیش‌نویس آلارم را در temp_alarm_data نگه می‌داشتند
+        draft = data.get('alarm_draft') or data.get('temp_alarm_data')
+        if draft:
+            state.alarm_draft = Alarm.from_dict({'days': 0, **draft})
+        state.last_activity = data.get('last_activity', state.last_activity)
+        return state
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+سرور webhook برای دریافت آپدیت‌ها - Webhook Ingestion Server
+
+ارسال آپدیت‌های ضبط‌شده به سرور محلی (بدون نیاز به تلگرام):
+    python -m advisor_bot.webhook replay updates.jsonl [http://127.0.0.1:8080/webhook] [secret]
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import sys
+
+WEBHOOK_HOST = os.environ.get('WEBHOOK_HOST', '0.0.0.0')
+# Railway پورت را در متغیر PORT قرار می‌دهد
+WEBHOOK_PORT = int(os.environ.get('WEBHOOK_PORT', os.environ.get('PORT', '8080')))
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', '/webhook')
+# الزامی: تلگرام آن را در هدر هر درخواست می‌فرستد و درخواست بدون آن رد می‌شود
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+# آدرس عمومی سرور (مثلاً https://my-bot.up.railway.app)؛ در صورت تنظیم، setWebhook صدا زده می‌شود
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')
+WEBHOOK_MAX_BODY = int(os.environ.get('WEBHOOK_MAX_BODY', str(1024 * 1024)))
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class WebhookServer:
+    """
+    یک سرور HTTP/1.1 کوچک روی asyncio. هر POST بلافاصله با 200 پاسخ داده می‌شود
+    و سپس آپدیت به همان Dispatcher حالت polling سپرده می‌شود. اگر Dispatcher پر
+    باشد، خواندن درخواست بعدی از همان اتصال تا خالی شدن جا به تعویق می‌افتد.
+
+    برای callback_query بدنه پاسخ خود درخواست answerCallbackQuery است (تلگرام
+    اجازه می‌دهد به webhook با یک متد پاسخ داد) و callback_query با کلید
+    '_answered' علامت می‌خورد تا هندلر درخواست جداگانه‌ای نفرستد.
+    """
+
+    def __init__(self, dispatcher, host=WEBHOOK_HOST, port=WEBHOOK_PORT,
+                 path=WEBHOOK_PATH, secret=WEBHOOK_SECRET):
+        if not secret:
+            raise ValueError("WEBHOOK_SECRET is required in webhook mode")
+        self.dispatcher = dispatcher
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret = secret
+        self.received = 0
+        self.rejected = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"🌐 webhook در حال گوش دادن روی {self.host}:{self.port}{self.path}")
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', '0'))
+                if length > WEBHOOK_MAX_BODY:
+                    await self._respond(writer, 413, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, updates = self._parse(method, path, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, keep_alive, self._reply_body(updates))
+
+                for update in updates:
+                    await self.dispatcher.submit(update)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _parse(self, method, path, headers, body):
+        path = path.split('?', 1)[0]
+        if method == 'GET' and path == '/':
+            return 200, []
+        if path != self.path:
+            return 404, []
+        if method != 'POST':
+            return 405, []
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, ''), self.secret):
+            self.rejected += 1
+            return 403, []
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, []
+
+        # تلگرام هر بار یک آپدیت می‌فرستد؛ برای بازپخش محلی لیست هم پذیرفته می‌شود
+        updates = data if isinstance(data, list) else [data]
+        self.received += len(updates)
+        return 200, updates
+
+    @staticmethod
+    def _reply_body(updates):
+        if len(updates) != 1 or "callback_query" not in updates[0]:
+            return None
+        callback = updates[0]["callback_query"]
+        callback['_answered'] = True
+        reply = {"method": "answerCallbackQuery", "callback_query_id": callback["id"]}
+        return json.dumps(reply).encode('utf-8')
+
+    @staticmethod
+    async def _respond(writer, status, keep_alive, body=None):
+        if body is None or status != 200:
+            body = b'{"ok":true}' if status == 200 else b''
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+def set_webhook(sender, allowed_updates):
+    """ثبت آدرس webhook در تلگرام (فقط اگر WEBHOOK_URL تنظیم شده باشد)"""
+    if not WEBHOOK_URL:
+        return None
+    payload = {
+        "url": WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+        "allowed_updates": allowed_updates,
+        "max_connections": 40,
+        "secret_token": WEBHOOK_SECRET,
+    }
+    return sender.call("setWebhook", payload)
+
+
+async def serve(dispatcher, server, on_ready=None):
+    await dispatcher.start()
+    await server.start()
+    if on_ready:
+        on_ready()
+    await asyncio.Event().wait()
+
+
+def replay(file_name, url, secret=''):
+    import requests
+
+    session = requests.Session()
+    headers = {SECRET_HEADER: secret} if secret else {}
+    sent = 0
+    with open(file_name, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            response = session.post(url, data=line.encode('utf-8'), headers=headers, timeout=10)
+            if response.status_code != 200:
+                print(f"⚠️ پاسخ {response.status_code} برای: {line[:60]}")
+                continue
+            sent += 1
+    print(f"✅ {sent} آپدیت به {url} ارسال شد")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'replay':
+        print("Usage: python -m advisor_bot.webhook replay updates.jsonl [url] [secret]")
+        sys.exit(1)
+
+    default_url = f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    replay(sys.argv[2],
+           sys.argv[3] if len(sys.argv) > 3 else default_url,
+           sys.argv[4] if len(sys.argv) > 4 else WEBHOOK_SECRET)
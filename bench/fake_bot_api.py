@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+سرور جعلی Bot API برای تست بار - Fake Telegram Bot API
+
+متدهای getUpdates، sendMessage و editMessageText (و چند متد جانبی) را شبیه‌سازی
+می‌کند. تأخیر پاسخ و درصد خطای 429 قابل تنظیم است و با outage می‌توان قطعی
+(پاسخ 502) را شبیه‌سازی کرد. آخرین کیبورد inline هر چت
+نگه داشته می‌شود تا press بتواند فشردن دکمه (callback_query) را شبیه‌سازی کند.
+
+اجرای مستقل (هر خط ورودی به شکل chat_id|متن یک آپدیت می‌سازد):
+    python bench/fake_bot_api.py [port] [latency_ms] [error_rate]
+"""
+
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# متدهایی که پاسخ بات به کاربر حساب می‌شوند
+REPLY_METHODS = ('sendMessage', 'editMessageText', 'answerCallbackQuery')
+
+
+class FakeBotAPI:
+    """
+    آپدیت‌ها با inject در صف قرار می‌گیرند و getUpdates آن‌ها را مثل تلگرام
+    با long polling و offset تحویل می‌دهد. هر پاسخ بات به on_reply گزارش می‌شود.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0,
+                 retry_after=1, on_reply=None, blocked=()):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.on_reply = on_reply
+        # چت‌هایی که بات را مسدود کرده‌اند (پاسخ 403)
+        self.blocked = set(blocked)
+        # قطعی شبیه‌سازی‌شده: None، 'send' (فقط متدهای پاسخ) یا 'all' (getUpdates هم)
+        self.outage = None
+        self.outage_errors = 0
+        self.calls = {}
+        # مجموع بایت‌های بدنه درخواست‌ها به تفکیک متد
+        self.payload_bytes = {}
+        self.errors_injected = 0
+        self.polled = threading.Event()
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+        self._keyboards = {}
+        self._callback_chats = {}
+        self._cond = threading.Condition()
+        self._random = random.Random(0)
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                api._handle(self)
+
+            def do_POST(self):
+                api._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        # قطع اتصال بات در هنگام خروج خطا حساب نمی‌شود
+        self.server.handle_error = lambda request, client_address: None
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-bot-api", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def inject(self, chat_id, text, name="دانش‌آموز"):
+        return self._add_update(lambda update_id: {"message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": name},
+            "from": {"id": chat_id, "is_bot": False, "first_name": name},
+            "text": text,
+        }})
+
+    def press(self, chat_id, text, name="دانش‌آموز"):
+        """فشردن دکمه‌ای با متن text در آخرین کیبورد inline فرستاده‌شده به این چت"""
+        message_id, buttons = self._keyboards[chat_id]
+        query_id = str(next(self._callback_ids))
+        self._callback_chats[query_id] = chat_id
+        return self._add_update(lambda update_id: {"callback_query": {
+            "id": query_id,
+            "from": {"id": chat_id, "is_bot": False, "first_name": name},
+            "message": {"message_id": message_id, "date": int(time.time()),
+                        "chat": {"id": chat_id, "type": "private", "first_name": name}},
+            "data": buttons[text],
+        }})
+
+    def _add_update(self, build):
+        with self._cond:
+            update_id = next(self._update_ids)
+            self._updates.append({"update_id": update_id, **build(update_id)})
+            self._cond.notify_all()
+        return update_id
+
+    def _remember_keyboard(self, chat_id, message_id, params):
+        rows = (params.get('reply_markup') or {}).get('inline_keyboard')
+        if rows:
+            self._keyboards[chat_id] = (message_id, {b['text']: b['callback_data'] for row in rows for b in row})
+        elif message_id == self._keyboards.get(chat_id, (None,))[0]:
+            self._keyboards.pop(chat_id, None)
+
+    def _get_updates(self, params):
+        offset = int(params.get('offset', 0) or 0)
+        limit = int(params.get('limit', 100) or 100)
+        deadline = time.monotonic() + float(params.get('timeout', 0) or 0)
+        self.polled.set()
+        with self._cond:
+            # مثل تلگرام، آپدیت‌های قبل از offset تایید شده و حذف می‌شوند
+            self._updates = [u for u in self._updates if u['update_id'] >= offset]
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._updates[:limit]
+
+    def _handle(self, request):
+        url = urlsplit(request.path)
+        method = url.path.rsplit('/', 1)[-1]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(request.headers.get('Content-Length', 0))
+        if length:
+            params.update(json.loads(request.rfile.read(length)))
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.payload_bytes[method] = self.payload_bytes.get(method, 0) + length
+
+        if self.outage == 'all' or self.outage == 'send' and method in REPLY_METHODS:
+            self.outage_errors += 1
+            self._reply(request, 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"})
+            return
+
+        if method == 'getUpdates':
+            self._reply(request, 200, {"ok": True, "result": self._get_updates(params)})
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+        if method in REPLY_METHODS and params.get('chat_id') in self.blocked:
+            self._reply(request, 403, {"ok": False, "error_code": 403,
+                                       "description": "Forbidden: bot was blocked by the user"})
+            return
+        if method in REPLY_METHODS and self.error_rate and self._random.random() < self.error_rate:
+            self.errors_injected += 1
+            self._reply(request, 429, {"ok": False, "error_code": 429,
+                                       "description": f"Too Many Requests: retry after {self.retry_after}",
+                                       "parameters": {"retry_after": self.retry_after}})
+            return
+
+        chat_id = params.get('chat_id')
+        if method == 'sendMessage':
+            result = {"message_id": next(self._message_ids), "chat": {"id": chat_id},
+                      "date": int(time.time()), "text": params.get('text', '')}
+            self._remember_keyboard(chat_id, result['message_id'], params)
+        elif method == 'editMessageText':
+            result = {"message_id": params.get('message_id'), "chat": {"id": chat_id},
+                      "text": params.get('text', '')}
+            self._remember_keyboard(chat_id, result['message_id'], params)
+        else:
+            result = True
+            if method == 'answerCallbackQuery':
+                chat_id = self._callback_chats.pop(params.get('callback_query_id'), None)
+        self._reply(request, 200, {"ok": True, "result": result})
+
+        if method in REPLY_METHODS and self.on_reply:
+            self.on_reply(chat_id, method, params)
+
+    @staticmethod
+    def _reply(request, status, data):
+        body = json.dumps(data).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8999
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    error_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    api = FakeBotAPI(port=port, latency=latency_ms / 1000, error_rate=error_rate,
+                     on_reply=lambda chat_id, method, payload: print(f"📤 {method} {chat_id}: {payload.get('text', '')[:60]}"))
+    api.start()
+    print(f"🧪 Bot API جعلی روی {api.url} (TELEGRAM_API_URL={api.url})")
+    for line in sys.stdin:
+        chat_id, _, text = line.rstrip('\n').partition('|')
+        if text:
+            api.inject(int(chat_id), text)
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+تست تزریق خطا - Fault Injection Benchmark
+
+بات واقعی را به سرور جعلی Bot API وصل می‌کند و هر دانش‌آموز سناریوی ارزیابی را
+با فاصله ثابت (بدون صبر برای پاسخ، مثل کاربری که در قطعی هم پیام می‌دهد) چند
+بار اجرا می‌کند. یک بار بدون خطا (کنترل) و یک بار در حالی که API برای مدتی به همه
+پاسخ‌ها 502 می‌دهد (--outage-mode all یعنی getUpdates هم قطع است).
+
+    python bench/faults.py
+    python bench/faults.py --students 200 --outage-start 5 --outage 30 --output bench-faults.json
+
+پاسخ‌های هر چت در اجرای با خطا باید دقیقاً همان پاسخ‌های اجرای کنترل با همان
+ترتیب باشند: lost پاسخ‌های نرسیده، reordered چت‌هایی که ترتیبشان به هم خورده و
+duplicates پاسخ‌های اضافه است. recovery_s زمان از پایان قطعی تا رسیدن آخرین
+پاسخ به پیام‌هایی است که تا پایان قطعی فرستاده شده بودند.
+"""
+
+import argparse
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from fake_bot_api import FakeBotAPI
+from population import ANSWERS, ASSESSMENT_QUESTIONS, GRADES
+from throughput import UNLIMITED_SEND_ENV, free_port, git_revision, percentile, scrape_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def script(chat_id, rounds):
+    """قدم‌های (متن، تعداد پاسخ) یک دانش‌آموز؛ قطعی است تا دو اجرا قابل مقایسه باشند"""
+    steps = []
+    for r in range(rounds):
+        steps += [("/start", 1), ("📊 ارزیابی تحصیلی", 1), (GRADES[(chat_id + r) % len(GRADES)], 2)]
+        steps += [(ANSWERS[(chat_id * 7 + r * 3 + q) % len(ANSWERS)], 1) for q in range(ASSESSMENT_QUESTIONS)]
+    return steps
+
+
+class Recorder:
+    def __init__(self, chats):
+        self.texts = {chat_id: [] for chat_id in chats}
+        self.times = {chat_id: [] for chat_id in chats}
+        self.unexpected = 0
+        self._lock = threading.Lock()
+
+    def on_reply(self, chat_id, method, payload):
+        with self._lock:
+            if chat_id not in self.texts:
+                self.unexpected += 1
+                return
+            self.texts[chat_id].append(payload.get('text', ''))
+            self.times[chat_id].append(time.perf_counter())
+
+    def count(self):
+        with self._lock:
+            return sum(len(texts) for texts in self.texts.values())
+
+
+def drive(api, scripts, interval, stagger, injected):
+    """پیام‌ها را با زمان‌بندی ثابت می‌فرستد؛ injected[chat_id] زمان ارسال هر قدم است"""
+    schedule = sorted((i * stagger + n * interval, chat_id, n)
+                      for i, chat_id in enumerate(scripts) for n in range(len(scripts[chat_id])))
+    started = time.perf_counter()
+    for at, chat_id, n in schedule:
+        delay = started + at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        api.inject(chat_id, scripts[chat_id][n][0])
+        injected[chat_id].append(time.perf_counter())
+
+
+def run_once(args, scripts, outage):
+    recorder = Recorder(scripts)
+    api = FakeBotAPI(latency=args.latency_ms / 1000, on_reply=recorder.on_reply).start()
+    metrics_port = free_port()
+    env = dict(os.environ, BOT_TOKEN='bench', TELEGRAM_API_URL=api.url, POLL_TIMEOUT='1',
+               METRICS_HOST='127.0.0.1', METRICS_PORT=str(metrics_port), PYTHONPATH=ROOT, **UNLIMITED_SEND_ENV)
+    expected = sum(count for steps in scripts.values() for _, count in steps)
+    injected = {chat_id: [] for chat_id in scripts}
+    outage_window = None
+
+    with tempfile.TemporaryDirectory(prefix='bot-faults-') as workdir:
+        log = open(os.path.join(workdir, 'bot.log'), 'w')
+        bot = subprocess.Popen([sys.executable, '-m', 'advisor_bot'],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            if not api.polled.wait(args.startup_timeout):
+                raise RuntimeError("bot did not start polling; see bot.log")
+            driver = threading.Thread(target=drive, args=(api, scripts, args.interval, args.stagger, injected),
+                                      name="driver", daemon=True)
+            started = time.perf_counter()
+            driver.start()
+            if outage:
+                time.sleep(args.outage_start)
+                api.outage = args.outage_mode
+                outage_window = (time.perf_counter(), None)
+                time.sleep(args.outage)
+                api.outage = None
+                outage_window = (outage_window[0], time.perf_counter())
+            driver.join()
+            deadline = time.perf_counter() + args.timeout
+            while recorder.count() < expected and time.perf_counter() < deadline:
+                time.sleep(0.1)
+            # پاسخ اضافه (تکراری) ممکن است کمی بعد برسد
+            time.sleep(args.settle)
+            elapsed = time.perf_counter() - started
+            outbox = scrape_counter([metrics_port], 'bot_outbox_messages_total')
+            breaker_opens = scrape_counter([metrics_port], 'bot_telegram_circuit_opens_total')
+            shed = scrape_counter([metrics_port], 'bot_ingest_shed_total')
+        finally:
+            bot.send_signal(signal.SIGTERM)
+            try:
+                bot.wait(30)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+                bot.wait()
+            api.stop()
+            log.close()
+
+    report = {
+        'expected_replies': expected,
+        'replies': recorder.count(),
+        'duration_s': round(elapsed, 3),
+        'unexpected_replies': recorder.unexpected,
+        'api_calls': api.calls,
+        'outage_errors': api.outage_errors,
+        'outbox': outbox,
+        'circuit_opens': breaker_opens.get('total', 0),
+        'shed': shed,
+    }
+    return report, recorder, injected, outage_window
+
+
+def recovery(scripts, recorder, injected, outage_end):
+    """ثانیه از پایان قطعی تا رسیدن همه پاسخ‌های پیام‌هایی که تا آن لحظه فرستاده شده بودند"""
+    last = outage_end
+    for chat_id, steps in scripts.items():
+        due = sum(count for (_, count), at in zip(steps, injected[chat_id]) if at <= outage_end)
+        times = recorder.times[chat_id]
+        if len(times) < due:
+            return None
+        if due:
+            last = max(last, times[due - 1])
+    return round(last - outage_end, 3)
+
+
+def compare(control, faulty):
+    lost = duplicates = 0
+    reordered = []
+    for chat_id, expected in control.texts.items():
+        got = faulty.texts[chat_id]
+        lost += max(0, len(expected) - len(got))
+        duplicates += max(0, len(got) - len(expected))
+        if got != expected[:len(got)]:
+            reordered.append(chat_id)
+    return {'lost': lost, 'duplicates': duplicates, 'reordered_chats': len(reordered)}
+
+
+def step_latencies(scripts, recorder, injected, after):
+    """تأخیر قدم‌هایی که بعد از زمان after فرستاده شده‌اند (از ارسال تا آخرین پاسخ)"""
+    latencies = []
+    for chat_id, steps in scripts.items():
+        times = recorder.times[chat_id]
+        received = 0
+        for (_, count), at in zip(steps, injected[chat_id]):
+            received += count
+            if at > after and received <= len(times):
+                latencies.append(times[received - 1] - at)
+    latencies.sort()
+    return {name: round(percentile(latencies, p) * 1000, 2) if latencies else None
+            for name, p in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))}
+
+
+def run(args):
+    scripts = {chat_id: script(chat_id, args.rounds) for chat_id in range(100000, 100000 + args.students)}
+    control, control_replies, _, _ = run_once(args, scripts, outage=False)
+    faulty, faulty_replies, injected, (_, outage_end) = run_once(args, scripts, outage=True)
+    faulty.update(compare(control_replies, faulty_replies))
+    faulty['recovery_s'] = recovery(scripts, faulty_replies, injected, outage_end)
+    faulty['latency_after_outage_ms'] = step_latencies(scripts, faulty_replies, injected, outage_end)
+    return {
+        'benchmark': 'faults',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'control': control,
+        'outage': faulty,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replies lost and recovery time across a Bot API outage")
+    parser.add_argument('--students', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=2, help="assessments per student")
+    parser.add_argument('--interval', type=float, default=2, help="seconds between a student's messages")
+    parser.add_argument('--stagger', type=float, default=0.01, help="start offset between students")
+    parser.add_argument('--outage-start', type=float, default=5, help="seconds into the run")
+    parser.add_argument('--outage', type=float, default=10, help="outage length in seconds")
+    parser.add_argument('--outage-mode', choices=('send', 'all'), default='send',
+                        help="send: reply methods fail; all: getUpdates fails too")
+    parser.add_argument('--latency-ms', type=float, default=0, help="fake API latency per call")
+    parser.add_argument('--timeout', type=float, default=120, help="wait this long for missing replies")
+    parser.add_argument('--settle', type=float, default=1, help="extra wait for late duplicates")
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
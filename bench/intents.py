@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+بنچمارک تشخیص نیت - Intent Resolution Benchmark
+
+همه ورودی‌های یک پیکره را با FlowEngine واقعی بات (همان جدول مسیرها) به نیت
+تبدیل می‌کند و زمان هر resolve و درصد تطبیق درست را گزارش می‌دهد؛ در کنار آن
+تطبیق دقیق قدیمی (فقط برچسب کامل دکمه) هم اندازه گرفته می‌شود.
+
+    python bench/intents.py
+    python bench/intents.py --corpus bot_logs.jsonl --output bench-intents.json
+
+پیکره پیش‌فرض از برچسب دکمه‌ها با تغییرهایی که دانش‌آموزان واقعاً تایپ می‌کنند
+ساخته می‌شود: بدون ایموجی، حروف عربی (ي، ك)، فاصله به جای نیم‌فاصله، بخشی از
+برچسب، یک غلط تایپی و پیام‌های بی‌ربط. با --corpus می‌توان ورودی واقعی داد:
+فایل event log بات (رویدادهای INPUT_UNMATCHED) یا فایل متنی با خطوط
+«وضعیت<TAB>متن<TAB>برچسب مورد انتظار» (ستون‌های اول و سوم اختیاری).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MENU = 'menu'
+NOISE = ["سلام", "ممنون", "مرسی", "خوبی؟", "؟", "/help", "ok", "😊", "کی جواب میدی", "باشه"]
+ARABIC = str.maketrans("یک", "يك")
+
+
+def load_flow_engine():
+    # ساخت ماژول بات فایل‌های دیتابیس را در پوشه جاری می‌سازد
+    os.environ.setdefault('BOT_TOKEN', 'bench')
+    os.chdir(tempfile.mkdtemp(prefix='bot-intents-'))
+    from advisor_bot import bot
+    return bot.flow_engine
+
+
+def strip_emoji(label):
+    return label.split(" ", 1)[1] if " " in label and not label.split(" ", 1)[0].isalpha() else label
+
+
+def typo(rng, text):
+    i = rng.randrange(len(text))
+    kind = rng.choice(('delete', 'insert', 'replace'))
+    if kind == 'delete':
+        return text[:i] + text[i + 1:]
+    char = rng.choice("ابتسشمنهوی")
+    if kind == 'insert':
+        return text[:i] + char + text[i:]
+    return text[:i] + char + text[i + 1:]
+
+
+def synthetic_corpus(engine, rng, size):
+    """(وضعیت، متن، برچسب مورد انتظار یا None، نوع تغییر)"""
+    labels = engine.labels()
+    variants = {
+        'exact': lambda label: label,
+        'no_emoji': strip_emoji,
+        'arabic': lambda label: strip_emoji(label).translate(ARABIC),
+        'spaces': lambda label: strip_emoji(label).replace("‌", " "),
+        'prefix': lambda label: strip_emoji(label).split(" ")[0],
+        'typo': lambda label: typo(rng, strip_emoji(label)),
+    }
+    corpus = []
+    for _ in range(size):
+        kind = rng.choice(list(variants) + ['noise'])
+        if kind == 'noise':
+            corpus.append((MENU, rng.choice(NOISE), None, kind))
+            continue
+        state, label = rng.choice(labels)
+        corpus.append((state, variants[kind](label), label, kind))
+    return corpus
+
+
+def file_corpus(path):
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                if record.get('event') == 'INPUT_UNMATCHED':
+                    corpus.append((MENU, record['details'].removeprefix("Text: "), None, 'log'))
+                continue
+            fields = line.split('\t')
+            if len(fields) == 1:
+                fields = [MENU] + fields
+            state, text, expected = (fields + [None])[:3]
+            corpus.append((state, text, expected or None, 'file'))
+    return corpus
+
+
+def measure(resolve, corpus, repeat):
+    timings = []
+    outcomes = {}
+    for state, text, expected, kind in corpus:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            label = resolve(state, text)
+        timings.append((time.perf_counter() - started) / repeat)
+        if expected is None:
+            outcome = 'unmatched' if label is None else ('matched' if kind in ('log', 'file') else 'false_positive')
+        else:
+            outcome = 'correct' if label == expected else ('unmatched' if label is None else 'wrong')
+        counts = outcomes.setdefault(kind, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+    timings.sort()
+    return {
+        'resolve_us': {name: round(timings[min(len(timings) - 1, int(p * len(timings)))] * 1e6, 2)
+                       for name, p in (('p50', 0.5), ('p99', 0.99), ('max', 1.0))},
+        'outcomes': outcomes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Intent resolution benchmark")
+    parser.add_argument('--corpus', help="bot event log (.jsonl) or TSV of state, text, expected label")
+    parser.add_argument('--size', type=int, default=20000, help="synthetic corpus size")
+    parser.add_argument('--repeat', type=int, default=20, help="resolves per input when timing")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    engine = load_flow_engine()
+    corpus = file_corpus(args.corpus) if args.corpus else synthetic_corpus(engine, random.Random(args.seed), args.size)
+    exact = set(engine.labels())
+
+    def resolve(state, text):
+        route, label, kind = engine.resolve(state, text)
+        return label if kind not in ('fallback', 'none') else None
+
+    def resolve_exact(state, text):
+        if (state, text) in exact:
+            return text
+        return text if state != MENU and (MENU, text) in exact else None
+
+    report = {
+        'benchmark': 'intents',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {'corpus': args.corpus or 'synthetic', 'inputs': len(corpus), 'repeat': args.repeat, 'seed': args.seed},
+        'intent_index': measure(resolve, corpus, args.repeat),
+        'exact_only': measure(resolve_exact, corpus, args.repeat),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
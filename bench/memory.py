@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+بنچمارک حافظه وضعیت کاربران - Per-user State Memory Benchmark
+
+وضعیت N چت را همان‌طور که SessionCache از دیتابیس بارگذاری می‌کند (json.loads و سپس
+from_dict) می‌سازد و حافظه نگه‌داشته‌شده را با tracemalloc اندازه می‌گیرد؛ یک بار
+با نمایش قدیمی (شیء با __dict__، لیست و دیکشنری خالی، آلارم به صورت دیکشنری) و یک
+بار با user_state.UserState.
+
+    python bench/memory.py
+    python bench/memory.py --chats 200000 --output bench-memory.json
+
+ترکیب جمعیت با --assessed، --in-progress و --with-alarms (سهم از کل) تعیین می‌شود؛
+بقیه بازدیدکنندگانی هستند که فقط یک پیام فرستاده‌اند. tracemalloc ساخت را کند می‌کند؛
+اجرای پیش‌فرض (یک میلیون چت) چند دقیقه طول می‌کشد.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from advisor_bot.user_state import UserState  # noqa: E402
+
+QUESTIONS = [
+    "۱. وضعیت دروس اصلی (ریاضی، علوم، فارسی) چگونه است؟",
+    "۲. برای انتخاب رشته چه برنامه‌ای دارید؟",
+    "۳. ساعت مطالعه روزانه چقدر است؟",
+    "۴. در چه دروسی نیاز به کمک دارید؟",
+    "۵. هدف تحصیلی شما چیست؟",
+]
+GRADES = ["ششم", "هفتم", "هشتم", "نهم", "دهم", "یازدهم", "دوازدهم"]
+DAYS = ["شنبه", "یکشنبه", "دوشنبه", "سه‌شنبه", "چهارشنبه", "پنجشنبه", "جمعه"]
+
+
+class LegacyUserState:
+    """نمایش پیش از user_state.py (برای مقایسه)"""
+
+    def __init__(self):
+        self.state = 'menu'
+        self.grade = None
+        self.step = 0
+        self.answers = []
+        self.questions = []
+        self.alarms = []
+        self.temp_alarm_data = {}
+        self.last_activity = time.time()
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.__dict__.update((k, v) for k, v in data.items() if k in state.__dict__)
+        return state
+
+
+def legacy_record(rng, args):
+    """یک وضعیت ذخیره‌شده به قالب قدیمی؛ هر دو نمایش همین را بارگذاری می‌کنند"""
+    record = {'state': 'menu', 'grade': None, 'step': 0, 'answers': [], 'questions': [],
+              'alarms': [], 'temp_alarm_data': {}, 'last_activity': time.time() - rng.random() * 7200}
+    roll = rng.random()
+    if roll < args.assessed + args.in_progress:
+        record['grade'] = rng.choice(GRADES)
+    if roll < args.in_progress:
+        step = rng.randrange(1, len(QUESTIONS))
+        record.update(state='assessment:question', step=step, questions=QUESTIONS,
+                      answers=[rng.randrange(3) for _ in range(step)])
+    if rng.random() < args.with_alarms:
+        record['alarms'] = [
+            {'id': i + 1, 'type': rng.choice(['study', 'break']), 'time': f"{rng.randrange(6, 23):02d}:00",
+             'days': ['all'] if rng.random() < 0.5 else rng.sample(DAYS, rng.randrange(1, 6)), 'active': True}
+            for i in range(rng.randrange(1, 3))
+        ]
+    return json.dumps(record, ensure_ascii=False)
+
+
+def measure(decode, args):
+    rng = random.Random(args.seed)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    states = {}
+    for chat_id in range(1, args.chats + 1):
+        # json.loads برای هر چت رشته‌های تازه می‌سازد، درست مثل بارگذاری از دیتابیس
+        states[chat_id] = decode(json.loads(legacy_record(rng, args)))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del states
+    return {
+        'bytes_total': current,
+        'bytes_per_user': round(current / args.chats, 1),
+        'build_seconds': round(elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user state memory benchmark")
+    parser.add_argument('--chats', type=int, default=1_000_000)
+    parser.add_argument('--assessed', type=float, default=0.12, help="share with a finished assessment")
+    parser.add_argument('--in-progress', type=float, default=0.03, help="share in the middle of an assessment")
+    parser.add_argument('--with-alarms', type=float, default=0.05, help="share with saved alarms")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    legacy = measure(LegacyUserState.from_dict, args)
+    compact = measure(UserState.from_dict, args)
+    report = {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'legacy': legacy,
+        'compact': compact,
+        'reduction': round(1 - compact['bytes_total'] / legacy['bytes_total'], 3),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
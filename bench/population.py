@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+تولید جمعیت مصنوعی دانش‌آموزان - Synthetic Student Population
+
+هر دانش‌آموز یک سناریو (ارزیابی، تنظیم آلارم یا مدیریت استرس) را قدم به قدم
+اجرا می‌کند. هر قدم (متن پیام، تعداد پاسخ مورد انتظار از بات) است و قدم بعدی
+فقط بعد از رسیدن همه پاسخ‌های قدم قبلی فرستاده می‌شود. قدم سه‌تایی
+(متن دکمه، تعداد پاسخ، PRESS) به جای پیام، دکمه inline با همان متن را فشار می‌دهد.
+"""
+
+import random
+
+GRADES = ["📚 ششم", "📚 نهم", "🎯 دوازدهم"]
+ANSWERS = ["🟢 عالی", "🟡 متوسط", "🔴 ضعیف"]
+ALARM_TYPES = ["📚 آلارم مطالعه", "☕ آلارم استراحت"]
+ALARM_TIMES = ["07:00", "08:00", "16:00", "18:00"]
+DAYS = ["شنبه", "یکشنبه", "دوشنبه", "سه‌شنبه", "چهارشنبه", "پنجشنبه", "جمعه"]
+STRESS_LEVELS = ["🟢 کم", "🟡 متوسط", "🟠 زیاد", "🔴 بسیار زیاد"]
+ASSESSMENT_QUESTIONS = 5
+PRESS = 'press'
+
+
+def assessment(rng):
+    steps = [("/start", 1), ("📊 ارزیابی تحصیلی", 1), (rng.choice(GRADES), 2)]
+    steps += [(rng.choice(ANSWERS), 1) for _ in range(ASSESSMENT_QUESTIONS)]
+    return steps
+
+
+def inline_assessment(rng):
+    # هر دکمه دو پاسخ دارد: answerCallbackQuery و editMessageText
+    steps = [("/start", 1), ("📊 ارزیابی تحصیلی", 1), (rng.choice(GRADES).split(" ")[1], 2, PRESS)]
+    steps += [(rng.choice(ANSWERS), 2, PRESS) for _ in range(ASSESSMENT_QUESTIONS)]
+    return steps
+
+
+def alarm_setup(rng):
+    steps = [("/start", 1), ("⏰ تنظیم آلارم", 1), (rng.choice(ALARM_TYPES), 1),
+             (rng.choice(ALARM_TIMES), 1)]
+    if rng.random() < 0.3:
+        steps.append(("🎯 همه روزها", 1))
+    else:
+        steps += [(day, 1) for day in rng.sample(DAYS, rng.randint(1, 3))]
+    steps.append(("✅ تایید", 1))
+    return steps
+
+
+def stress(rng):
+    return [("/start", 1), ("😊 مدیریت استرس", 1), (rng.choice(STRESS_LEVELS), 1)]
+
+
+SCENARIOS = {
+    'assessment': (assessment, 0.5),
+    'alarm': (alarm_setup, 0.3),
+    'stress': (stress, 0.2),
+}
+
+
+def population(count, seed=0, first_chat_id=100000, scenarios=None, assessment_ui='reply'):
+    """لیست (chat_id, نام سناریو، قدم‌ها) برای count دانش‌آموز"""
+    rng = random.Random(seed)
+    names = list(scenarios or SCENARIOS)
+    weights = [SCENARIOS[n][1] for n in names]
+    students = []
+    for i in range(count):
+        name = rng.choices(names, weights)[0]
+        build = inline_assessment if name == 'assessment' and assessment_ui == 'inline' else SCENARIOS[name][0]
+        students.append((first_chat_id + i, name, build(rng)))
+    return students
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+بنچمارک پشتیبان‌گیری هم‌زمان - Snapshot Under Load Benchmark
+
+یک StateStore و ResultsStore واقعی با N چت می‌سازد و با Dispatcher واقعی بات
+آپدیت‌های مصنوعی را با نرخ ثابت پردازش می‌کند (هر هندلر وضعیت یک چت تصادفی را
+می‌خواند و می‌نویسد و گاهی یک نتیجه ارزیابی ثبت می‌کند). یک بار بدون
+پشتیبان‌گیری و یک بار در حالی که Snapshotter پشت سر هم snapshot می‌گیرد؛
+تأخیر هندلرها (از submit تا پایان هندلر) و تأخیر event loop مقایسه می‌شود.
+
+    python bench/snapshot.py
+    python bench/snapshot.py --chats 500000 --rate 1000 --duration 20 --output bench-snapshot.json
+
+در پایان یک snapshot بازیابی و با دیتابیس اصلی مقایسه می‌شود.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from advisor_bot.dispatcher import Dispatcher  # noqa: E402
+from advisor_bot.results_store import SQLiteResultsStore  # noqa: E402
+from advisor_bot.snapshot import Snapshotter, SnapshotStore, restore  # noqa: E402
+from advisor_bot.state_store import StateStore  # noqa: E402
+
+GRADES = ["ششم", "هفتم", "هشتم", "نهم", "دهم", "یازدهم", "دوازدهم"]
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return None
+    return {name: round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2)
+            for name, p in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))}
+
+
+def session(rng):
+    return {'last_activity': time.time(), 'state': 'menu', 'grade': rng.choice(GRADES),
+            'alarms': [{'id': 1, 'type': 'study', 'minute': rng.randrange(1440), 'days': 127, 'active': True}]
+            if rng.random() < 0.1 else []}
+
+
+def populate(state_store, results_store, args, rng):
+    for chat_id in range(args.chats):
+        state_store.write('states', chat_id, session(rng))
+    state_store.flush()
+    results_store.write_batch([
+        {'timestamp': '2024-01-01 00:00:00', 'user_id': rng.randrange(args.chats), 'grade': rng.choice(GRADES),
+         'total_score': rng.randrange(15), 'answers': '[1, 2, 0, 1, 2]'}
+        for _ in range(args.chats // 10)
+    ])
+
+
+class Workload:
+    def __init__(self, state_store, results_store, chats, seed):
+        self.state_store = state_store
+        self.results_store = results_store
+        self.chats = chats
+        self.rng = random.Random(seed)
+        self.latencies = []
+
+    def handle(self, update):
+        chat_id = update['chat_id']
+        data = self.state_store.load('states', chat_id) or {}
+        data['last_activity'] = time.time()
+        self.state_store.write('states', chat_id, data)
+        if update['result']:
+            self.results_store.append({'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                       'user_id': chat_id, 'grade': data.get('grade', ''),
+                                       'total_score': 7, 'answers': '[1, 2, 0, 1, 2]'})
+        self.latencies.append(time.perf_counter() - update['submitted'])
+
+    async def drive(self, dispatcher, rate, duration):
+        """آپدیت‌ها را با نرخ ثابت می‌فرستد و تأخیر event loop را اندازه می‌گیرد"""
+        self.latencies = []
+        lags = []
+        interval = 1 / rate
+        started = time.perf_counter()
+        next_at = started
+        while next_at - started < duration:
+            await dispatcher.submit({'chat_id': self.rng.randrange(self.chats), 'result': self.rng.random() < 0.02,
+                                     'submitted': time.perf_counter()})
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                lags.append(max(0.0, time.perf_counter() - next_at))
+        while dispatcher.pending:
+            await asyncio.sleep(0.01)
+        return {'updates': len(self.latencies), 'handler_latency_ms': percentiles(self.latencies),
+                'loop_lag_ms': percentiles(lags)}
+
+
+def snapshot_loop(snapshotter, stop, taken):
+    while not stop.is_set():
+        taken.append(snapshotter.snapshot()['stats'])
+
+
+async def run(args, workdir):
+    rng = random.Random(args.seed)
+    state_store = StateStore(os.path.join(workdir, 'bot_state.db'))
+    results_store = SQLiteResultsStore(os.path.join(workdir, 'educational_data.db'))
+    populate(state_store, results_store, args, rng)
+    state_store.start()
+    results_store.start()
+
+    snapshotter = Snapshotter(SnapshotStore(os.path.join(workdir, 'backup')), keep=args.keep)
+    snapshotter.add_sqlite('state', state_store.path, before=state_store.flush)
+    snapshotter.add_sqlite('results', results_store.path, before=results_store.flush)
+    full = snapshotter.snapshot()['stats']
+
+    workload = Workload(state_store, results_store, args.chats, args.seed)
+    dispatcher = Dispatcher(lambda update: workload.handle(update), concurrency=args.concurrency)
+    await dispatcher.start()
+
+    baseline = await workload.drive(dispatcher, args.rate, args.duration)
+
+    stop = threading.Event()
+    taken = []
+    thread = threading.Thread(target=snapshot_loop, args=(snapshotter, stop, taken), name="snapshot")
+    thread.start()
+    try:
+        during = await workload.drive(dispatcher, args.rate, args.duration)
+    finally:
+        stop.set()
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+    state_store.flush()
+    results_store.flush()
+    latest = snapshotter.snapshot()
+    target = os.path.join(workdir, 'restored')
+    os.makedirs(target)
+    started = time.perf_counter()
+    restore(snapshotter.store, latest['id'], target)
+    restore_seconds = time.perf_counter() - started
+    dump = "SELECT namespace, chat_id, data FROM sessions ORDER BY namespace, chat_id"
+    original = sqlite3.connect(state_store.path).execute(dump).fetchall()
+    restored = sqlite3.connect(os.path.join(target, 'bot_state.db')).execute(dump).fetchall()
+
+    during['snapshots'] = len(taken)
+    incremental = [s for s in taken if s['chunks_reused']]
+    return {
+        'benchmark': 'snapshot',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'db_bytes': {'state': os.path.getsize(state_store.path), 'results': os.path.getsize(results_store.path)},
+        'full_snapshot': full,
+        'incremental_snapshot': {
+            'duration_ms': percentiles([s['seconds'] for s in incremental]),
+            'bytes_written_avg': round(sum(s['bytes_written'] for s in incremental) / len(incremental))
+            if incremental else None,
+        },
+        'no_snapshot': baseline,
+        'while_snapshotting': during,
+        'restore': {'seconds': round(restore_seconds, 3), 'matches': original == restored},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Handler latency while snapshots run")
+    parser.add_argument('--chats', type=int, default=200_000)
+    parser.add_argument('--rate', type=float, default=500, help="updates per second")
+    parser.add_argument('--duration', type=float, default=10, help="seconds per phase")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--keep', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bot-snapshot-') as workdir:
+        report = asyncio.run(run(args, workdir))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
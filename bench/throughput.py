@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+بنچمارک سرتاسری توان عملیاتی - End-to-end Throughput Benchmark
+
+بات واقعی (python -m advisor_bot) را در یک پردازه جدا و در پوشه موقت اجرا می‌کند، آن را به
+سرور جعلی Bot API وصل می‌کند و جمعیت مصنوعی دانش‌آموزان را به صورت حلقه بسته
+(هر دانش‌آموز تا رسیدن پاسخ منتظر می‌ماند) روی آن می‌فرستد.
+
+    python bench/throughput.py --students 500 --output bench-results.json
+    python bench/throughput.py --students 2000 --workers 4 --latency-ms 50 --error-rate 0.01
+    python bench/throughput.py --scenario assessment --assessment-ui inline
+    python bench/throughput.py --flooders 20 --flood-rate 50
+
+خروجی JSON شامل آپدیت در ثانیه، صدک‌های p50/p95/p99 تأخیر پاسخ (از ورود آپدیت
+تا آخرین پاسخ بات به همان قدم)، بیشترین RSS پردازه‌های بات و تعداد و حجم
+درخواست‌های خروجی بات به ازای هر دانش‌آموز است. با --flooders چند چت بدون صبر
+برای پاسخ همان دکمه منو را پشت سر هم می‌فرستند؛ تأخیر بالا فقط برای دانش‌آموزان
+عادی است و بخش flood تعداد آپدیت‌های حذف‌شده در ورودی بات را (از /metrics) نشان می‌دهد.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+from fake_bot_api import FakeBotAPI
+from population import population, PRESS, SCENARIOS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# محدودیت‌های واقعی تلگرام (۳۰ پیام در ثانیه و ۱ پیام در ثانیه برای هر چت) خود بات را
+# اندازه نمی‌گیرند؛ به جز --telegram-limits این سقف‌ها عملاً برداشته می‌شوند
+UNLIMITED_SEND_ENV = {'SEND_GLOBAL_RATE': '1000000', 'SEND_CHAT_RATE': '1000000', 'SEND_CHAT_BURST': '1000'}
+FLOOD_TEXT = "📊 ارزیابی تحصیلی"
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadDriver:
+    """هر دانش‌آموز قدم بعدی را فقط بعد از رسیدن همه پاسخ‌های قدم قبلی می‌فرستد"""
+
+    def __init__(self, students):
+        self.api = None
+        self.students = {chat_id: steps for chat_id, _, steps in students}
+        self.position = dict.fromkeys(self.students, 0)
+        self.replies = dict.fromkeys(self.students, 0)
+        self.sent_at = {}
+        self.latencies = []
+        self.updates = 0
+        self.unexpected_replies = 0
+        self.done = threading.Event()
+        self._remaining = len(self.students)
+        self._lock = threading.Lock()
+
+    def start(self, api):
+        self.api = api
+        for chat_id in self.students:
+            self._send_step(chat_id)
+
+    def _send_step(self, chat_id):
+        step = self.students[chat_id][self.position[chat_id]]
+        self.sent_at[chat_id] = time.perf_counter()
+        self.updates += 1
+        if step[2:] == (PRESS,):
+            self.api.press(chat_id, step[0])
+        else:
+            self.api.inject(chat_id, step[0])
+
+    def on_reply(self, chat_id, method, payload):
+        with self._lock:
+            if chat_id not in self.position or self.position[chat_id] >= len(self.students[chat_id]):
+                self.unexpected_replies += 1
+                return
+            self.replies[chat_id] += 1
+            expected = self.students[chat_id][self.position[chat_id]][1]
+            if self.replies[chat_id] < expected:
+                return
+            self.latencies.append(time.perf_counter() - self.sent_at[chat_id])
+            self.replies[chat_id] = 0
+            self.position[chat_id] += 1
+            if self.position[chat_id] < len(self.students[chat_id]):
+                self._send_step(chat_id)
+                return
+            self._remaining -= 1
+            if not self._remaining:
+                self.done.set()
+
+
+class FloodDriver:
+    """چت‌هایی که هر کدام با نرخ rate (در ثانیه) همان پیام را بدون صبر برای پاسخ می‌فرستند"""
+
+    def __init__(self, count, rate, first_chat_id=900000):
+        self.chats = range(first_chat_id, first_chat_id + count)
+        self.rate = rate
+        self.updates = 0
+        self.replies = 0
+        self._stop = threading.Event()
+
+    def start(self, api):
+        if self.chats:
+            threading.Thread(target=self._run, args=(api,), name="flood", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, api):
+        interval = 1 / self.rate
+        next_at = time.perf_counter()
+        while not self._stop.is_set():
+            for chat_id in self.chats:
+                api.inject(chat_id, FLOOD_TEXT)
+                self.updates += 1
+            next_at += interval
+            self._stop.wait(max(0.0, next_at - time.perf_counter()))
+
+
+class RssSampler:
+    """جمع RSS پردازه بات و فرزندانش (کارگرها) را از /proc نمونه‌برداری می‌کند"""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="rss-sampler", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_kb = max(self.peak_kb, sum(self._rss_kb(pid) for pid in self._tree(self.pid)))
+
+    @staticmethod
+    def _tree(pid):
+        pids = [pid]
+        for p in pids:
+            try:
+                for task in os.listdir(f"/proc/{p}/task"):
+                    with open(f"/proc/{p}/task/{task}/children") as f:
+                        pids.extend(int(c) for c in f.read().split())
+            except OSError:
+                continue
+        return pids
+
+    @staticmethod
+    def _rss_kb(pid):
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def scrape_counter(ports, name):
+    """جمع مقدار یک شمارنده (به تفکیک برچسب) روی /metrics همه پردازه‌های بات"""
+    totals = {}
+    for port in ports:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+                body = response.read().decode('utf-8')
+        except OSError:
+            continue
+        for line in body.splitlines():
+            if line.startswith(name):
+                series, value = line.rsplit(' ', 1)
+                labels = series[len(name):].strip('{}') or 'total'
+                totals[labels] = totals.get(labels, 0) + int(float(value))
+    return totals
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    students = population(args.students, seed=args.seed, scenarios=args.scenario and [args.scenario],
+                          assessment_ui=args.assessment_ui)
+    driver = LoadDriver(students)
+    flood = FloodDriver(args.flooders, args.flood_rate)
+
+    def on_reply(chat_id, method, payload):
+        if chat_id in flood.chats:
+            flood.replies += 1
+        else:
+            driver.on_reply(chat_id, method, payload)
+
+    api = FakeBotAPI(latency=args.latency_ms / 1000, error_rate=args.error_rate,
+                     on_reply=on_reply).start()
+
+    metrics_port = free_port()
+    metrics_ports = [metrics_port] + [metrics_port + 1 + i for i in range(args.workers)]
+    env = dict(os.environ, BOT_TOKEN='bench', TELEGRAM_API_URL=api.url, POLL_TIMEOUT='1',
+               BOT_WORKERS=str(args.workers), ASSESSMENT_UI=args.assessment_ui,
+               METRICS_HOST='127.0.0.1', METRICS_PORT=str(metrics_port), PYTHONPATH=ROOT)
+    if not args.telegram_limits:
+        env.update(UNLIMITED_SEND_ENV)
+
+    with tempfile.TemporaryDirectory(prefix='bot-bench-') as workdir:
+        log = open(os.path.join(workdir, 'bot.log'), 'w')
+        bot = subprocess.Popen([sys.executable, '-m', 'advisor_bot'],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        sampler = RssSampler(bot.pid)
+        sampler.start()
+        try:
+            if not api.polled.wait(args.startup_timeout):
+                raise RuntimeError("bot did not start polling; see bot.log")
+            started = time.perf_counter()
+            flood.start(api)
+            driver.start(api)
+            finished = driver.done.wait(args.timeout)
+            elapsed = time.perf_counter() - started
+            flood.stop()
+            shed = scrape_counter(metrics_ports, 'bot_ingest_shed_total')
+        finally:
+            flood.stop()
+            bot.send_signal(signal.SIGTERM)
+            try:
+                bot.wait(30)
+            except subprocess.TimeoutExpired:
+                bot.kill()
+                bot.wait()
+            sampler.stop()
+            api.stop()
+            log.close()
+
+    # اگر /proc در دسترس نباشد (macOS) از بیشترین RSS پردازه‌های فرزند استفاده می‌شود
+    peak_kb = sampler.peak_kb or resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    latencies = sorted(driver.latencies)
+    completed = sum(1 for chat_id in driver.position
+                    if driver.position[chat_id] >= len(driver.students[chat_id]))
+    outbound_calls = sum(n for method, n in api.calls.items() if method != 'getUpdates')
+    outbound_bytes = sum(n for method, n in api.payload_bytes.items() if method != 'getUpdates')
+    return {
+        'benchmark': 'throughput',
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'students': args.students,
+            'workers': args.workers,
+            'latency_ms': args.latency_ms,
+            'error_rate': args.error_rate,
+            'telegram_limits': args.telegram_limits,
+            'seed': args.seed,
+            'scenario': args.scenario,
+            'assessment_ui': args.assessment_ui,
+            'flooders': args.flooders,
+            'flood_rate': args.flood_rate,
+        },
+        'completed': finished,
+        'students_completed': completed,
+        'updates': driver.updates,
+        'replies': len(latencies),
+        'duration_s': round(elapsed, 3),
+        'updates_per_sec': round(driver.updates / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            name: round(percentile(latencies, p) * 1000, 2) if latencies else None
+            for name, p in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+        },
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'api_calls': api.calls,
+        'payload_bytes': api.payload_bytes,
+        'outbound_per_student': {
+            'calls': round(outbound_calls / completed, 2) if completed else None,
+            'bytes': round(outbound_bytes / completed) if completed else None,
+        },
+        'errors_injected': api.errors_injected,
+        'unexpected_replies': driver.unexpected_replies,
+        'flood': {
+            'updates': flood.updates,
+            'replies': flood.replies,
+            'shed': shed,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmark against a fake Bot API")
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=1, help="BOT_WORKERS for the bot process")
+    parser.add_argument('--latency-ms', type=float, default=0, help="fake API latency per call")
+    parser.add_argument('--error-rate', type=float, default=0, help="fraction of replies answered with 429")
+    parser.add_argument('--telegram-limits', action='store_true', help="keep the bot's real send rate limits")
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), help="run only this scenario")
+    parser.add_argument('--assessment-ui', choices=('reply', 'inline'), default='reply',
+                        help="ASSESSMENT_UI for the bot process")
+    parser.add_argument('--flooders', type=int, default=0, help="chats that spam the menu without waiting")
+    parser.add_argument('--flood-rate', type=float, default=20, help="messages per second from each flooder")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=300, help="give up after this many seconds")
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()